@@ -0,0 +1,61 @@
+'''Benchmark of tracing walkers back to their initial states with ``AncestryIndex``, against
+reading the parent of each walker from the segment index of every iteration along the way.
+
+Usage: python bench_ancestry.py [n_iters [n_segs [n_traced]]]
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from westpa.core.ancestry import AncestryIndex
+from westpa.core.h5io import WESTPAH5File
+
+seg_index_dtype = np.dtype([('weight', np.float64), ('parent_id', np.int64)])
+
+
+def make_file(filename, n_iters, n_segs):
+    h5file = WESTPAH5File(filename, 'w')
+    iterations = h5file.create_group('iterations')
+    rng = np.random.default_rng(1)
+    for n_iter in range(1, n_iters + 1):
+        seg_index = np.zeros((n_segs,), dtype=seg_index_dtype)
+        seg_index['parent_id'] = rng.integers(n_segs, size=n_segs) if n_iter > 1 else -1
+        iterations.create_group(h5file.iter_object_name(n_iter))['seg_index'] = seg_index
+    return h5file
+
+
+def trace_by_rows(h5file, n_iter, seg_ids):
+    for seg_id in seg_ids:
+        i_iter = n_iter
+        while seg_id >= 0:
+            seg_id = h5file.get_iter_group(i_iter)['seg_index'][seg_id]['parent_id']
+            i_iter -= 1
+
+
+if __name__ == '__main__':
+    n_iters = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_segs = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    n_traced = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        h5file = make_file(os.path.join(tmpdir, 'west.h5'), n_iters, n_segs)
+        seg_ids = np.arange(n_traced)
+
+        starttime = time.perf_counter()
+        trace_by_rows(h5file, n_iters, seg_ids)
+        print('{:>8d} walkers  row by row          {:10.4f} s'.format(n_traced, time.perf_counter() - starttime))
+
+        starttime = time.perf_counter()
+        index = AncestryIndex(h5file)
+        built = time.perf_counter()
+        index.trace(n_iters, seg_ids)
+        print(
+            '{:>8d} walkers  ancestry index      {:10.4f} s  (building the index: {:.4f} s)'.format(
+                n_traced, time.perf_counter() - starttime, built - starttime
+            )
+        )
+        h5file.close()
@@ -0,0 +1,35 @@
+'''Benchmark of ``VectorizingFuncBinMapper`` assignment throughput, calling the bin function
+once per coordinate tuple and once per block of coordinates. This is the assignment step
+performed by ``w_assign`` for every timepoint of every segment.
+
+Usage: python bench_func_mapper.py [n_points ...]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from westpa.core.binning.assign import VectorizingFuncBinMapper, coord_dtype
+
+
+def bin_function(coord, s):
+    return np.where(coord[..., 0] + coord[..., 1] < s * 0.5, 0, 1)
+
+
+def run(n_points):
+    coords = np.random.default_rng(0).random((n_points, 2)).astype(coord_dtype)
+    outputs = {}
+    for label, vectorized in [('per point', False), ('probed', None)]:
+        mapper = VectorizingFuncBinMapper(bin_function, 2, args=(1.5,), vectorized=vectorized)
+        starttime = time.perf_counter()
+        outputs[label] = mapper.assign(coords)
+        elapsed = time.perf_counter() - starttime
+        print('{:>10d} points  {:<10s} {:10.3f} s  {:12.0f} points/s'.format(n_points, label, elapsed, n_points / elapsed))
+    assert (outputs['per point'] == outputs['probed']).all()
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10**5, 10**7]
+    for n_points in sizes:
+        run(n_points)
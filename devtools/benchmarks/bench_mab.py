@@ -0,0 +1,42 @@
+'''Benchmark of ``MABBinMapper`` assignment, as called by ``MABDriver.assign`` once per iteration
+with the initial and final points of all walkers (with their weights) in one array.
+
+Usage: python bench_mab.py [n_walkers ...]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from westpa.core.binning import MABBinMapper
+
+
+def run(ndim, n_walkers, rng):
+    mapper = MABBinMapper([10] * ndim)
+
+    final = rng.normal(size=(n_walkers, ndim))
+    initial = final + rng.normal(scale=0.1, size=(n_walkers, ndim))
+    weights = rng.lognormal(sigma=2.0, size=n_walkers)
+    weights /= weights.sum()
+    coords = np.vstack(
+        [
+            np.column_stack([initial, weights, np.zeros(n_walkers)]),
+            np.column_stack([final, weights, np.ones(n_walkers)]),
+        ]
+    ).astype(np.float32)
+
+    starttime = time.perf_counter()
+    assignments = mapper.assign(coords)
+    elapsed = time.perf_counter() - starttime
+
+    assert (assignments < mapper.nbins).all()
+    print('{:d}D  {:>8d} walkers  {:10.4f} s'.format(ndim, n_walkers, elapsed))
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    rng = np.random.default_rng(0)
+    for ndim in (2, 3):
+        for n_walkers in sizes:
+            run(ndim, n_walkers, rng)
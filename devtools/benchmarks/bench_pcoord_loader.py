@@ -0,0 +1,50 @@
+'''Benchmark of ``pcoord_loader`` for text, ``.npy``, and raw binary progress coordinate returns.
+
+Usage: python bench_pcoord_loader.py [pcoord_len ...]
+'''
+
+import os
+import sys
+import tempfile
+import timeit
+from unittest.mock import patch
+
+import numpy as np
+
+import westpa
+from westpa.core.propagators.executable import pcoord_loader
+from westpa.core.segment import Segment
+from westpa.core.systems import WESTSystem
+
+pcoord_ndim = 3
+
+
+def run(pcoord_len, tmpdir):
+    system = WESTSystem()
+    system.pcoord_len = pcoord_len
+    system.pcoord_ndim = pcoord_ndim
+    system.pcoord_dtype = np.float32
+
+    pcoord = np.random.random((pcoord_len, pcoord_ndim)).astype(np.float32)
+    filenames = {fmt: os.path.join(tmpdir, 'pcoord.{}'.format(fmt)) for fmt in ('txt', 'npy', 'bin')}
+    np.savetxt(filenames['txt'], pcoord)
+    np.save(filenames['npy'], pcoord)
+    pcoord.tofile(filenames['bin'])
+
+    segment = Segment()
+    cases = [
+        ('text', lambda: pcoord_loader('pcoord', filenames['txt'], segment, False)),
+        ('npy', lambda: pcoord_loader('pcoord', filenames['npy'], segment, False)),
+        ('binary', lambda: pcoord_loader('pcoord', filenames['bin'], segment, False, binary=True)),
+    ]
+    with patch.object(westpa.rc, 'get_system_driver', return_value=system):
+        for label, load in cases:
+            number, elapsed = timeit.Timer(load).autorange()
+            print('pcoord_len {:>8d}  {:<8s} {:12.1f} us/load'.format(pcoord_len, label, 1e6 * elapsed / number))
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [101, 1001, 100001]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for pcoord_len in sizes:
+            run(pcoord_len, tmpdir)
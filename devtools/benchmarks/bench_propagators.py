@@ -0,0 +1,135 @@
+'''Benchmark of in-process propagation against the executable propagator.
+
+Propagates blocks of segments of overdamped Langevin dynamics on a double well with
+``LangevinPropagator``, and with ``ExecutablePropagator`` running an equivalent Python
+script once per segment (returning pcoords through a text file) and once per block
+(batch mode, returning pcoords through a single ``.npz`` file).
+
+Usage: python bench_propagators.py [n_segments ...]
+'''
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import westpa
+from westpa.core.propagators.executable import ExecutablePropagator
+from westpa.core.propagators.python import LangevinPropagator
+from westpa.core.segment import Segment
+from westpa.core.systems import WESTSystem
+
+pcoord_len = 21
+steps_per_point = 10
+
+CONFIG = '''\
+west:
+  data:
+    data_refs:
+      segment: {root}/traj_segs/{{segment.n_iter:06d}}/{{segment.seg_id:06d}}
+      basis_state: {root}/bstates/{{basis_state.auxref}}
+      initial_state: {root}/istates/{{initial_state.iter_created}}/{{initial_state.state_id}}
+  executable:
+    environ: {{}}
+    propagator:
+      executable: {runner}
+      batch: {batch}
+      stdout: /dev/null
+  langevin:
+    steps_per_point: {steps_per_point}
+'''
+
+DYNAMICS = '''\
+def propagate(x):
+    dt, noise_scale = 1e-3, (2e-3) ** 0.5
+    pcoords = np.empty((x.shape[0], {pcoord_len}))
+    pcoords[:, 0] = x
+    for ipoint in range(1, {pcoord_len}):
+        for _istep in range({steps_per_point}):
+            x += dt * -20 * x * (x * x - 1) + np.random.normal(scale=noise_scale, size=x.shape)
+        pcoords[:, ipoint] = x
+    return pcoords
+'''
+
+SEGMENT_RUNNER = '''\
+#!{python}
+import os
+import numpy as np
+{dynamics}
+np.savetxt(os.environ['WEST_PCOORD_RETURN'], propagate(np.array([-1.0]))[0])
+'''
+
+BATCH_RUNNER = '''\
+#!{python}
+import json, os
+import numpy as np
+{dynamics}
+with open(os.environ['WEST_BATCH_MANIFEST']) as f:
+    n_segments = len(json.load(f)['segments'])
+np.savez(os.environ['WEST_BATCH_RETURN'], pcoord=propagate(np.full((n_segments,), -1.0))[..., None])
+'''
+
+
+def configure(root, batch):
+    runner = os.path.join(root, 'runseg_batch.py' if batch else 'runseg.py')
+    dynamics = DYNAMICS.format(pcoord_len=pcoord_len, steps_per_point=steps_per_point)
+    with open(runner, 'wt') as f:
+        f.write((BATCH_RUNNER if batch else SEGMENT_RUNNER).format(python=sys.executable, dynamics=dynamics))
+    os.chmod(runner, os.stat(runner).st_mode | stat.S_IXUSR)
+
+    config_file = os.path.join(root, 'west.cfg')
+    with open(config_file, 'wt') as f:
+        f.write(CONFIG.format(root=root, runner=runner, batch='true' if batch else 'false', steps_per_point=steps_per_point))
+
+    westpa.rc.config._data.clear()
+    westpa.rc.config.update_from_file(config_file)
+    system = WESTSystem(westpa.rc)
+    system.pcoord_len = pcoord_len
+    system.pcoord_ndim = 1
+    system.pcoord_dtype = np.float32
+    westpa.rc._system = system
+
+
+def new_segments(n_segments):
+    segments = []
+    for seg_id in range(n_segments):
+        pcoord = np.zeros((pcoord_len, 1), dtype=np.float32)
+        pcoord[0] = -1.0
+        segments.append(Segment(n_iter=1, seg_id=seg_id, parent_id=seg_id, weight=1.0 / n_segments, pcoord=pcoord))
+    return segments
+
+
+def run(n_segments, root):
+    for label, batch, propagator_class in [
+        ('python', False, LangevinPropagator),
+        ('executable', False, ExecutablePropagator),
+        ('executable (batch)', True, ExecutablePropagator),
+    ]:
+        configure(root, batch)
+        propagator = propagator_class(westpa.rc)
+        segments = new_segments(n_segments)
+
+        starttime = time.perf_counter()
+        propagator.propagate(segments)
+        elapsed = time.perf_counter() - starttime
+
+        assert all(segment.status == Segment.SEG_STATUS_COMPLETE for segment in segments)
+        print(
+            '{:>8d} segments  {:<20s} {:10.4f} s  {:10.3f} ms/segment'.format(
+                n_segments, label, elapsed, 1e3 * elapsed / n_segments
+            )
+        )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [8, 64]
+    root = tempfile.mkdtemp()
+    try:
+        for n_segments in sizes:
+            run(n_segments, root)
+    finally:
+        shutil.rmtree(root)
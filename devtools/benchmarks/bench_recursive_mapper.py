@@ -0,0 +1,66 @@
+'''Benchmark of ``RecursiveBinMapper`` assignment for nested rectilinear bin schemes.
+
+Compares ``RecursiveBinMapper.assign`` with the previous approach, in which every
+embedded mapper was called on the full coordinate array with a mask (reimplemented
+here as ``masked_assign``), and checks that both give identical assignments.
+
+Usage: python bench_recursive_mapper.py [n_coords [n_outer_bins]]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from westpa.core.binning._assign import output_map
+from westpa.core.binning.assign import RecursiveBinMapper, RectilinearBinMapper, coord_dtype, index_dtype
+
+
+def masked_assign(rmapper, coords, mask=None, output=None):
+    if mask is None:
+        mask = np.ones((len(coords),), dtype=np.bool_)
+    if output is None:
+        output = np.empty((len(coords),), dtype=index_dtype)
+
+    mmask = np.zeros((len(coords),), dtype=np.bool_)
+    rmapper.base_mapper.assign(coords, mask, output)
+    rmasks = {}
+    for rindex in rmapper._recursion_targets:
+        omask = output == rindex
+        mmask |= omask
+        rmasks[rindex] = omask
+    if rmapper._output_map is not None:
+        output_map(output, rmapper._output_map, mask & ~mmask)
+    for rindex, mapper in rmapper._recursion_targets.items():
+        masked_assign(mapper, coords, mask & rmasks[rindex], output)
+    return output
+
+
+def nested_mapper(n_outer_bins):
+    '''Three levels of rectilinear bins: ``n_outer_bins`` outer bins, each of which is divided
+    into four bins, the first of which is divided into four again.'''
+    edges = np.linspace(0, 1, n_outer_bins + 1)
+    rmapper = RecursiveBinMapper(RectilinearBinMapper([edges]))
+    for ibin in range(n_outer_bins):
+        lb, ub = edges[ibin], edges[ibin + 1]
+        rmapper.add_mapper(RectilinearBinMapper([np.linspace(lb, ub, 5)]), [(lb + ub) / 2])
+        inner_ub = lb + (ub - lb) / 4
+        rmapper.add_mapper(RectilinearBinMapper([np.linspace(lb, inner_ub, 5)]), [(lb + inner_ub) / 2])
+    return rmapper
+
+
+if __name__ == '__main__':
+    n_coords = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    n_outer_bins = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    rmapper = nested_mapper(n_outer_bins)
+    coords = np.random.default_rng(0).random((n_coords, 1)).astype(coord_dtype)
+
+    outputs = {}
+    for label, assign in [('masked', lambda: masked_assign(rmapper, coords)), ('gathered', lambda: rmapper.assign(coords))]:
+        starttime = time.perf_counter()
+        outputs[label] = assign()
+        elapsed = time.perf_counter() - starttime
+        print('{:>10d} coords  {:>6d} bins  {:<10s} {:10.3f} s'.format(n_coords, rmapper.nbins, label, elapsed))
+
+    assert (outputs['masked'] == outputs['gathered']).all()
@@ -0,0 +1,27 @@
+'''Benchmark of tracing all walkers of an iteration back to their initial states with ``Run.traces``,
+against building the trace of each walker separately.
+
+Usage: python bench_traces.py [west_h5file [n_iter]]
+'''
+
+import sys
+import time
+
+from westpa.analysis import Run
+
+if __name__ == '__main__':
+    h5filename = sys.argv[1] if len(sys.argv) > 1 else 'west.h5'
+
+    with Run.open(h5filename) as run:
+        iteration = run.iteration(int(sys.argv[2]) if len(sys.argv) > 2 else run.num_iterations)
+        walkers = list(iteration)
+
+        starttime = time.perf_counter()
+        for walker in walkers:
+            walker.trace()
+        print('{:>8d} walkers  one by one          {:10.4f} s'.format(len(walkers), time.perf_counter() - starttime))
+
+        run.column_cache.clear()
+        starttime = time.perf_counter()
+        run.traces(walkers)
+        print('{:>8d} walkers  batched             {:10.4f} s'.format(len(walkers), time.perf_counter() - starttime))
@@ -0,0 +1,64 @@
+'''Benchmark of building a ``TrajTreeSet`` over all segments of a simulation, storing it, and
+reading it back.
+
+Usage: python bench_trajtree.py [n_iters [n_segs]]
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from westpa.core.h5io import WESTPAH5File
+from westpa.tools.selected_segs import AllSegmentSelection
+from westpa.trajtree import TrajTreeSet
+
+seg_index_dtype = np.dtype([('weight', np.float64), ('parent_id', np.int64)])
+
+
+class DataManager:
+    def __init__(self, h5file, n_iters):
+        self.h5file = h5file
+        self.current_iteration = n_iters + 1
+
+    def get_iter_group(self, n_iter):
+        return self.h5file.get_iter_group(n_iter)
+
+    def get_all_parent_ids(self, n_iter):
+        return self.get_iter_group(n_iter)['seg_index']['parent_id']
+
+
+def make_file(filename, n_iters, n_segs):
+    h5file = WESTPAH5File(filename, 'w')
+    iterations = h5file.create_group('iterations')
+    rng = np.random.default_rng(1)
+    for n_iter in range(1, n_iters + 1):
+        seg_index = np.zeros((n_segs,), dtype=seg_index_dtype)
+        seg_index['parent_id'] = rng.integers(n_segs, size=n_segs) if n_iter > 1 else -1
+        iterations.create_group(h5file.iter_object_name(n_iter))['seg_index'] = seg_index
+    return h5file
+
+
+if __name__ == '__main__':
+    n_iters = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_segs = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        h5file = make_file(os.path.join(tmpdir, 'west.h5'), n_iters, n_segs)
+        data_manager = DataManager(h5file, n_iters)
+
+        starttime = time.perf_counter()
+        tree = TrajTreeSet(AllSegmentSelection(data_manager=data_manager), data_manager)
+        print('{:>10d} segments  build     {:10.4f} s'.format(len(tree), time.perf_counter() - starttime))
+
+        filename = os.path.join(tmpdir, 'trajtree.h5')
+        starttime = time.perf_counter()
+        tree.save(filename)
+        print('{:>10d} segments  save      {:10.4f} s'.format(len(tree), time.perf_counter() - starttime))
+
+        starttime = time.perf_counter()
+        TrajTreeSet.load(filename)
+        print('{:>10d} segments  load      {:10.4f} s'.format(len(tree), time.perf_counter() - starttime))
+        h5file.close()
@@ -0,0 +1,92 @@
+'''Benchmark of the HDF5 write pattern used by ``WESTDataManager.update_segments``.
+
+Compares the original per-segment strategy (one ``select_hyperslab`` per segment
+and one aux data write per segment per data set) against the coalesced strategy
+(runs of consecutive segment IDs written in bulk, once per data set).
+
+Usage: python bench_update_segments.py [n_segments ...]
+'''
+
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+from h5py import h5s
+
+from westpa.core.data_manager import coalesce_seg_id_runs, write_seg_id_rows
+
+pcoord_len = 21
+pcoord_ndim = 2
+aux_shape = (pcoord_len, 3)
+n_aux = 3
+
+
+def write_per_segment(h5group, seg_ids, pcoords, auxdata):
+    pc_dsid = h5group['pcoord'].id
+    pc_msel = h5s.create_simple(pcoords.shape, (h5s.UNLIMITED,) * pcoords.ndim)
+    pc_msel.select_all()
+    pc_fsel = pc_dsid.get_space()
+    for iseg, seg_id in enumerate(seg_ids):
+        op = h5s.SELECT_OR if iseg != 0 else h5s.SELECT_SET
+        pc_fsel.select_hyperslab((seg_id, 0, 0), (1, pcoord_len, pcoord_ndim), op=op)
+    pc_dsid.write(pc_msel, pc_fsel, pcoords)
+
+    for dsname, data in auxdata.items():
+        dset = h5group[dsname]
+        for iseg, seg_id in enumerate(seg_ids):
+            source_sel = h5s.create_simple(aux_shape, (h5s.UNLIMITED,) * len(aux_shape))
+            source_sel.select_all()
+            dest_sel = dset.id.get_space()
+            dest_sel.select_hyperslab((seg_id,) + (0,) * len(aux_shape), (1,) + aux_shape)
+            dset.id.write(source_sel, dest_sel, data[iseg])
+
+
+def write_coalesced(h5group, seg_ids, pcoords, auxdata):
+    seg_id_runs = coalesce_seg_id_runs(seg_ids)
+    write_seg_id_rows(h5group['pcoord'], seg_ids, pcoords, seg_id_runs)
+    for dsname, data in auxdata.items():
+        write_seg_id_rows(h5group[dsname], seg_ids, data, seg_id_runs)
+
+
+def run(n_segments):
+    # A contiguous set of segments, a strided set (worst case for coalescing), and a sparse
+    # random set
+    cases = {
+        'contiguous': np.arange(n_segments),
+        'strided': np.arange(0, n_segments, 2),
+        'sparse': np.sort(np.random.choice(n_segments, n_segments // 10, replace=False)),
+    }
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for case, seg_ids in cases.items():
+            pcoords = np.random.random((len(seg_ids), pcoord_len, pcoord_ndim)).astype(np.float32)
+            auxdata = {'aux{:d}'.format(i): np.random.random((len(seg_ids),) + aux_shape) for i in range(n_aux)}
+            timings = []
+            for method in (write_per_segment, write_coalesced):
+                with h5py.File(os.path.join(tmpdir, '{}_{}.h5'.format(case, method.__name__)), 'w') as h5file:
+                    h5file.create_dataset('pcoord', shape=(n_segments, pcoord_len, pcoord_ndim), dtype=np.float32)
+                    for dsname in auxdata:
+                        h5file.create_dataset(dsname, shape=(n_segments,) + aux_shape, dtype=np.float64)
+                    t0 = time.perf_counter()
+                    method(h5file, seg_ids, pcoords, auxdata)
+                    h5file.flush()
+                    timings.append(time.perf_counter() - t0)
+
+                    assert (h5file['pcoord'][seg_ids.tolist()] == pcoords).all()
+            results.append((n_segments, case) + tuple(timings))
+    return results
+
+
+def main(sizes):
+    print('{:>8s} {:>12s} {:>14s} {:>14s} {:>8s}'.format('n_segs', 'layout', 'per-segment/s', 'coalesced/s', 'speedup'))
+    for n_segments in sizes:
+        for n, case, t_old, t_new in run(n_segments):
+            print('{:8d} {:>12s} {:14.4f} {:14.4f} {:8.1f}'.format(n, case, t_old, t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000])
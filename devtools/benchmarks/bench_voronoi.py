@@ -0,0 +1,35 @@
+'''Benchmark of ``VoronoiBinMapper`` assignment with a Python distance function and with
+the built-in KD-tree Euclidean distance.
+
+Usage: python bench_voronoi.py [n_centers ...]
+'''
+
+import sys
+import timeit
+
+import numpy as np
+
+from westpa.core.binning.assign import VoronoiBinMapper, coord_dtype
+
+n_coords = 20000
+ndim = 3
+
+
+def dfunc(p, centers):
+    return np.sqrt(((centers - p) ** 2).sum(axis=1))
+
+
+def run(n_centers):
+    rng = np.random.default_rng(0)
+    centers = rng.random((n_centers, ndim)).astype(coord_dtype)
+    coords = rng.random((n_coords, ndim)).astype(coord_dtype)
+
+    for label, mapper in [('dfunc', VoronoiBinMapper(dfunc, centers)), ('kdtree', VoronoiBinMapper(None, centers))]:
+        number, elapsed = timeit.Timer(lambda: mapper.assign(coords)).autorange()
+        print('{:>6d} centers  {:<8s} {:10.2f} ms per {} coordinates'.format(n_centers, label, 1e3 * elapsed / number, n_coords))
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 1000]
+    for n_centers in sizes:
+        run(n_centers)
@@ -0,0 +1,52 @@
+'''Benchmark of ``WEDriver.assign`` called for each block of segments as it completes
+propagation, as done by the simulation manager, followed by filling the bins. The last tenth
+of the progress coordinate range is a target state.
+
+Usage: python bench_we_assign.py [n_segments [block_size [n_bins]]]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from westpa.core.binning import RectilinearBinMapper
+from westpa.core.segment import Segment
+from westpa.core.states import TargetState
+from westpa.core.systems import WESTSystem
+from westpa.core.we_driver import WEDriver
+
+
+def run(n_segments, block_size, n_bins):
+    system = WESTSystem()
+    system.bin_mapper = RectilinearBinMapper([list(np.linspace(0.0, 0.9, n_bins)) + [1.0]])
+    system.bin_target_counts = np.full((n_bins,), 10)
+    system.pcoord_len = 21
+
+    rng = np.random.default_rng(0)
+    pcoords = rng.random((n_segments, system.pcoord_len, system.pcoord_ndim)).astype(system.pcoord_dtype)
+    segments = [Segment(n_iter=1, seg_id=seg_id, weight=1.0 / n_segments, pcoord=pcoord) for seg_id, pcoord in enumerate(pcoords)]
+
+    we_driver = WEDriver(system=system)
+    we_driver.new_iteration(target_states=[TargetState('target', [0.95], 0)])
+
+    starttime = time.perf_counter()
+    for istart in range(0, n_segments, block_size):
+        we_driver.assign(segments[istart : istart + block_size])
+    assigned = time.perf_counter()
+    n_binned = sum(len(_bin) for _bin in we_driver.final_binning)
+    binned = time.perf_counter()
+
+    assert n_binned == n_segments
+    print(
+        '{:>8d} segments  blocks of {:>5d}  assign {:8.3f} s  fill bins {:8.3f} s'.format(
+            n_segments, block_size, assigned - starttime, binned - assigned
+        )
+    )
+
+
+if __name__ == '__main__':
+    n_segments = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    block_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    n_bins = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    run(n_segments, block_size, n_bins)
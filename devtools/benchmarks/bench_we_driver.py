@@ -0,0 +1,60 @@
+'''Benchmark of weighted ensemble resampling (``WEDriver.construct_next``), using array-based
+resampling across all bins and the per-bin implementation used with custom subgroup functions.
+
+Usage: python bench_we_driver.py [n_bins [target_count]]
+'''
+
+import sys
+import time
+
+import numpy as np
+
+from westpa.core.binning import RectilinearBinMapper
+from westpa.core.segment import Segment
+from westpa.core.systems import WESTSystem
+from westpa.core.we_driver import WEDriver, _group_walkers_identity
+
+
+def make_segments(system, n_bins, target_count, rng):
+    counts = rng.integers(1, 2 * target_count, size=n_bins)
+    n_segments = counts.sum()
+    weights = rng.lognormal(sigma=2.0, size=n_segments)
+    weights /= weights.sum()
+    positions = np.repeat(np.arange(n_bins), counts) + 0.5
+
+    segments = []
+    for seg_id, (position, weight) in enumerate(zip(positions, weights)):
+        pcoord = system.new_pcoord_array()
+        pcoord[:] = position
+        segments.append(Segment(n_iter=1, seg_id=seg_id, weight=weight, pcoord=pcoord))
+    return segments
+
+
+def run(n_bins, target_count):
+    system = WESTSystem()
+    system.bin_mapper = RectilinearBinMapper([np.arange(n_bins + 1.0)])
+    system.bin_target_counts = np.full((n_bins,), target_count)
+    system.pcoord_len = 2
+    segments = make_segments(system, n_bins, target_count, np.random.default_rng(0))
+
+    for label, subgroup_function in [
+        ('array', _group_walkers_identity),
+        ('per bin', lambda we_driver, ibin, **kwargs: _group_walkers_identity(we_driver, ibin, **kwargs)),
+    ]:
+        we_driver = WEDriver(system=system)
+        we_driver.subgroup_function = subgroup_function
+        we_driver.new_iteration()
+        we_driver.assign(segments)
+
+        starttime = time.perf_counter()
+        we_driver.construct_next()
+        elapsed = time.perf_counter() - starttime
+
+        n_walkers = len(list(we_driver.next_iter_segments))
+        print('{:>6d} bins  {:>7d} -> {:>7d} walkers  {:<8s} {:10.3f} s'.format(n_bins, len(segments), n_walkers, label, elapsed))
+
+
+if __name__ == '__main__':
+    n_bins = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    target_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(n_bins, target_count)
@@ -0,0 +1,51 @@
+'''Benchmark of task prefetching in the ZeroMQ work manager.
+
+Runs many short tasks on local ZeroMQ workers with different prefetch depths, and reports
+the total run time along with the idle time between tasks reported by each worker.
+
+Usage: python bench_zmq_prefetch.py [n_tasks [task_duration [n_workers]]]
+'''
+
+import sys
+import time
+
+from westpa.work_managers.zeromq import ZMQWorkManager
+
+
+def short_task(duration):
+    time.sleep(duration)
+    return duration
+
+
+def run(prefetch_depth, n_tasks, task_duration, n_workers):
+    work_manager = ZMQWorkManager(n_local_workers=n_workers)
+    for worker in work_manager.local_workers:
+        worker.prefetch_depth = prefetch_depth
+
+    with work_manager:
+        # Warm up, so that all workers have contacted the master
+        work_manager.wait_all(work_manager.submit_many([(short_task, (0,), {})] * n_workers))
+
+        starttime = time.perf_counter()
+        futures = work_manager.submit_many([(short_task, (task_duration,), {})] * n_tasks)
+        work_manager.wait_all(futures)
+        elapsed = time.perf_counter() - starttime
+
+        # Wait for the final task requests, which carry the final statistics
+        time.sleep(0.5)
+        statistics = dict(work_manager.worker_statistics)
+
+    idle_times = sorted(stats.get('idle_time', 0.0) for stats in statistics.values())
+    print(
+        'prefetch depth {:>3d}  {:8.3f} s total  idle per worker: {}'.format(
+            prefetch_depth, elapsed, ' '.join('{:.3f}'.format(idle_time) for idle_time in idle_times)
+        )
+    )
+
+
+if __name__ == '__main__':
+    n_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    task_duration = float(sys.argv[2]) if len(sys.argv) > 2 else 0.002
+    n_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    for prefetch_depth in (1, 2, 4):
+        run(prefetch_depth, n_tasks, task_duration, n_workers)
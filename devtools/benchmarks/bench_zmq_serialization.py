@@ -0,0 +1,63 @@
+'''Benchmark of ZeroMQ message serialization for results carrying progress coordinate arrays.
+
+Sends ``Result`` messages containing lists of segments over an IPC socket pair, once pickled
+whole (``send_pyobj``) and once through ``ZMQCore.send_message``, which sends large array
+buffers as separate frames without copying.
+
+Usage: python bench_zmq_serialization.py [pcoord_len ...]
+'''
+
+import sys
+import timeit
+
+import numpy as np
+import zmq
+
+from westpa.core.segment import Segment
+from westpa.work_managers.zeromq.core import Message, Result, ZMQCore
+
+n_segments = 100
+pcoord_ndim = 3
+
+
+def run(pcoord_len, core, send_socket, recv_socket):
+    segments = [
+        Segment(n_iter=1, seg_id=seg_id, pcoord=np.random.random((pcoord_len, pcoord_ndim)).astype(np.float32))
+        for seg_id in range(n_segments)
+    ]
+    result = Result(task_id=0, result=segments)
+
+    def pickled():
+        send_socket.send_pyobj(Message(Message.RESULT, result), 0)
+        recv_socket.recv_pyobj()
+
+    def multipart():
+        core.send_message(send_socket, Message.RESULT, payload=result)
+        core.recv_message(recv_socket, validate=False)
+
+    for label, roundtrip in [('pickle', pickled), ('multipart', multipart)]:
+        number, elapsed = timeit.Timer(roundtrip).autorange()
+        print(
+            'pcoord_len {:>8d}  {:<10s} {:12.1f} us/message ({} segments)'.format(
+                pcoord_len, label, 1e6 * elapsed / number, n_segments
+            )
+        )
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [21, 1001, 10001]
+    context = zmq.Context()
+    core = ZMQCore()
+    endpoint = core.make_ipc_endpoint()
+    send_socket = context.socket(zmq.PAIR)
+    recv_socket = context.socket(zmq.PAIR)
+    send_socket.bind(endpoint)
+    recv_socket.connect(endpoint)
+    try:
+        for pcoord_len in sizes:
+            run(pcoord_len, core, send_socket, recv_socket)
+    finally:
+        send_socket.close(linger=0)
+        recv_socket.close(linger=0)
+        context.term()
+        core.remove_ipc_endpoints()
@@ -1,13 +1,91 @@
+import collections
 import itertools
 import numpy as np
 import pandas as pd
 import sys
 
+from westpa.core.ancestry import AncestryIndex
 from westpa.core.binning.assign import BinMapper
-from westpa.core.h5io import WESTPAH5File, tostr
+from westpa.core.h5io import WESTPAH5File, load_bin_transitions, tostr
 from westpa.core.segment import Segment
 from westpa.core.states import BasisState, InitialState, TargetState
-from westpa.tools.binning import mapper_from_hdf5
+from westpa.tools.binning import AssignmentCache, assign_segment_coords, mapper_from_hdf5
+
+
+ColumnCacheInfo = collections.namedtuple('ColumnCacheInfo', ['hits', 'misses', 'maxbytes', 'currbytes'])
+
+
+class ColumnCache:
+    """A least-recently-used cache of iteration datasets, or fields of datasets,
+    bounded by the total size of the arrays held.
+
+    Arrays are cached read-only, as they are shared by all readers.
+
+    Parameters
+    ----------
+    maxbytes : int
+        Memory budget of the cache, in bytes. Datasets larger than this
+        are not cached.
+
+    """
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.currbytes = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, iteration, name, field=None):
+        """Return the contents of a dataset of an iteration.
+
+        Parameters
+        ----------
+        iteration : Iteration
+            The iteration.
+        name : str
+            Name of the dataset, relative to the iteration group.
+        field : str, optional
+            Name of the field of a compound dataset to return.
+
+        Returns
+        -------
+        ndarray or None
+            The (read-only) contents of the dataset, or None if it does not fit
+            in the cache.
+
+        """
+        key = (iteration.number, name, field)
+        array = self._entries.get(key)
+        if array is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return array
+
+        dataset = iteration.h5group[name]
+        itemsize = dataset.dtype[field].itemsize if field else dataset.dtype.itemsize
+        nbytes = dataset.size * itemsize
+        if nbytes > self.maxbytes:
+            return None
+
+        self.misses += 1
+        array = dataset[field] if field else dataset[...]
+        array.flags.writeable = False
+        self._entries[key] = array
+        self.currbytes += nbytes
+        while self.currbytes > self.maxbytes:
+            _key, evicted = self._entries.popitem(last=False)
+            self.currbytes -= evicted.nbytes
+        return array
+
+    def info(self):
+        """ColumnCacheInfo: Numbers of hits and misses, and the maximum and current size in bytes."""
+        return ColumnCacheInfo(self.hits, self.misses, self.maxbytes, self.currbytes)
+
+    def clear(self):
+        """Remove all cached arrays and reset the hit and miss counts."""
+        self._entries.clear()
+        self.hits = self.misses = self.currbytes = 0
 
 
 class Run:
@@ -17,13 +95,26 @@ class Run:
     ----------
     h5filename : str or file-like object, default 'west.h5'
         Pathname or stream of a main WESTPA HDF5 data file.
+    assignment_cache : str or AssignmentCache, optional
+        Pathname of a sidecar HDF5 file in which bin assignments made by
+        :meth:`Iteration.bin_assignments` are cached.
+    ancestry_index : str, optional
+        Pathname of a sidecar HDF5 file in which the :attr:`ancestry` index
+        is stored, so that it is only updated with new iterations when the
+        run is opened again.
+    column_cache_size : int, default 256 MiB
+        Memory budget, in bytes, of the :attr:`column_cache` from which walker
+        properties are read.
 
     """
 
     DESCRIPTION = 'WESTPA Run'
 
-    def __init__(self, h5filename='west.h5'):
+    def __init__(self, h5filename='west.h5', assignment_cache=None, ancestry_index=None, column_cache_size=256 * 2**20):
+        self.column_cache = ColumnCache(column_cache_size)
         self.h5filename = h5filename
+        self.assignment_cache = assignment_cache
+        self.ancestry_index = ancestry_index
 
     def __enter__(self):
         return self
@@ -32,20 +123,35 @@ class Run:
         self.close()
 
     @classmethod
-    def open(cls, h5filename='west.h5'):
+    def open(cls, h5filename='west.h5', assignment_cache=None, ancestry_index=None, column_cache_size=256 * 2**20):
         """Alternate constructor.
 
         Parameters
         ----------
         h5filename : str or file-like object, default 'west.h5'
             Pathname or stream of a main WESTPA HDF5 data file.
+        assignment_cache : str or AssignmentCache, optional
+            Pathname of a sidecar HDF5 file in which bin assignments made by
+            :meth:`Iteration.bin_assignments` are cached.
+        ancestry_index : str, optional
+            Pathname of a sidecar HDF5 file in which the :attr:`ancestry` index
+            is stored.
+        column_cache_size : int, default 256 MiB
+            Memory budget, in bytes, of the :attr:`column_cache`.
 
         """
-        return cls(h5filename)
+        return cls(
+            h5filename,
+            assignment_cache=assignment_cache,
+            ancestry_index=ancestry_index,
+            column_cache_size=column_cache_size,
+        )
 
     def close(self):
         """Close the Run instance by closing the underlying WESTPA HDF5 file."""
         self.h5file.close()
+        if self.assignment_cache is not None:
+            self.assignment_cache.close()
 
     @property
     def closed(self):
@@ -64,6 +170,26 @@ class Run:
             e.strerror = f'Failed to open {self.DESCRIPTION}: file {value!r} not found'
             raise e.with_traceback(None)
         self.h5file = h5file
+        self._ancestry = None
+        self.column_cache.clear()
+
+    @property
+    def assignment_cache(self):
+        """AssignmentCache or None: Cache of bin assignments."""
+        return self._assignment_cache
+
+    @assignment_cache.setter
+    def assignment_cache(self, value):
+        if value is not None and not isinstance(value, AssignmentCache):
+            value = AssignmentCache(value)
+        self._assignment_cache = value
+
+    @property
+    def ancestry(self):
+        """AncestryIndex: Index of the parents of all walkers, read on first use."""
+        if self._ancestry is None:
+            self._ancestry = AncestryIndex(self.h5file, filename=self.ancestry_index)
+        return self._ancestry
 
     @property
     def summary(self):
@@ -138,6 +264,38 @@ class Run:
             raise ValueError(f'iteration number must be in {valid_range}')
         return Iteration(number, self)
 
+    def traces(self, walkers, source=None, max_length=None):
+        """Return the traces (ancestral lines) of several walkers.
+
+        The traces are built together, walking back one iteration at a
+        time, so that the walkers of each iteration are read at once and
+        ancestors shared by several traces are read only once (and are
+        the same :class:`Walker` objects).
+
+        Parameters
+        ----------
+        walkers : Iterable[Walker]
+            The terminal walkers.
+        source : Bin, BinUnion, or collections.abc.Container, optional
+            A source (macro)state. See :class:`Trace`.
+        max_length : int, optional
+            The maximum number of walkers in each trace.
+
+        Returns
+        -------
+        list[Trace]
+            The trace of each walker.
+
+        """
+        walkers = list(walkers)
+        if any(walker.run != self for walker in walkers):
+            raise ValueError('walkers must belong to this run')
+        max_length = _check_max_length(max_length)
+        return [
+            Trace._from_ancestors(ancestors, initial_state, source, max_length)
+            for ancestors, initial_state in _trace_walkers(self, walkers, source, max_length)
+        ]
+
     def __len__(self):
         return self.num_iterations
 
@@ -222,15 +380,25 @@ class Iteration:
 
         return df
 
+    def _column(self, name, field=None):
+        # Contents of a dataset (or field) from the column cache of the run, or None if too large
+        return self.run.column_cache.get(self, name, field)
+
     @property
     def pcoords(self):
         """3D ndarray: Progress coordinate snaphots of each walker."""
-        return self.h5group['pcoord'][:]
+        pcoords = self._column('pcoord')
+        if pcoords is None:
+            return self.h5group['pcoord'][:]
+        return pcoords.copy()
 
     @property
     def weights(self):
         """1D ndarray: Statistical weight of each walker."""
-        return self.h5group['seg_index']['weight']
+        weights = self._column('seg_index', 'weight')
+        if weights is None:
+            return self.h5group['seg_index']['weight']
+        return weights.copy()
 
     @property
     def bin_target_counts(self):
@@ -242,12 +410,26 @@ class Iteration:
 
     @property
     def bin_mapper(self):
-        """BinMapper: Bin mapper used in the iteration."""
+        """BinMapper: Bin mapper used in the iteration (shared through ``westpa.core.h5io.bin_mapper_cache``)."""
         if self.bin_target_counts is None:
             return None
         mapper, _, _ = mapper_from_hdf5(self.run.h5file['bin_topologies'], self.h5group.attrs['binhash'])
         return mapper
 
+    @property
+    def bin_fluxes(self):
+        """scipy.sparse.csr_matrix or None: Flux between each pair of bins, indexed by
+        initial and final bin (saved only if ``save_transition_matrices`` is enabled)."""
+        fluxes, _ = load_bin_transitions(self.h5group)
+        return fluxes
+
+    @property
+    def bin_transition_counts(self):
+        """scipy.sparse.csr_matrix or None: Number of transitions between each pair of bins,
+        indexed by initial and final bin (saved only if ``save_transition_matrices`` is enabled)."""
+        _, counts = load_bin_transitions(self.h5group)
+        return counts
+
     @property
     def num_bins(self):
         """int: Number of bins."""
@@ -279,7 +461,9 @@ class Iteration:
     @property
     def recycled_walkers(self):
         """Iterable[Walker]: Walkers that stopped in the sink."""
-        endpoint_type = self.h5group['seg_index']['endpoint_type']
+        endpoint_type = self._column('seg_index', 'endpoint_type')
+        if endpoint_type is None:
+            endpoint_type = self.h5group['seg_index']['endpoint_type']
         indices = np.flatnonzero(endpoint_type == Segment.SEG_ENDPOINT_RECYCLED)
         return (Walker(index, self) for index in indices)
 
@@ -370,6 +554,54 @@ class Iteration:
         """
         return Bin(index, self.bin_mapper)
 
+    def bin_assignments(self, mapper=None):
+        """Assign the progress coordinate snapshots of each walker to bins.
+
+        Assignments are read from the assignment cache of the run, if any, when
+        the same snapshots were assigned with the same bin mapper before.
+
+        Parameters
+        ----------
+        mapper : BinMapper, optional
+            The bin mapper to use. Defaults to the bin mapper of the iteration.
+
+        Returns
+        -------
+        2D ndarray
+            The bin index of each snapshot of each walker.
+
+        """
+        if mapper is None:
+            mapper = self.bin_mapper
+            if mapper is None:
+                raise ValueError(f'no bin mapper is stored for iteration {self.number}')
+        cache = self.run.assignment_cache
+        if cache is None:
+            return assign_segment_coords(mapper, self.pcoords)
+        return cache.assign(mapper, self.number, self.pcoords)
+
+    def children_of(self, indices):
+        """Return the indices of the children of the given walkers.
+
+        The children of all walkers of the iteration are looked up at once
+        in the :attr:`Run.ancestry` index, on first use.
+
+        Parameters
+        ----------
+        indices : Iterable[int]
+            Walker indices (0-based).
+
+        Returns
+        -------
+        list[1D ndarray]
+            For each walker, the indices of its children in the next iteration.
+
+        """
+        if self.number == self.run.num_iterations:
+            return [np.empty((0,), dtype=np.int64) for _index in indices]
+        offsets, child_ids = self.run.ancestry.child_index(self.number)
+        return [child_ids[offsets[index] : offsets[index + 1]] for index in indices]
+
     def walker(self, index):
         """Return the walker with the given index.
 
@@ -471,12 +703,20 @@ class Walker:
     @property
     def weight(self):
         """float64: Statistical weight of the walker."""
-        return self.iteration.weights[self.index]
+        return self._column_item('seg_index', 'weight')
 
     @property
     def pcoords(self):
         """2D ndarray: Progress coordinate snapshots."""
-        return self.iteration.h5group['pcoord'][self.index]
+        return np.array(self._column_item('pcoord'))
+
+    def _column_item(self, name, field=None):
+        # Item of a dataset (or field) of the iteration, from the column cache if it fits
+        column = self.iteration._column(name, field)
+        if column is None:
+            dataset = self.iteration.h5group[name]
+            return dataset[self.index][field] if field else dataset[self.index]
+        return column[self.index]
 
     @property
     def num_snapshots(self):
@@ -503,7 +743,7 @@ class Walker:
     @property
     def parent(self):
         """Walker or InitialState: The parent of the walker."""
-        parent_id = self.iteration.h5group['seg_index']['parent_id'][self.index]
+        parent_id = self.run.ancestry.parents(self.iteration.number, self.index)
 
         if parent_id >= 0:
             return Walker(parent_id, self.iteration.prev)
@@ -536,25 +776,25 @@ class Walker:
         next = self.iteration.next
         if next is None:
             return ()
-        indices = np.flatnonzero(next.h5group['seg_index']['parent_id'] == self.index)
+        indices = self.iteration.children_of([self.index])[0]
         return (Walker(index, next) for index in indices)
 
     @property
     def recycled(self):
         """bool: True if the walker stopped in the sink, False otherwise."""
-        endpoint_type = self.iteration.h5group['seg_index']['endpoint_type'][self.index]
+        endpoint_type = self._column_item('seg_index', 'endpoint_type')
         return endpoint_type == Segment.SEG_ENDPOINT_RECYCLED
 
     @property
     def initial(self):
         """bool: True if the parent of the walker is an initial state, False otherwise."""
-        return self.iteration.h5group['seg_index']['parent_id'][self.index] < 0
+        return self.run.ancestry.parents(self.iteration.number, self.index) < 0
 
     @property
     def auxiliary_data(self):
         """dict: Auxiliary data for the walker."""
         data = self.iteration.auxiliary_data or {}
-        return {name: data[name][self.index] for name in data}
+        return {name: np.array(self._column_item('auxdata/' + name)) for name in data}
 
     def trace(self, **kwargs):
         """Return the trace (ancestral line) of the walker.
@@ -700,31 +940,22 @@ class Trace:
     """
 
     def __init__(self, walker, source=None, max_length=None):
-        if max_length is None:
-            max_length = sys.maxsize
-        else:
-            max_length = int(max_length)
-            if max_length < 1:
-                raise ValueError('max_length must be at least 1')
-
-        walkers = []
-        initial_state = None
-        while len(walkers) < max_length:
-            if source and walker.pcoords[-1] in source:
-                break
-            walkers.append(walker)
-            parent = walker.parent
-            if isinstance(parent, InitialState):
-                initial_state = parent
-                break
-            walker = parent
-        walkers.reverse()
-
+        max_length = _check_max_length(max_length)
+        [(walkers, initial_state)] = _trace_walkers(walker.run, [walker], source, max_length)
         self.walkers = walkers
         self.initial_state = initial_state
         self.source = source
         self.max_length = max_length
 
+    @classmethod
+    def _from_ancestors(cls, walkers, initial_state, source, max_length):
+        trace = cls.__new__(cls)
+        trace.walkers = walkers
+        trace.initial_state = initial_state
+        trace.source = source
+        trace.max_length = max_length
+        return trace
+
     def __len__(self):
         return len(self.walkers)
 
@@ -744,3 +975,72 @@ class Trace:
         if self.max_length < sys.maxsize:
             s += f', max_length={self.max_length}'
         return s + ')'
+
+
+def _check_max_length(max_length):
+    if max_length is None:
+        return sys.maxsize
+    max_length = int(max_length)
+    if max_length < 1:
+        raise ValueError('max_length must be at least 1')
+    return max_length
+
+
+def _trace_walkers(run, walkers, source, max_length):
+    # Walk back from the latest iteration, keeping the current ancestor (frontier) of each
+    # lineage. The distinct ancestors in each iteration are read at once.
+    n_lineages = len(walkers)
+    current_iter = np.array([walker.iteration.number for walker in walkers], dtype=np.int64)
+    current_seg = np.array([walker.index for walker in walkers], dtype=np.int64)
+    active = np.ones((n_lineages,), dtype=np.bool_)
+    lengths = np.zeros((n_lineages,), dtype=np.int64)
+    reached_initial = np.zeros((n_lineages,), dtype=np.bool_)
+
+    steps = []
+    for n_iter in range(current_iter.max(initial=0), 0, -1):
+        lineages = np.flatnonzero(active & (current_iter == n_iter))
+        truncated = lengths[lineages] >= max_length
+        active[lineages[truncated]] = False
+        lineages = lineages[~truncated]
+        if not len(lineages):
+            continue
+
+        iteration = Iteration(n_iter, run)
+        seg_ids, inverse = np.unique(current_seg[lineages], return_inverse=True)
+        if source:
+            pcoords = iteration._column('pcoord')
+            if pcoords is None:
+                final_pcoords = iteration.h5group['pcoord'][seg_ids][:, -1]
+            else:
+                final_pcoords = pcoords[seg_ids, -1]
+            in_source = np.array([pcoord in source for pcoord in final_pcoords], dtype=np.bool_)[inverse]
+            active[lineages[in_source]] = False
+            lineages = lineages[~in_source]
+            inverse = inverse[~in_source]
+
+        steps.append((iteration, seg_ids, lineages, inverse))
+        lengths[lineages] += 1
+        parent_ids = run.ancestry.parents(n_iter, seg_ids)[inverse]
+        initial = parent_ids < 0
+        active[lineages[initial]] = False
+        reached_initial[lineages[initial]] = True
+        current_seg[lineages] = parent_ids
+        current_iter[lineages] = n_iter - 1
+
+    ancestors = [[] for _ in range(n_lineages)]
+    for iteration, seg_ids, lineages, inverse in reversed(steps):
+        iter_walkers = [Walker(seg_id, iteration) for seg_id in seg_ids]
+        for lineage, i in zip(lineages, inverse):
+            ancestors[lineage].append(iter_walkers[i])
+
+    initial_states = {}
+    results = []
+    for lineage_ancestors, initial in zip(ancestors, reached_initial):
+        initial_state = None
+        if initial:
+            first = lineage_ancestors[0]
+            initial_state = initial_states.get(first)
+            if initial_state is None:
+                initial_state = initial_states[first] = first.parent
+        results.append((lineage_ancestors, initial_state))
+    return results
@@ -1,16 +1,27 @@
+import hashlib
 import logging
 import math
 import os
+from pickle import PickleError
 
 import numpy as np
 from numpy import index_exp
 
 from westpa.core.data_manager import seg_id_dtype, weight_dtype
 from westpa.core.binning import index_dtype, assign_and_label, accumulate_labeled_populations
-from westpa.tools import WESTParallelTool, WESTDataReader, WESTDSSynthesizer, BinMappingComponent, ProgressIndicatorComponent
+from westpa.tools import (
+    WESTParallelTool,
+    WESTDataReader,
+    WESTDSSynthesizer,
+    AssignmentCache,
+    BinMappingComponent,
+    ProgressIndicatorComponent,
+)
+from westpa.tools.binning import assign_segment_coords
 import westpa
 from westpa.core import h5io
-from westpa.core.h5io import WESTPAH5File
+from westpa.core.ancestry import fingerprint_fields
+from westpa.core.h5io import WESTPAH5File, SingleDSSpec, MultiDSSpec
 from westpa.core.extloader import get_object
 
 log = logging.getLogger('w_assign')
@@ -30,20 +41,46 @@ def parse_pcoord_value(pc_str):
     return arr
 
 
+def _copy_assignments(bin_assignments, mask, output):
+    output[mask] = bin_assignments[mask]
+    return output
+
+
 def _assign_label_pop(
-    n_iter, lb, ub, mapper, nstates, state_map, last_labels, parent_id_dsspec, weight_dsspec, pcoord_dsspec, subsample
+    n_iter,
+    lb,
+    ub,
+    mapper,
+    nstates,
+    state_map,
+    last_labels,
+    parent_id_dsspec,
+    weight_dsspec,
+    pcoord_dsspec,
+    subsample,
+    bin_assignments=None,
+    checksum_chunk=None,
 ):
     nbins = len(state_map) - 1
     parent_ids = parent_id_dsspec.get_iter_data(n_iter, index_exp[lb:ub])
     weights = weight_dsspec.get_iter_data(n_iter, index_exp[lb:ub])
-    pcoords = pcoord_dsspec.get_iter_data(n_iter, index_exp[lb:ub])
+
+    # Bin assignments are given if they were found in the assignment cache, in which case coordinates
+    # are read only to checksum them, in chunks of ``checksum_chunk`` segments
+    checksums = None
+    if bin_assignments is None or checksum_chunk:
+        pcoords = pcoord_dsspec.get_iter_data(n_iter, index_exp[lb:ub])
+        if bin_assignments is None:
+            bin_assignments = assign_segment_coords(mapper, pcoords)
+        if checksum_chunk:
+            checksums = [AssignmentCache.checksum(pcoords[i : i + checksum_chunk]) for i in range(0, ub - lb, checksum_chunk)]
 
     assignments, trajlabels, statelabels = assign_and_label(
-        lb, ub, parent_ids, mapper.assign, nstates, state_map, last_labels, pcoords, subsample
+        lb, ub, parent_ids, _copy_assignments, nstates, state_map, last_labels, bin_assignments, subsample
     )
     pops = np.zeros((nstates + 1, nbins + 1), weight_dtype)
     accumulate_labeled_populations(weights, assignments, trajlabels, pops)
-    return (assignments, trajlabels, pops, lb, ub, statelabels)
+    return (assignments, trajlabels, pops, lb, ub, statelabels, bin_assignments, checksums)
 
 
 class WAssign(WESTParallelTool):
@@ -224,6 +261,11 @@ Command-line options
         self.output_filename = None
         self.states = []
         self.subsample = False
+        self.assignment_cache = None
+        self.assignment_cache_filename = None
+        self.mapper_hash = None
+        # Number of segments whose coordinates are checksummed together when they cannot be fingerprinted
+        self.checksum_chunk = 32
 
     def add_args(self, parser):
         self.data_reader.add_args(parser)
@@ -274,6 +316,17 @@ Command-line options
             help='''Load bins/macrostates from a scheme specified in west.cfg.''',
         )
         agroup.add_argument('--scheme-name', dest='scheme', help='''Name of scheme specified in west.cfg.''')
+        agroup.add_argument(
+            '--assignment-cache',
+            dest='assignment_cache',
+            metavar='CACHE_FILE',
+            nargs='?',
+            const='',
+            help='''Read and store bin assignments in CACHE_FILE, so that only iterations which were appended
+                             or whose coordinates changed since a previous run with the same bin mapper are
+                             assigned (if CACHE_FILE is not given: the name of the WEST HDF5 file, with
+                             "_assignments.h5" in place of its extension). By default, assignments are not cached.''',
+        )
 
     def process_args(self, args):
         self.progress.process_args(args)
@@ -294,6 +347,11 @@ Command-line options
 
         self.output_filename = args.output
 
+        if args.assignment_cache == '':
+            self.assignment_cache_filename = AssignmentCache.default_filename(self.data_reader.we_h5filename)
+        elif args.assignment_cache:
+            self.assignment_cache_filename = args.assignment_cache
+
         if args.config_from_file:
             if not args.scheme:
                 raise ValueError('A scheme must be specified.')
@@ -389,6 +447,33 @@ Command-line options
         self.states = states
         log.debug('loaded states: {!r}'.format(self.states))
 
+    def cache_fingerprint(self, n_iter):
+        '''Return a fingerprint of the coordinates of iteration ``n_iter`` which can be had without reading them,
+        or None if there is none. Coordinates stored in the WEST HDF5 file do not change once their iteration
+        has been propagated, so they are identified by the names and shapes of their datasets together with
+        the summary of the iteration, as for the ancestry index.'''
+        dsspec = self.dssynth.dsspec
+        dsspecs = dsspec.dsspecs if isinstance(dsspec, MultiDSSpec) else [dsspec]
+        we_h5filename = os.path.abspath(self.data_reader.we_h5filename)
+        if not all(
+            isinstance(dsspec, SingleDSSpec) and os.path.abspath(dsspec._h5filename) == we_h5filename for dsspec in dsspecs
+        ):
+            return None
+
+        try:
+            summary = self.data_reader.we_h5file['summary'][n_iter - 1]
+        except (KeyError, IndexError):
+            return None
+        if not summary['walltime'] > 0:
+            return None
+
+        iter_group = self.data_reader.get_iter_group(n_iter)
+        fields = [tuple(summary[field].item() for field in fingerprint_fields)]
+        for dsspec in dsspecs:
+            dset = iter_group[dsspec.dsname]
+            fields.append((type(dsspec).__name__, dsspec.dsname, repr(dsspec.slice), dset.dtype.str, dset.shape))
+        return 'fingerprint:' + hashlib.sha256(repr(fields).encode('utf-8')).hexdigest()
+
     def assign_iteration(self, n_iter, nstates, nbins, state_map, last_labels):
         '''Method to encapsulate the segment slicing (into n_worker slices) and parallel job submission
         Submits job(s), waits on completion, splices them back together
@@ -396,20 +481,38 @@ Command-line options
 
         futures = []
 
+        # Look up the bin assignments of this iteration by a fingerprint of its coordinates if there is one.
+        # Otherwise, the workers checksum the coordinates they read, and assignments found in the cache
+        # are used only if the checksum matches that of the coordinates they were made for.
         iter_group = self.data_reader.get_iter_group(n_iter)
         nsegs, npts = iter_group['pcoord'].shape[:2]
+
+        cached_assignments = checksum = cached_checksum = checksum_chunk = None
+        if self.assignment_cache is not None:
+            checksum = self.cache_fingerprint(n_iter)
+            if checksum is not None:
+                cached_assignments = self.assignment_cache.get(self.mapper_hash, n_iter, checksum)
+            else:
+                checksum_chunk = self.checksum_chunk
+                cached_assignments, cached_checksum = self.assignment_cache.peek(self.mapper_hash, n_iter)
+                if cached_assignments is not None and cached_assignments.shape != (nsegs, npts):
+                    cached_assignments = None
         n_workers = self.work_manager.n_workers or 1
         assignments = np.empty((nsegs, npts), dtype=index_dtype)
         trajlabels = np.empty((nsegs, npts), dtype=index_dtype)
         statelabels = np.empty((nsegs, npts), dtype=index_dtype)
+        bin_assignments = np.empty((nsegs, npts), dtype=index_dtype)
         pops = np.zeros((nstates + 1, nbins + 1), dtype=weight_dtype)
 
         # Submit jobs to work manager
         blocksize = nsegs // n_workers
         if nsegs % n_workers > 0:
             blocksize += 1
+        if checksum_chunk:
+            # Blocks are made of whole chunks, so that the checksum does not depend on the number of workers
+            blocksize = max(1, -(-blocksize // checksum_chunk)) * checksum_chunk
 
-        def task_gen():
+        def task_gen(cached_assignments, checksum_chunk):
             if __debug__:
                 checkset = set()
             for lb in range(0, nsegs, blocksize):
@@ -429,6 +532,8 @@ Command-line options
                     weight_dsspec=self.data_reader.weight_dsspec,
                     pcoord_dsspec=self.dssynth.dsspec,
                     subsample=self.subsample,
+                    bin_assignments=cached_assignments[lb:ub] if cached_assignments is not None else None,
+                    checksum_chunk=checksum_chunk,
                 )
                 yield (_assign_label_pop, args, kwargs)
 
@@ -437,16 +542,43 @@ Command-line options
             if __debug__:
                 assert checkset == set(range(nsegs)), 'segments missing: {}'.format(set(range(nsegs)) - checkset)
 
-        # for future in self.work_manager.as_completed(futures):
-        for future in self.work_manager.submit_as_completed(task_gen(), queue_size=self.max_queue_len):
-            assign_slice, traj_slice, slice_pops, lb, ub, state_slice = future.get_result(discard=True)
-            assignments[lb:ub, :] = assign_slice
-            trajlabels[lb:ub, :] = traj_slice
-            statelabels[lb:ub, :] = state_slice
-            pops += slice_pops
-            del assign_slice, traj_slice, slice_pops, state_slice
+        def run_tasks(cached_assignments, checksum_chunk):
+            checksums = {}
+            # for future in self.work_manager.as_completed(futures):
+            for future in self.work_manager.submit_as_completed(
+                task_gen(cached_assignments, checksum_chunk), queue_size=self.max_queue_len
+            ):
+                assign_slice, traj_slice, slice_pops, lb, ub, state_slice, bin_slice, slice_checksums = future.get_result(
+                    discard=True
+                )
+                assignments[lb:ub, :] = assign_slice
+                trajlabels[lb:ub, :] = traj_slice
+                statelabels[lb:ub, :] = state_slice
+                bin_assignments[lb:ub, :] = bin_slice
+                pops[...] += slice_pops
+                checksums[lb] = slice_checksums
+                del assign_slice, traj_slice, slice_pops, state_slice, bin_slice
+            if checksum_chunk:
+                return AssignmentCache.combine_checksums(sum((checksums[lb] for lb in sorted(checksums)), []))
+
+        if checksum_chunk:
+            checksum = run_tasks(cached_assignments, checksum_chunk)
+            if cached_assignments is not None and checksum != cached_checksum:
+                # The coordinates changed since they were assigned, so assign them after all (this reads them
+                # again, but only for iterations whose cache entries are stale)
+                cached_assignments = None
+                pops[...] = 0
+                run_tasks(None, None)
+            if cached_assignments is not None:
+                self.assignment_cache.hits += 1
+            else:
+                self.assignment_cache.misses += 1
+        else:
+            run_tasks(cached_assignments, None)
 
         del futures
+        if self.assignment_cache is not None and cached_assignments is None:
+            self.assignment_cache.put(self.mapper_hash, n_iter, checksum, bin_assignments)
         return (assignments, trajlabels, pops, statelabels)
 
     def go(self):
@@ -456,6 +588,23 @@ Command-line options
             assert self.dssynth.dsspec._h5file is None
         pi = self.progress.indicator
         pi.operation = 'Initializing'
+        if self.assignment_cache_filename:
+            try:
+                _pkldat, self.mapper_hash = self.binning.mapper.pickle_and_hash()
+            except (PickleError, AttributeError, TypeError) as e:
+                log.warning('bin mapper cannot be pickled ({}); not caching bin assignments'.format(e))
+            else:
+                self.assignment_cache = AssignmentCache(self.assignment_cache_filename)
+                try:
+                    self.assignment_cache.open()
+                except OSError as e:
+                    log.warning(
+                        'could not open assignment cache {!r} ({}); not caching bin assignments'.format(
+                            self.assignment_cache_filename, e
+                        )
+                    )
+                    self.assignment_cache = None
+
         with pi, self.data_reader, WESTPAH5File(self.output_filename, 'w', creating_program=True) as self.output_file:
             assign = self.binning.mapper.assign
 
@@ -587,6 +736,14 @@ Command-line options
             for dsname in 'assignments', 'npts', 'nsegs', 'labeled_populations', 'statelabels':
                 h5io.stamp_iter_range(self.output_file[dsname], iter_start, iter_stop)
 
+        if self.assignment_cache is not None:
+            log.info(
+                'read assignments of {} iterations from {}; assigned {}'.format(
+                    self.assignment_cache.hits, self.assignment_cache.filename, self.assignment_cache.misses
+                )
+            )
+            self.assignment_cache.close()
+
 
 def entry_point():
     WAssign().main()
@@ -1,6 +1,5 @@
 import logging
 import numpy as np
-import pickle
 
 log = logging.getLogger(__name__)
 from westpa.tools.core import WESTTool
@@ -39,39 +38,15 @@ def get_bin_mapper(we_h5file, hashval):
     '''Look up the given hash value in the binning table, unpickling and returning the corresponding
     bin mapper if available, or raising KeyError if not.'''
 
-    # Convert to a hex digest if we need to
+    # this will raise KeyError if the group doesn't exist, which also means
+    # that bin data is not available, so no special treatment here
     try:
-        hashval = hashval.hexdigest()
-    except AttributeError:
-        pass
-
-    while True:
-        # these will raise KeyError if the group doesn't exist, which also means
-        # that bin data is not available, so no special treatment here
-        try:
-            binning_group = we_h5file['/bin_topologies']
-            index = binning_group['index']
-            pkl = binning_group['pickles']
-        except KeyError:
-            raise KeyError('hash {} not found. Could not retrieve binning group'.format(hashval))
-
-        n_entries = len(index)
-        if n_entries == 0:
-            raise KeyError('hash {} not found. No entries in index'.format(hashval))
-
-        chunksize = 1024
-
-        for istart in range(0, n_entries, chunksize):
-            chunk = index[istart : min(istart + chunksize, n_entries)]
-            for i in range(len(chunk)):
-                if chunk[i]['hash'] == hashval:
-                    pkldat = bytes(pkl[istart + i, 0 : chunk[i]['pickle_len']].data)
-                    mapper = pickle.loads(pkldat)
-                    log.debug('loaded {!r} from {!r}'.format(mapper, binning_group))
-                    log.debug('hash value {!r}'.format(hashval))
-                    return mapper
-
-        raise KeyError('hash {} not found'.format(hashval))
+        binning_group = we_h5file['/bin_topologies']
+    except KeyError:
+        raise KeyError('hash {} not found. Could not retrieve binning group'.format(hashval))
+
+    mapper, _pkldat = h5io.bin_mapper_cache.get(binning_group, hashval)
+    return mapper
 
 
 def create_idtype_array(input_array):
@@ -6,6 +6,7 @@ import numpy as np
 from westpa.tools import WESTTool, WESTDataReader
 import westpa
 from westpa.core import h5io
+from westpa.core.ancestry import AncestryIndex
 
 from westpa.core.segment import Segment
 from westpa.core.states import InitialState
@@ -88,15 +89,69 @@ class Trace:
         # loop terminates with parent_id set to the identifier of the initial state,
         # seg_id set to the identifier of the first segment in the trajectory, and
         # n_iter set to one less than the iteration of the first segment
-        first_iter = n_iter + 1
-        first_seg_id = seg_id
-        first_parent_id = parent_id
+        seginfo.reverse()
+        return cls._from_seginfo(seginfo, endpoint_type, pcoord_dtype, pcoord_pt_shape, parent_id, data_manager)
+
+    @classmethod
+    def from_ancestry(cls, endpoints, ancestry, data_manager=None):
+        '''Construct and return the trajectory traces whose last segments are identified by
+        the ``(n_iter, seg_id)`` pairs ``endpoints``, using ``ancestry`` (an
+        :class:`westpa.core.ancestry.AncestryIndex`) to trace all of them back at once. The
+        segment index rows and final progress coordinates of the segments on the traces
+        are then read with one selection per iteration, rather than one per segment.'''
+
+        data_manager = data_manager or westpa.rc.get_data_manager()
+
+        # Ancestors of each endpoint in each iteration (-1 before its trajectory started or after its end)
+        endpoint_iters = np.array([n_iter for n_iter, _seg_id in endpoints], dtype=np.int64)
+        last_iter = int(endpoint_iters.max(initial=0))
+        ancestors = np.full((len(endpoints), last_iter), -1, dtype=np.int64)
+        for n_iter in np.unique(endpoint_iters).tolist():
+            members = np.flatnonzero(endpoint_iters == n_iter)
+            ancestors[members, :n_iter] = ancestry.trace(n_iter, [endpoints[imember][1] for imember in members.tolist()])
+
+        # Read the segment index rows and final progress coordinates needed from each iteration at once
+        seg_rows = {}
+        pcoord_dtype = pcoord_pt_shape = None
+        for n_iter in range(1, last_iter + 1):
+            seg_ids = np.unique(ancestors[:, n_iter - 1])
+            seg_ids = seg_ids[seg_ids >= 0]
+            if not len(seg_ids):
+                continue
+            iter_group = data_manager.get_iter_group(n_iter)
+            pcoord_ds = iter_group['pcoord']
+            pcoord_dtype = pcoord_ds.dtype
+            pcoord_pt_shape = pcoord_ds.shape[2:]
+            selection = seg_ids.tolist()
+            seg_rows[n_iter] = (seg_ids, iter_group['seg_index'][selection], pcoord_ds[selection, pcoord_ds.shape[1] - 1])
+            del iter_group, pcoord_ds
+
+        traces = []
+        for trace_ancestors in ancestors:
+            seginfo = []
+            first_parent_id = None
+            for n_iter in (np.flatnonzero(trace_ancestors >= 0) + 1).tolist():
+                seg_id = int(trace_ancestors[n_iter - 1])
+                seg_ids, indexrows, final_pcoords = seg_rows[n_iter]
+                irow = int(np.searchsorted(seg_ids, seg_id))
+                indexrow = indexrows[irow]
+                if first_parent_id is None:
+                    first_parent_id = int(indexrow['parent_id'])
+                seginfo.append((n_iter, seg_id, indexrow['weight'], indexrow['walltime'], indexrow['cputime'], final_pcoords[irow]))
+            endpoint_type = indexrow['endpoint_type']
+            traces.append(cls._from_seginfo(seginfo, endpoint_type, pcoord_dtype, pcoord_pt_shape, first_parent_id, data_manager))
+        return traces
+
+    @classmethod
+    def _from_seginfo(cls, seginfo, endpoint_type, pcoord_dtype, pcoord_pt_shape, first_parent_id, data_manager):
+        '''Construct a trace from the ``(n_iter, seg_id, weight, walltime, cputime, final_pcoord)``
+        tuples ``seginfo`` of its segments, first to last, and the parent ID (identifying the initial
+        state) of the first segment.'''
+        first_iter, first_seg_id = seginfo[0][:2]
 
         # Initial segment (for fetching initial state)
         first_segment = Segment(n_iter=first_iter, seg_id=first_seg_id, parent_id=first_parent_id)
 
-        seginfo.reverse()
-
         summary_dtype = np.dtype(
             [
                 ('n_iter', n_iter_dtype),
@@ -114,7 +169,7 @@ class Trace:
             initial_state = data_manager.get_segment_initial_states([first_segment], first_iter)[0]
         except KeyError:
             # old HDF5 version
-            assert parent_id < 0
+            assert first_parent_id < 0
             istate_pcoord = data_manager.get_iter_group(first_iter)['pcoord'][first_seg_id, 0]
             istate_id = -(first_parent_id + 1)
             basis_state = None
@@ -440,12 +495,18 @@ The following options for datasets are supported:
         except ValueError:
             trajs_group = self.output_file['trajectories']
 
-        for n_iter, seg_id in self.endpoints:
+        data_manager = self.data_reader.data_manager
+        if len(self.endpoints) > 1 and data_manager.we_h5file_version >= 5:
+            # Trace all endpoints at once
+            ancestry = AncestryIndex(data_manager.we_h5file)
+            traces = Trace.from_ancestry(self.endpoints, ancestry, data_manager)
+        else:
+            traces = [Trace.from_data_manager(n_iter, seg_id, data_manager) for n_iter, seg_id in self.endpoints]
+
+        for (n_iter, seg_id), trace in zip(self.endpoints, traces):
             trajname = self.output_pattern % (n_iter, seg_id)
             trajgroup = trajs_group.create_group(trajname)
 
-            trace = Trace.from_data_manager(n_iter, seg_id, self.data_reader.data_manager)
-
             with open(trajname + '_trace.txt', 'wt') as trace_output:
                 self.emit_trace_text(trace, trace_output)
 
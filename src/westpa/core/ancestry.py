@@ -0,0 +1,240 @@
+'''Index of the parents of all segments of a simulation, for lineage queries across iterations.'''
+
+import logging
+import os
+
+import numpy as np
+
+from .h5io import WESTPAH5File
+
+log = logging.getLogger(__name__)
+
+# Fields of the summary table recorded to tell whether an iteration changed since it was indexed
+fingerprint_fields = ('n_particles', 'norm', 'walltime', 'cputime')
+
+
+def child_index(parent_ids, n_parents):
+    '''Invert the parents ``parent_ids`` of the segments of an iteration, returning the children of each
+    of the ``n_parents`` segments of the previous iteration in compressed sparse row form, as a tuple
+    ``(offsets, child_ids)``: the children of segment ``seg_id`` are
+    ``child_ids[offsets[seg_id] : offsets[seg_id + 1]]``, in increasing order. Segments starting from
+    initial states (negative parent IDs) are nobody's children.'''
+    parent_ids = np.asarray(parent_ids, dtype=np.int64)
+    child_ids = np.flatnonzero(parent_ids >= 0)
+    parent_ids = parent_ids[child_ids]
+    child_ids = child_ids[np.argsort(parent_ids, kind='stable')]
+    offsets = np.zeros((n_parents + 1,), dtype=np.int64)
+    np.cumsum(np.bincount(parent_ids, minlength=n_parents), out=offsets[1:])
+    return offsets, child_ids
+
+
+class AncestryIndex:
+    '''An index of the parent of every segment in a WEST HDF5 file, which answers lineage queries
+    for many segments at once without reading the segment index of every iteration along the way.
+
+    Segments are identified by a global id, their position in the concatenation of all iterations,
+    so that segment ``seg_id`` of iteration ``n_iter`` has the global id
+    ``iter_offsets[n_iter - 1] + seg_id``. ``parent_ids`` holds the parent of each segment as stored
+    in the segment index of its iteration, that is, the ID of a segment in the previous iteration,
+    or a negative number identifying an initial state (see :class:`westpa.core.segment.Segment`).
+
+    The index is read from ``we_h5file``, an open WEST HDF5 file, and brought up to date with
+    :meth:`update`. If ``filename`` is given, the index is also stored in that sidecar HDF5 file,
+    and read from it when created again. Only the iterations which were appended since, or which
+    changed (e.g. after truncating and continuing the simulation, or initializing it again), are
+    read from ``we_h5file`` and stored again. An iteration is taken to be unchanged without reading
+    its parents if its row of the summary table (number of segments, norm, wallclock and CPU time)
+    matches the one recorded along with it. Iterations still being propagated, for which this row
+    is not final, and those of files without a summary table, are checked by comparing their parents.'''
+
+    def __init__(self, we_h5file, filename=None):
+        self.we_h5file = we_h5file
+        self.filename = filename
+        self.iter_offsets = np.zeros((1,), np.int64)
+        self.parent_ids = np.empty((0,), np.int64)
+        # Summary of each iteration when its parents were read (NaN where not final)
+        self.fingerprints = np.empty((0, len(fingerprint_fields)), np.float64)
+        self._child_indices = {}
+
+        if filename is not None and os.path.exists(filename):
+            with WESTPAH5File(filename, 'r') as h5file:
+                self.iter_offsets = h5file['iter_offsets'][...]
+                self.parent_ids = h5file['parent_ids'][...]
+                try:
+                    self.fingerprints = h5file['fingerprints'][...]
+                except KeyError:
+                    self.fingerprints = np.full((self.n_iters, len(fingerprint_fields)), np.nan)
+
+        self.update()
+
+    @staticmethod
+    def default_filename(we_h5filename):
+        '''Return the name of the sidecar file to use for the WEST HDF5 file ``we_h5filename``.'''
+        return os.path.splitext(we_h5filename)[0] + '_ancestry.h5'
+
+    @property
+    def n_iters(self):
+        '''Number of iterations in the index.'''
+        return len(self.iter_offsets) - 1
+
+    def n_segs(self, n_iter):
+        '''Return the number of segments in iteration ``n_iter``.'''
+        return int(self.iter_offsets[n_iter] - self.iter_offsets[n_iter - 1])
+
+    def _read_fingerprints(self, n_iters):
+        '''Return the summary of each of the first ``n_iters`` iterations of the WEST HDF5 file, as an
+        array of shape ``(n_iters, len(fingerprint_fields))``, with rows of NaN for iterations whose
+        summary is not (yet) final.'''
+        fingerprints = np.full((n_iters, len(fingerprint_fields)), np.nan)
+        try:
+            summary = self.we_h5file['summary'][:n_iters]
+        except KeyError:
+            return fingerprints
+        for ifield, field in enumerate(fingerprint_fields):
+            fingerprints[: len(summary), ifield] = summary[field]
+        # The summary of an iteration is complete once it has been propagated
+        fingerprints[~(fingerprints[:, fingerprint_fields.index('walltime')] > 0)] = np.nan
+        return fingerprints
+
+    def update(self):
+        '''Add the parents of segments in iterations which are not yet in the index, and replace those of
+        iterations whose parents changed. Returns the number of iterations added or replaced.'''
+        iter_groups = []
+        n_iter = 1
+        while True:
+            try:
+                iter_groups.append(self.we_h5file.get_iter_group(n_iter))
+            except KeyError:
+                break
+            n_iter += 1
+        fingerprints = self._read_fingerprints(len(iter_groups))
+
+        # Keep the iterations which did not change, reading the parents only of those whose summary
+        # is not known to be unchanged
+        n_kept = 0
+        new_parent_ids = []
+        for iter_group, fingerprint in zip(iter_groups, fingerprints):
+            seg_index = iter_group['seg_index']
+            if not new_parent_ids and n_kept < self.n_iters and len(seg_index) == self.n_segs(n_kept + 1):
+                if not np.isnan(fingerprint).any() and np.array_equal(fingerprint, self.fingerprints[n_kept]):
+                    n_kept += 1
+                    continue
+                parent_ids = seg_index['parent_id']
+                if np.array_equal(parent_ids, self.parent_ids[self.iter_offsets[n_kept] : self.iter_offsets[n_kept + 1]]):
+                    n_kept += 1
+                    continue
+            else:
+                parent_ids = seg_index['parent_id']
+            new_parent_ids.append(parent_ids)
+
+        fingerprints_changed = not np.array_equal(fingerprints[:n_kept], self.fingerprints[:n_kept], equal_nan=True)
+        self.fingerprints = fingerprints
+        if n_kept == self.n_iters == len(iter_groups):
+            if fingerprints_changed and self.filename is not None:
+                self._store(self.n_iters + 1, self.iter_offsets[-1])
+            return 0
+
+        new_offsets = self.iter_offsets[n_kept] + np.cumsum([len(parent_ids) for parent_ids in new_parent_ids], dtype=np.int64)
+        n_kept_segs = self.iter_offsets[n_kept]
+        self._child_indices.clear()
+        self.iter_offsets = np.concatenate([self.iter_offsets[: n_kept + 1], new_offsets])
+        self.parent_ids = np.concatenate([self.parent_ids[:n_kept_segs]] + new_parent_ids).astype(np.int64, copy=False)
+        log.debug('read parents of iterations {} through {}'.format(n_kept + 1, self.n_iters))
+
+        if self.filename is not None:
+            self._store(n_kept + 1, n_kept_segs)
+
+        return self.n_iters - n_kept
+
+    def _store(self, n_kept_offsets, n_kept_segs):
+        with WESTPAH5File(self.filename, 'a') as h5file:
+            # The (small) table of fingerprints is written whole, since those of kept iterations may be new
+            try:
+                del h5file['fingerprints']
+            except KeyError:
+                pass
+            h5file.create_dataset('fingerprints', data=self.fingerprints)
+
+            for dsname, data, n_kept in (
+                ('iter_offsets', self.iter_offsets, n_kept_offsets),
+                ('parent_ids', self.parent_ids, n_kept_segs),
+            ):
+                try:
+                    ds = h5file[dsname]
+                except KeyError:
+                    h5file.create_dataset(dsname, data=data, maxshape=(None,), chunks=True)
+                else:
+                    ds.resize((len(data),))
+                    ds[n_kept:] = data[n_kept:]
+
+    def global_ids(self, n_iter, seg_ids):
+        '''Return the global ids of the segments ``seg_ids`` of iteration ``n_iter``.'''
+        return self.iter_offsets[n_iter - 1] + np.asarray(seg_ids, dtype=np.int64)
+
+    def locate(self, global_ids):
+        '''Return ``(n_iters, seg_ids)``, the iteration and segment ID of each of the given global ids.'''
+        global_ids = np.asarray(global_ids, dtype=np.int64)
+        n_iters = np.searchsorted(self.iter_offsets, global_ids, side='right')
+        return n_iters, global_ids - self.iter_offsets[n_iters - 1]
+
+    def parents(self, n_iter, seg_ids):
+        '''Return the parents of the segments ``seg_ids`` of iteration ``n_iter``, as stored in the
+        segment index (negative for segments starting from an initial state).'''
+        return self.parent_ids[self.global_ids(n_iter, seg_ids)]
+
+    def trace(self, n_iter, seg_ids):
+        '''Trace the segments ``seg_ids`` of iteration ``n_iter`` back to their initial states. Returns an
+        array of shape ``(len(seg_ids), n_iter)``, whose column ``i`` holds the ID of the ancestor of
+        each segment in iteration ``i + 1`` (the last column holding ``seg_ids``), or -1 for iterations
+        before the trajectory started.'''
+        if not 1 <= n_iter <= self.n_iters:
+            raise ValueError('iteration {} is not in the index'.format(n_iter))
+
+        seg_ids = np.array(seg_ids, dtype=np.int64, ndmin=1)
+        ancestors = np.full((len(seg_ids), n_iter), -1, dtype=np.int64)
+        current = seg_ids
+        for i_iter in range(n_iter, 0, -1):
+            ancestors[:, i_iter - 1] = current
+            active = current >= 0
+            if not active.any():
+                break
+            parents = np.full_like(current, -1)
+            parents[active] = self.parent_ids[self.iter_offsets[i_iter - 1] + current[active]]
+            current = np.maximum(parents, -1)
+        return ancestors
+
+    def child_index(self, n_iter):
+        '''Return the children of each segment of iteration ``n_iter`` in the next iteration, in the
+        compressed sparse row form returned by :func:`child_index`.'''
+        try:
+            return self._child_indices[n_iter]
+        except KeyError:
+            pass
+        if not 1 <= n_iter <= self.n_iters:
+            raise ValueError('iteration {} is not in the index'.format(n_iter))
+        if n_iter < self.n_iters:
+            parent_ids = self.parent_ids[self.iter_offsets[n_iter] : self.iter_offsets[n_iter + 1]]
+        else:
+            parent_ids = []
+        result = self._child_indices[n_iter] = child_index(parent_ids, self.n_segs(n_iter))
+        return result
+
+    def descendants(self, n_iter, seg_ids, last_iter=None):
+        '''Return the descendants of the segments ``seg_ids`` of iteration ``n_iter``, as a list of
+        arrays holding the IDs of the descendants in each of iterations ``n_iter + 1`` through
+        ``last_iter`` (by default, the last iteration in the index).'''
+        if last_iter is None:
+            last_iter = self.n_iters
+        if not 1 <= n_iter <= last_iter <= self.n_iters:
+            raise ValueError('iterations {} through {} are not in the index'.format(n_iter, last_iter))
+
+        current = np.asarray(seg_ids, dtype=np.int64)
+        descendants = []
+        for i_iter in range(n_iter + 1, last_iter + 1):
+            selected = np.zeros((self.n_segs(i_iter - 1) + 1,), dtype=np.bool_)
+            selected[current] = True
+            # Initial states (negative parent IDs) index the extra, unselected entry
+            parents = self.parent_ids[self.iter_offsets[i_iter - 1] : self.iter_offsets[i_iter]]
+            current = np.flatnonzero(selected[np.where(parents >= 0, parents, -1)])
+            descendants.append(current)
+        return descendants
@@ -12,7 +12,8 @@ A number of pre-defined bin mappers are available here:
     functions, or intellegently-tuned numpy-based Python functions.
   * :class:`VectorizingFuncBinMapper`, for functions which calculate a bin
     assignment for a single coordinate value. This is best used for arbitrary
-    Python functions.
+    Python functions. Functions which also work on arrays of coordinate values
+    are detected and called once for all coordinates.
   * :class:`PiecewiseBinMapper`, for using a set of boolean-valued functions, one
     per bin, to determine assignments. This is likely to be much slower than a
     `FuncBinMapper` or `VectorizingFuncBinMapper` equipped with an appropriate
@@ -214,13 +215,19 @@ class PiecewiseBinMapper(BinMapper):
 
 class FuncBinMapper(BinMapper):
     '''Binning using a custom function which must iterate over input coordinate
-    sets itself.'''
+    sets itself.
 
-    def __init__(self, func, nbins, args=None, kwargs=None):
+    The function is given all coordinates and a mask, and may compute statistics over
+    them. If it assigns each coordinate tuple independently of the others, ``pointwise=True``
+    declares so, allowing a ``RecursiveBinMapper`` to call it on only the coordinates that
+    fall in the bin it replaces.'''
+
+    def __init__(self, func, nbins, args=None, kwargs=None, pointwise=False):
         self.func = func
         self.nbins = nbins
         self.args = args or ()
         self.kwargs = kwargs or {}
+        self.pointwise = pointwise
         self.labels = ['{!r} bin {:d}'.format(func, ibin) for ibin in range(nbins)]
 
     def assign(self, coords, mask=None, output=None):
@@ -251,15 +258,82 @@ class FuncBinMapper(BinMapper):
 
 class VectorizingFuncBinMapper(BinMapper):
     '''Binning using a custom function which is evaluated once for each (unmasked)
-    coordinate tuple provided.'''
-
-    def __init__(self, func, nbins, args=None, kwargs=None):
+    coordinate tuple provided.
+
+    If the function also works on a whole block of coordinate tuples (for instance, if
+    it is written in terms of NumPy ufuncs operating along the last axis), it can be
+    called once for all unmasked coordinate tuples instead, returning an array of bin
+    indices. ``vectorized=True`` declares that the function works this way, and
+    ``vectorized=False`` declares that it does not. If ``vectorized`` is None (the
+    default), the function is probed on the first block of at least ``n_probe_samples``
+    coordinates assigned, and called on whole blocks if it returns the same assignments
+    as when called once per coordinate tuple. If a later block call does not return
+    one bin index per coordinate tuple, the mapper reverts to calling the function once
+    per coordinate tuple.'''
+
+    # Number of coordinate tuples evaluated one at a time to validate a block call
+    n_probe_samples = 8
+
+    def __init__(self, func, nbins, args=None, kwargs=None, vectorized=None):
         self.func = func
         self.args = args or ()
         self.kwargs = kwargs or {}
         self.nbins = nbins
         self.index_dtype = np.min_scalar_type(self.nbins)
         self.labels = ['{!r} bin {:d}'.format(func, ibin) for ibin in range(nbins)]
+        self.vectorized = vectorized
+
+        # Result of probing whether func can be evaluated on blocks of coordinates
+        self._probed_vectorized = None
+
+    def __getstate__(self):
+        # The probe result is not pickled, so that the hash of a mapper does not depend
+        # on whether it has been used
+        state = self.__dict__.copy()
+        state.pop('_probed_vectorized', None)
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('vectorized', False)
+        self.__dict__.update(state)
+        self._probed_vectorized = None
+
+    def _apply_block(self, coords):
+        '''Evaluate the function on a block of coordinate tuples, returning an array of
+        bin indices, or None if the function does not return one index per coordinate tuple.'''
+        result = np.asarray(self.func(coords, *self.args, **self.kwargs))
+        if result.shape != (len(coords),):
+            return None
+        return result
+
+    def _probe(self, coords):
+        '''Determine whether the function can be evaluated on the block of coordinates
+        ``coords``, returning the resulting assignments if so, or None otherwise. Blocks
+        too small to distinguish a block result from a per-coordinate one are not probed.'''
+        if len(coords) < max(2, self.n_probe_samples):
+            return None
+
+        try:
+            with np.errstate(all='ignore'):
+                result = self._apply_block(coords)
+        except Exception:
+            result = None
+
+        if result is not None:
+            sample_indices = np.unique(np.linspace(0, len(coords) - 1, self.n_probe_samples).astype(np.intp))
+            for icoord in sample_indices:
+                try:
+                    expected = self.func(coords[icoord], *self.args, **self.kwargs)
+                except Exception:
+                    result = None
+                    break
+                if result[icoord] != expected:
+                    result = None
+                    break
+
+        self._probed_vectorized = result is not None
+        log.debug('{!r} {} be evaluated on blocks of coordinates'.format(self.func, 'can' if result is not None else 'cannot'))
+        return result
 
     def assign(self, coords, mask=None, output=None):
         try:
@@ -282,17 +356,55 @@ class VectorizingFuncBinMapper(BinMapper):
         elif len(output) != len(coords):
             raise TypeError('output has different length than coords')
 
-        apply_down(self.func, self.args, self.kwargs, coords, mask, output)
-
+        vectorized = self.vectorized if self.vectorized is not None else self._probed_vectorized
+        if vectorized is False:
+            apply_down(self.func, self.args, self.kwargs, coords, mask, output)
+            return output
+
+        mask = np.require(mask, dtype=np.bool_)
+        if not mask.any():
+            return output
+        coord_block = coords[mask]
+
+        if vectorized is None:
+            result = self._probe(coord_block)
+            if result is None:
+                apply_down(self.func, self.args, self.kwargs, coords, mask, output)
+                return output
+        elif self.vectorized:
+            result = self._apply_block(coord_block)
+            if result is None:
+                raise TypeError('function did not return one bin index per coordinate tuple')
+        else:
+            # Vectorization was only inferred from an earlier block
+            try:
+                with np.errstate(all='ignore'):
+                    result = self._apply_block(coord_block)
+            except Exception:
+                result = None
+            if result is None:
+                log.debug('{!r} cannot be evaluated on blocks of coordinates after all'.format(self.func))
+                self._probed_vectorized = False
+                apply_down(self.func, self.args, self.kwargs, coords, mask, output)
+                return output
+
+        output[mask] = result
         return output
 
 
 class VoronoiBinMapper(BinMapper):
     '''A one-dimensional mapper which assigns a multidimensional pcoord to the
     closest center based on a distance metric. Both the list of centers and the
-    distance function must be supplied.'''
+    distance function must be supplied.
 
-    def __init__(self, dfunc, centers, dfargs=None, dfkwargs=None):
+    If ``dfunc`` is None, the (optionally weighted and/or periodic) Euclidean
+    distance is used, and coordinates are assigned with a KD-tree of the centers
+    rather than by calling a distance function for each coordinate tuple.
+    ``metric_weights`` gives a per-dimension weight ``w`` for the distance
+    ``sqrt(sum(w * (x - c)**2))``, and ``boxsize`` gives a scalar or per-dimension
+    period (0 for non-periodic dimensions).'''
+
+    def __init__(self, dfunc, centers, dfargs=None, dfkwargs=None, boxsize=None, metric_weights=None):
         self.dfunc = dfunc
         self.dfargs = dfargs or ()
         self.dfkwargs = dfkwargs or {}
@@ -301,11 +413,65 @@ class VoronoiBinMapper(BinMapper):
         self.ndim = self.centers.shape[1]
         self.labels = ['center={!r}'.format(center) for center in self.centers]
 
+        if dfunc is not None and (boxsize is not None or metric_weights is not None):
+            raise ValueError('boxsize and metric_weights apply only to the built-in Euclidean distance (dfunc=None)')
+        if metric_weights is not None:
+            metric_weights = np.array(np.broadcast_to(metric_weights, (self.ndim,)), dtype=np.float64)
+            if (metric_weights <= 0).any():
+                raise ValueError('metric weights must be positive')
+        if boxsize is not None:
+            boxsize = np.array(np.broadcast_to(boxsize, (self.ndim,)), dtype=np.float64)
+            if (boxsize < 0).any():
+                raise ValueError('box size must be non-negative')
+        self.boxsize = boxsize
+        self.metric_weights = metric_weights
+
+        # Spatial index of centers, built on first use and rebuilt if the centers change
+        self._kdtree = None
+        self._kdtree_centers = None
+
         # Sanity check: does the distance map the centers to themselves?
         check = self.assign(self.centers)
         if (check != np.arange(len(self.centers))).any():
             raise TypeError('dfunc does not map centers to themselves')
 
+    def __getstate__(self):
+        # Do not pickle the spatial index, so that the hash of a mapper does not depend
+        # on whether it has been used
+        state = self.__dict__.copy()
+        state.pop('_kdtree', None)
+        state.pop('_kdtree_centers', None)
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('boxsize', None)
+        state.setdefault('metric_weights', None)
+        self.__dict__.update(state)
+        self._kdtree = None
+        self._kdtree_centers = None
+
+    def _to_metric_space(self, coords):
+        '''Transform ``coords`` so that the Euclidean distance in the transformed space
+        is the distance defined by ``metric_weights`` and ``boxsize``.'''
+        points = np.array(coords, dtype=np.float64)
+        if self.boxsize is not None:
+            periodic = self.boxsize > 0
+            points[:, periodic] = np.mod(points[:, periodic], self.boxsize[periodic])
+        if self.metric_weights is not None:
+            points *= np.sqrt(self.metric_weights)
+        return points
+
+    def _get_kdtree(self):
+        if self._kdtree is None or not np.array_equal(self._kdtree_centers, self.centers):
+            from scipy.spatial import cKDTree
+
+            boxsize = self.boxsize
+            if boxsize is not None and self.metric_weights is not None:
+                boxsize = boxsize * np.sqrt(self.metric_weights)
+            self._kdtree = cKDTree(self._to_metric_space(self.centers), boxsize=boxsize)
+            self._kdtree_centers = self.centers.copy()
+        return self._kdtree
+
     def assign(self, coords, mask=None, output=None):
         try:
             passed_coord_dtype = coords.dtype
@@ -327,7 +493,13 @@ class VoronoiBinMapper(BinMapper):
         elif len(output) != len(coords):
             raise TypeError('output has different length than coords')
 
-        apply_down_argmin_across(self.dfunc, (self.centers,) + self.dfargs, self.dfkwargs, self.nbins, coords, mask, output)
+        if self.dfunc is None:
+            mask = np.require(mask, dtype=np.bool_)
+            if mask.any():
+                _distances, nearest = self._get_kdtree().query(self._to_metric_space(coords[mask]))
+                output[mask] = nearest
+        else:
+            apply_down_argmin_across(self.dfunc, (self.centers,) + self.dfargs, self.dfkwargs, self.nbins, coords, mask, output)
 
         return output
 
@@ -347,6 +519,14 @@ class RecursiveBinMapper(BinMapper):
 
         self.start_index = start_index
 
+    @property
+    def pointwise(self):
+        '''True if the base mapper and all embedded mappers assign each coordinate independently of the
+        others (so that embedded mappers may be called on only the coordinates that fall in their bin).
+        Mappers which compute statistics over all the coordinates they are given (e.g. MABBinMapper)
+        must be called on the full coordinate array with a mask instead.'''
+        return is_pointwise(self.base_mapper) and all(mapper.pointwise for mapper in self._recursion_targets.values())
+
     @property
     def labels(self):
         for ilabel in range(self.base_mapper.nbins):
@@ -413,35 +593,66 @@ class RecursiveBinMapper(BinMapper):
         self.start_index = self.start_index
 
     def assign(self, coords, mask=None, output=None):
+        coords = np.asarray(coords)
         if mask is None:
             mask = np.ones((len(coords),), dtype=np.bool_)
+        else:
+            mask = np.require(mask, dtype=np.bool_)
 
         if output is None:
             output = np.empty((len(coords),), dtype=index_dtype)
 
-        # mapping mask -- which output values come from our base
-        # region set and therefore must be remapped
-        mmask = np.zeros((len(coords),), dtype=np.bool_)
-
         # Assign based on this mapper
         self.base_mapper.assign(coords, mask, output)
 
+        selected = np.flatnonzero(mask)
+        base_bins = output[selected]
+
         # Which coordinates do we need to reassign, because they landed in
-        # bins with embedded mappers?
-        rmasks = {}
-        for rindex, mapper in self._recursion_targets.items():
-            omask = output == rindex
-            mmask |= omask
-            rmasks[rindex] = omask
+        # bins with embedded mappers? (Out-of-range bins are left to output_map.)
+        recursed = np.zeros((len(selected),), dtype=np.bool_)
+        in_range = base_bins < len(self._recursion_map)
+        recursed[in_range] = self._recursion_map[base_bins[in_range]]
 
         # remap output from our (base) mapper
         # omap may be None if every bin has a recursive mapper in it
         omap = self._output_map
         if omap is not None:
-            output_map(output, omap, mask & ~mmask)
-
-        # do any recursive assignments necessary
-        for rindex, mapper in self._recursion_targets.items():
-            mapper.assign(coords, mask & rmasks[rindex], output)
+            mmask = mask.copy()
+            mmask[selected[recursed]] = False
+            output_map(output, omap, mmask)
+
+        if not recursed.any():
+            return output
+
+        # do any recursive assignments necessary; embedded mappers which assign coordinates
+        # independently of each other are only given the coordinates that landed in their bin,
+        # the others see all coordinates, with a mask
+        selected = selected[recursed]
+        base_bins = base_bins[recursed]
+        order = np.argsort(base_bins, kind='stable')
+        selected = selected[order]
+        rindices, starts = np.unique(base_bins[order], return_index=True)
+        for rindex, indices in zip(rindices, np.split(selected, starts[1:])):
+            mapper = self._recursion_targets[rindex]
+            if mapper.pointwise:
+                output[indices] = mapper.assign(coords[indices])
+            else:
+                rmask = np.zeros((len(coords),), dtype=np.bool_)
+                rmask[indices] = True
+                mapper.assign(coords, rmask, output)
 
         return output
+
+
+# Mappers whose assignment of a coordinate does not depend on the other coordinates assigned
+# along with it (subclasses may not share this property); a FuncBinMapper may declare itself
+# pointwise, since its function sees all coordinates
+_pointwise_mappers = (NopMapper, RectilinearBinMapper, VectorizingFuncBinMapper, VoronoiBinMapper)
+
+
+def is_pointwise(mapper):
+    '''Return True if ``mapper`` is known to assign each coordinate independently of the other
+    coordinates assigned along with it, so that coordinates may be assigned in blocks of any size
+    or composition without changing the result.'''
+    return type(mapper) in _pointwise_mappers or getattr(mapper, 'pointwise', False)
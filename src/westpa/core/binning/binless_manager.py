@@ -60,16 +60,14 @@ class BinlessSimManager(WESimManager):
                 istate_gen_futures.update(new_istate_futures)
                 futures.update(new_istate_futures)
 
-                with self.data_manager.expiring_flushing_lock():
-                    self.data_manager.update_segments(self.n_iter, incoming)
+                self.data_manager.queue_segment_update(self.n_iter, incoming)
 
             elif future in istate_gen_futures:
                 istate_gen_futures.remove(future)
                 _basis_state, initial_state = future.get_result()
                 log.debug('received newly-prepared initial state {!r}'.format(initial_state))
                 initial_state.istate_status = InitialState.ISTATE_STATUS_PREPARED
-                with self.data_manager.expiring_flushing_lock():
-                    self.data_manager.update_initial_states([initial_state], n_iter=self.n_iter + 1)
+                self.data_manager.queue_initial_state_update([initial_state], n_iter=self.n_iter + 1)
                 self.we_driver.avail_initial_states[initial_state.state_id] = initial_state
             else:
                 log.error('unknown future {!r} received from work manager'.format(future))
@@ -93,8 +91,7 @@ class BinlessSimManager(WESimManager):
                 _basis_state, initial_state = future.get_result()
                 log.debug('received newly-prepared initial state {!r}'.format(initial_state))
                 initial_state.istate_status = InitialState.ISTATE_STATUS_PREPARED
-                with self.data_manager.expiring_flushing_lock():
-                    self.data_manager.update_initial_states([initial_state], n_iter=self.n_iter + 1)
+                self.data_manager.queue_initial_state_update([initial_state], n_iter=self.n_iter + 1)
                 self.we_driver.avail_initial_states[initial_state.state_id] = initial_state
             else:
                 log.error('unknown future {!r} received from work manager'.format(future))
@@ -6,6 +6,42 @@ import westpa
 log = logging.getLogger(__name__)
 
 
+def _bottleneck_coords(coords, weights):
+    '''Return the coordinates of the bottleneck walkers along one dimension, given the walkers'
+    ``coords`` along that dimension and their ``weights``. The forward bottleneck is the walker
+    (other than the first or last in coordinate order) with the largest ratio of its weight to the
+    total weight of all walkers beyond it; the reverse bottleneck is the same in reverse coordinate
+    order. Either is None if no ratio exceeds one.'''
+
+    dtype = np.result_type(coords, weights)
+    coords = coords.astype(dtype)
+    order = coords.argsort()
+    coords = coords[order]
+    weights = weights.astype(dtype)[order]
+    weights[weights == 0] = 10**-323
+
+    n_walkers = len(coords)
+    if n_walkers < 3:
+        return None, None
+
+    # Total weight of the walkers beyond each walker, in forward and reverse order
+    beyond = np.cumsum(weights[::-1])[::-1][2:]
+    flipbeyond = np.cumsum(weights)[-3::-1]
+    flipweights = weights[::-1]
+
+    bottlenecks = []
+    for walker_weights, beyond_weights, walker_coords in (
+        (weights[1:-1], beyond, coords[1:-1]),
+        (flipweights[1:-1], flipbeyond, coords[::-1][1:-1]),
+    ):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diffs = -np.log(beyond_weights) + np.log(walker_weights)
+        diffs[~(diffs > 0)] = 0
+        ibottleneck = np.argmax(diffs)
+        bottlenecks.append(walker_coords[ibottleneck] if diffs[ibottleneck] > 0 else None)
+    return tuple(bottlenecks)
+
+
 def map_mab(coords, mask, output, *args, **kwargs):
     '''Binning which adaptively places bins based on the positions of extrema segments and
     bottleneck segments, which are where the difference in probability is the greatest
@@ -56,64 +92,30 @@ def map_mab(coords, mask, output, *args, **kwargs):
         weights = None
         splitting = False
 
-    varcoords = np.copy(coords)
-    originalcoords = np.copy(coords)
+    originalcoords = coords
     if pca and len(output) > 1:
         colavg = np.mean(coords, axis=0)
-        for i in range(len(coords)):
-            for j in range(len(coords[i])):
-                varcoords[i][j] = coords[i][j] - colavg[j]
+        varcoords = (coords - colavg).astype(coords.dtype)
         covcoords = np.cov(np.transpose(varcoords), aweights=weights)
         eigval, eigvec = np.linalg.eigh(covcoords)
         eigvec = eigvec[:, np.argmax(np.absolute(eigvec), axis=1)]
         for i in range(len(eigvec)):
             if eigvec[i, i] < 0:
                 eigvec[:, i] = -1 * eigvec[:, i]
-        for i in range(ndim):
-            for j in range(len(output)):
-                coords[j][i] = np.dot(varcoords[j], eigvec[:, i])
+        coords = np.dot(varcoords, eigvec[:, :ndim]).astype(coords.dtype)
+
+    # identify the boundary segments
+    maxlist = list(np.max(coords[mask, :ndim], axis=0))
+    minlist = list(np.min(coords[mask, :ndim], axis=0))
 
-    maxlist = []
-    minlist = []
+    # detect the bottleneck segments, this uses the weights
     difflist = []
     flipdifflist = []
-    for n in range(ndim):
-        # identify the boundary segments
-        maxcoord = np.max(coords[mask, n])
-        mincoord = np.min(coords[mask, n])
-        maxlist.append(maxcoord)
-        minlist.append(mincoord)
-
-        # detect the bottleneck segments, this uses the weights
-        if splitting:
-            temp = np.column_stack((originalcoords[mask, n], weights[mask]))
-            sorted_indices = temp[:, 0].argsort()
-            temp = temp[sorted_indices]
-            for p in range(len(temp)):
-                if temp[p][1] == 0:
-                    temp[p][1] = 10**-323
-            fliptemp = np.flipud(temp)
-
-            difflist.append(None)
-            flipdifflist.append(None)
-            maxdiff = 0
-            flipmaxdiff = 0
-            for i in range(1, len(temp) - 1):
-                comprob = 0
-                flipcomprob = 0
-                j = i + 1
-                while j < len(temp):
-                    comprob = comprob + temp[j][1]
-                    flipcomprob = flipcomprob + fliptemp[j][1]
-                    j = j + 1
-                diff = -np.log(comprob) + np.log(temp[i][1])
-                if diff > maxdiff:
-                    difflist[n] = temp[i][0]
-                    maxdiff = diff
-                flipdiff = -np.log(flipcomprob) + np.log(fliptemp[i][1])
-                if flipdiff > flipmaxdiff:
-                    flipdifflist[n] = fliptemp[i][0]
-                    flipmaxdiff = flipdiff
+    if splitting:
+        for n in range(ndim):
+            forward, reverse = _bottleneck_coords(originalcoords[mask, n], weights[mask])
+            difflist.append(forward)
+            flipdifflist.append(reverse)
 
     if mab_log and report:
         westpa.rc.pstatus("################ MAB stats ################")
@@ -145,103 +147,80 @@ def map_mab(coords, mask, output, *args, **kwargs):
         if skip[i] != 0:
             boundary_base -= nbins_per_dim[i] - 1
 
-    for i in range(len(output)):
-        if not allmask[i]:
-            continue
-
-        # special means either a boundary or bottleneck walker (not a walker in the linear space)
-        special = False
-        # this holder is the bin number, which only needs to be unique for different walker groups
-        holder = 0
-        if splitting:
-            for n in range(ndim):
-                coord = allcoords[i][n]
-
-                # if skipped, just assign the walkers to the same bin (offset of boundary base)
-                if skip[n] != 0:
-                    holder = boundary_base + n
-                    break
-
-                # assign bottlenecks, taking directionality into account
-                if bottleneck:
-                    if direction[n] < 0:
-                        if coord == flipdifflist[n]:
-                            holder = bottleneck_base + n
-                            special = True
-                            break
-
-                    if direction[n] > 0:
-                        if coord == difflist[n]:
-                            holder = bottleneck_base + n
-                            special = True
-                            break
-
-                    if direction[n] == 0:
-                        if coord == difflist[n]:
-                            holder = bottleneck_base + n
-                            special = True
-                            break
-                        elif coord == flipdifflist[n]:
-                            holder = bottleneck_base + n + 1
-                            special = True
-                            break
-
-                # assign boundary walkers, taking directionality into account
-                if direction[n] < 0:
-                    if coord == minlist[n]:
-                        holder = boundary_base + n
-                        special = True
-                        break
+    (selected,) = np.nonzero(allmask)
+    selcoords = allcoords[selected, :ndim]
+    holder = np.zeros((len(selected),), dtype=np.int64)
+
+    # special means either a boundary or bottleneck walker (not a walker in the linear space);
+    # each walker is placed by the first dimension in which it is special
+    special = np.zeros((len(selected),), dtype=np.bool_)
+    if splitting:
+        for n in range(ndim):
+            # if skipped, the remaining walkers are placed in the linear portion below
+            if skip[n] != 0:
+                break
 
+            coord = selcoords[:, n]
+            candidates = []
+
+            # bottlenecks, taking directionality into account
+            if bottleneck:
+                if direction[n] < 0:
+                    candidates.append((flipdifflist[n], bottleneck_base + n))
                 elif direction[n] > 0:
-                    if coord == maxlist[n]:
-                        holder = boundary_base + n
-                        special = True
-                        break
-
-                elif direction[n] == 0:
-                    if coord == minlist[n]:
-                        holder = boundary_base + n
-                        special = True
-                        break
-                    elif coord == maxlist[n]:
-                        holder = boundary_base + n + 1
-                        special = True
-                        break
-
-        # the following are for the "linear" portion
-        if not special:
-            for n in range(ndim):
-                # if skipped, it's added to the same bin as the special walkers above
-                if skip[n] != 0:
-                    holder = boundary_base + n
-                    break
-
-                coord = allcoords[i][n]
-                nbins = nbins_per_dim[n]
-                minp = minlist[n]
-                maxp = maxlist[n]
-
-                bins = np.linspace(minp, maxp, nbins + 1)
-                bin_number = np.digitize(coord, bins) - 1
-
-                if isfinal is None or not isfinal[i]:
-                    if bin_number >= nbins:
-                        bin_number = nbins - 1
-                    elif bin_number < 0:
-                        bin_number = 0
-                elif bin_number >= nbins or bin_number < 0:
-                    if np.isclose(bins[-1], coord):
-                        bin_number = nbins - 1
-                    elif np.isclose(bins[0], coord):
-                        bin_number = 0
-                    else:
-                        raise ValueError("Walker out of boundary")
-
-                holder += bin_number * np.prod(nbins_per_dim[:n])
-
-        # output is the main list that, for each segment, holds the bin assignment
-        output[i] = holder
+                    candidates.append((difflist[n], bottleneck_base + n))
+                else:
+                    candidates.append((difflist[n], bottleneck_base + n))
+                    candidates.append((flipdifflist[n], bottleneck_base + n + 1))
+
+            # boundary walkers, taking directionality into account
+            if direction[n] < 0:
+                candidates.append((minlist[n], boundary_base + n))
+            elif direction[n] > 0:
+                candidates.append((maxlist[n], boundary_base + n))
+            else:
+                candidates.append((minlist[n], boundary_base + n))
+                candidates.append((maxlist[n], boundary_base + n + 1))
+
+            for value, ibin in candidates:
+                if value is None:
+                    continue
+                matches = (coord == value) & ~special
+                holder[matches] = ibin
+                special |= matches
+
+    # the following are for the "linear" portion; a walker that is not special is placed
+    # by its position in the grid of bins over all dimensions up to the first skipped one,
+    # and if any dimension is skipped, in the same bin as the special walkers of that dimension
+    linear = ~special
+    linear_holder = np.zeros((np.count_nonzero(linear),), dtype=np.int64)
+    linear_final = isfinal[selected[linear]] if isfinal is not None else np.zeros_like(linear_holder, dtype=np.bool_)
+    stride = 1
+    for n in range(ndim):
+        if skip[n] != 0:
+            linear_holder[:] = boundary_base + n
+            break
+
+        coord = selcoords[linear, n]
+        nbins = nbins_per_dim[n]
+        bins = np.linspace(minlist[n], maxlist[n], nbins + 1)
+        bin_number = np.digitize(coord, bins) - 1
+
+        outside = (bin_number >= nbins) | (bin_number < 0)
+        at_max = outside & linear_final & np.isclose(bins[-1], coord)
+        at_min = outside & linear_final & ~at_max & np.isclose(bins[0], coord)
+        if np.any(outside & linear_final & ~at_max & ~at_min):
+            raise ValueError("Walker out of boundary")
+        bin_number[at_max] = nbins - 1
+        bin_number[at_min] = 0
+        np.clip(bin_number, 0, nbins - 1, out=bin_number)
+
+        linear_holder += bin_number * stride
+        stride *= nbins
+    holder[linear] = linear_holder
+
+    # output is the main list that, for each segment, holds the bin assignment
+    output[selected] = holder
 
     return output
 
@@ -42,7 +42,6 @@ Version history:
 """
 
 import logging
-import pickle
 import posixpath
 import sys
 import threading
@@ -54,8 +53,8 @@ import h5py
 from h5py import h5s
 import numpy as np
 
-from . import h5io
-from .segment import Segment
+from . import ancestry, h5io
+from .segment import Segment, SegmentTable
 from .states import BasisState, TargetState, InitialState
 from .we_driver import NewWeightEntry
 from .propagators.executable import ExecutablePropagator
@@ -98,6 +97,117 @@ class expiring_flushing_lock:
         self.lock.release()
 
 
+class BackgroundWriter:
+    '''A thread which collects segment and initial state updates for a ``WESTDataManager`` and writes
+    them to HDF5 in batches, once ``max_pending`` updates are pending or ``max_delay`` seconds have
+    passed since the oldest pending update was queued. Batches are written while holding the data
+    manager's lock, as is ``write_pending()``, which writes all pending updates immediately in the
+    calling thread and so acts as a barrier for (e.g.) ``WESTDataManager.flush_backing()``.'''
+
+    def __init__(self, data_manager, max_pending, max_delay):
+        self.data_manager = data_manager
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+
+        # Guards everything below
+        self.cond = threading.Condition()
+
+        # n_iter -> {seg_id: segment} and n_iter -> {state_id: initial_state}
+        self.pending_segments = {}
+        self.pending_istates = {}
+        self.n_pending = 0
+        self.deadline = None
+
+        self.error = None
+        self.stopping = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='{}-{:x}'.format(self.__class__.__name__, id(self)), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Write any pending updates and stop the writer thread.'''
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.write_pending()
+
+    def _check_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError('error writing to {}'.format(self.data_manager.we_h5filename)) from error
+
+    def _queue(self, pending, n_iter, objects, key):
+        self._check_error()
+        with self.cond:
+            if self.stopping:
+                raise RuntimeError('background writer is stopped')
+            pending.setdefault(n_iter, {}).update((key(obj), obj) for obj in objects)
+            self.n_pending += len(objects)
+            if self.deadline is None:
+                self.deadline = time.time() + self.max_delay
+            if self.n_pending >= self.max_pending:
+                self.cond.notify()
+
+    def queue_segments(self, n_iter, segments):
+        self._queue(self.pending_segments, n_iter, segments, attrgetter('seg_id'))
+
+    def queue_initial_states(self, n_iter, initial_states):
+        self._queue(self.pending_istates, n_iter, initial_states, attrgetter('state_id'))
+
+    def write_pending(self):
+        '''Write all pending updates in the calling thread, and re-raise any error encountered by the
+        writer thread.'''
+        self._write_pending()
+        self._check_error()
+
+    def _write_pending(self):
+        data_manager = self.data_manager
+        with data_manager.lock:
+            # Taking the pending updates only while holding the data manager lock ensures that
+            # no batch is in flight in another thread when this returns
+            with self.cond:
+                pending_segments, self.pending_segments = self.pending_segments, {}
+                pending_istates, self.pending_istates = self.pending_istates, {}
+                self.n_pending = 0
+                self.deadline = None
+
+            for n_iter, segments in pending_segments.items():
+                data_manager.update_segments(n_iter, list(segments.values()))
+            for n_iter, initial_states in pending_istates.items():
+                data_manager.update_initial_states(list(initial_states.values()), n_iter=n_iter)
+
+    def _run(self):
+        data_manager = self.data_manager
+        while True:
+            with self.cond:
+                while not self.stopping:
+                    if self.n_pending >= self.max_pending:
+                        break
+                    elif self.deadline is not None:
+                        timeout = self.deadline - time.time()
+                        if timeout <= 0:
+                            break
+                        self.cond.wait(timeout)
+                    else:
+                        self.cond.wait()
+                if self.stopping:
+                    return
+
+            try:
+                with data_manager.lock:
+                    self._write_pending()
+                    if time.time() > data_manager.last_flush + data_manager.flush_period:
+                        data_manager.flush_backing()
+            except Exception as e:
+                log.exception('error in background write to {}'.format(data_manager.we_h5filename))
+                self.error = e
+
+
 # Data types for use in the HDF5 file
 seg_id_dtype = np.int64  # Up to 9 quintillion segments per iteration; signed so that initial states can be stored negative
 n_iter_dtype = np.uint32  # Up to 4 billion iterations
@@ -202,6 +312,13 @@ nw_index_dtype = np.dtype(
 # Storage of bin identities
 binning_index_dtype = np.dtype([('hash', binhash_dtype), ('pickle_len', np.uint32)])
 
+# Bulk per-segment reads and writes (see read_seg_id_rows() and write_seg_id_rows()) select at most
+# this many runs of consecutive segment IDs as a single HDF5 hyperslab union...
+max_hyperslab_runs = 256
+# ...and otherwise read/write the whole span of rows covered by the selection if it is no more than
+# this many times larger than the selection itself
+max_span_ratio = 16
+
 
 class WESTDataManager:
     """Data manager for assisiting the reading and writing of WEST data from/to HDF5 files."""
@@ -212,6 +329,12 @@ class WESTDataManager:
     default_we_h5file_driver = None
     default_flush_period = 60
 
+    # Segment and initial state updates during propagation are written synchronously by default;
+    # otherwise, they are batched and written by a BackgroundWriter
+    default_async_writes = False
+    default_async_write_max_pending = 1000
+    default_async_write_max_delay = 5
+
     # Compress any auxiliary dataset whose total size (across all segments) is more than 1MB
     default_aux_compression_threshold = 1048576
 
@@ -231,7 +354,7 @@ class WESTDataManager:
     def process_config(self):
         config = self.rc.config
 
-        for entry, type_ in [('iter_prec', int)]:
+        for entry, type_ in [('iter_prec', int), ('async_writes', bool), ('async_write_max_pending', int)]:
             config.require_type_if_present(['west', 'data', entry], type_)
 
         self.we_h5filename = config.get_path(['west', 'data', 'west_data_file'], default=self.default_we_h5filename)
@@ -246,6 +369,9 @@ class WESTDataManager:
             ['west', 'data', 'aux_compression_threshold'], self.default_aux_compression_threshold
         )
         self.flush_period = config.get(['west', 'data', 'flush_period'], self.default_flush_period)
+        self.async_writes = config.get(['west', 'data', 'async_writes'], self.default_async_writes)
+        self.async_write_max_pending = config.get(['west', 'data', 'async_write_max_pending'], self.default_async_write_max_pending)
+        self.async_write_max_delay = config.get(['west', 'data', 'async_write_max_delay'], self.default_async_write_max_delay)
         self.iter_ref_h5_template = config.get(['west', 'data', 'data_refs', 'iteration'], None)
         self.store_h5 = self.iter_ref_h5_template is not None
 
@@ -278,8 +404,16 @@ class WESTDataManager:
         self.flush_period = None
         self.last_flush = 0
 
+        self.async_writes = self.default_async_writes
+        self.async_write_max_pending = self.default_async_write_max_pending
+        self.async_write_max_delay = self.default_async_write_max_delay
+        self.background_writer = None
+
         self._system = None
         self.iter_ref_h5_template = None
+
+        # Children of each segment, by iteration, in the form returned by ancestry.child_index()
+        self._child_indices = {}
         self.store_h5 = False
 
         self.dataset_options = {}
@@ -314,6 +448,7 @@ class WESTDataManager:
 
     def del_iter_group(self, n_iter):
         with self.lock:
+            self._child_indices.clear()
             del self.we_h5file['/iterations/iter_{:0{prec}d}'.format(int(n_iter), prec=self.iter_prec)]
 
     def get_iter_group(self, n_iter):
@@ -384,17 +519,51 @@ class WESTDataManager:
             self.we_h5file.create_group('/iterations')
 
     def close_backing(self):
+        if self.background_writer is not None:
+            background_writer, self.background_writer = self.background_writer, None
+            background_writer.stop()
+
         if self.we_h5file is not None:
             with self.lock:
                 self.we_h5file.close()
             self.we_h5file = None
+        self._child_indices.clear()
 
     def flush_backing(self):
+        '''Flush the HDF5 file, first writing any updates pending in the background writer.'''
         if self.we_h5file is not None:
             with self.lock:
+                if self.background_writer is not None:
+                    self.background_writer.write_pending()
                 self.we_h5file.flush()
                 self.last_flush = time.time()
 
+    def _require_background_writer(self):
+        if self.background_writer is None:
+            self.background_writer = BackgroundWriter(self, self.async_write_max_pending, self.async_write_max_delay)
+            self.background_writer.start()
+        return self.background_writer
+
+    def queue_segment_update(self, n_iter, segments):
+        '''Update segment information as ``update_segments()`` does. If asynchronous writes are enabled,
+        the update is written later by a background thread; ``flush_backing()`` waits for all such
+        updates to be written.'''
+        if self.async_writes:
+            self._require_background_writer().queue_segments(n_iter, segments)
+        else:
+            with self.expiring_flushing_lock():
+                self.update_segments(n_iter, segments)
+
+    def queue_initial_state_update(self, initial_states, n_iter=None):
+        '''Save the given initial states as ``update_initial_states()`` does, but in the background if
+        asynchronous writes are enabled (see ``queue_segment_update()``).'''
+        if self.async_writes:
+            n_iter = n_iter or self.current_iteration
+            self._require_background_writer().queue_initial_states(n_iter, initial_states)
+        else:
+            with self.expiring_flushing_lock():
+                self.update_initial_states(initial_states, n_iter=n_iter)
+
     def save_target_states(self, tstates, n_iter=None):
         '''Save the given target states in the HDF5 file; they will be used for the next iteration to
         be propagated.  A complete set is required, even if nominally appending to an existing set,
@@ -808,6 +977,7 @@ class WESTDataManager:
         in the set of segments passed in."""
 
         log.debug('preparing HDF5 group for iteration %d (%d segments)' % (n_iter, len(segments)))
+        self._child_indices.clear()
 
         # Ensure we have a list for guaranteed ordering
         init = n_iter == 0
@@ -850,7 +1020,9 @@ class WESTDataManager:
             pcoord_opts = self.dataset_options.get('pcoord', {'name': 'pcoord', 'h5path': 'pcoord', 'compression': False})
             shape = (n_particles, pcoord_len, pcoord_ndim)
             pcoord_ds = create_dataset_from_dsopts(iter_group, pcoord_opts, shape, pcoord_dtype)
-            pcoord = np.empty((n_particles, pcoord_len, pcoord_ndim), pcoord_dtype)
+            # Segments prepared for propagation may carry only their initial point, so the rest of each
+            # pcoord is zeroed rather than left uninitialized until propagation fills it
+            pcoord = np.zeros((n_particles, pcoord_len, pcoord_ndim), pcoord_dtype)
 
             total_parents = 0
             for seg_id, segment in enumerate(segments):
@@ -948,55 +1120,63 @@ class WESTDataManager:
 
     def update_segments(self, n_iter, segments):
         '''Update segment information in the HDF5 file; all prior information for each
-        ``segment`` is overwritten, except for parent and weight transfer information.'''
-
-        segments = sorted(segments, key=attrgetter('seg_id'))
+        ``segment`` is overwritten, except for parent and weight transfer information.
+        ``segments`` may be a sequence of ``Segment`` objects or a ``SegmentTable``.'''
+
+        if isinstance(segments, SegmentTable):
+            segment_table = segments
+            segment_table.sync()
+            if (np.diff(segment_table.seg_ids) < 0).any():
+                segment_table = segment_table[np.argsort(segment_table.seg_ids, kind='stable')]
+            # Only materialized segments can carry data not already in the table's columns
+            segments = segment_table.materialized_segments()
+        else:
+            segment_table = None
+            segments = sorted(segments, key=attrgetter('seg_id'))
 
         with self.lock:
             iter_group = self.get_iter_group(n_iter)
 
-            pc_dsid = iter_group['pcoord'].id
-            si_dsid = iter_group['seg_index'].id
+            pcoord_ds = iter_group['pcoord']
+            seg_index_ds = iter_group['seg_index']
 
-            seg_ids = [segment.seg_id for segment in segments]
-            n_segments = len(segments)
-            n_total_segments = si_dsid.shape[0]
+            if segment_table is not None:
+                seg_ids = segment_table.seg_ids
+            else:
+                seg_ids = [segment.seg_id for segment in segments]
+            n_segments = len(seg_ids)
+            n_total_segments = seg_index_ds.shape[0]
             system = self.system
             pcoord_ndim = system.pcoord_ndim
             pcoord_len = system.pcoord_len
             pcoord_dtype = system.pcoord_dtype
 
-            seg_index_entries = np.empty((n_segments,), dtype=seg_index_dtype)
-            pcoord_entries = np.empty((n_segments, pcoord_len, pcoord_ndim), dtype=pcoord_dtype)
-
-            pc_msel = h5s.create_simple(pcoord_entries.shape, (h5s.UNLIMITED,) * pcoord_entries.ndim)
-            pc_msel.select_all()
-            si_msel = h5s.create_simple(seg_index_entries.shape, (h5s.UNLIMITED,))
-            si_msel.select_all()
-            pc_fsel = pc_dsid.get_space()
-            si_fsel = si_dsid.get_space()
-
-            for iseg in range(n_segments):
-                seg_id = seg_ids[iseg]
-                op = h5s.SELECT_OR if iseg != 0 else h5s.SELECT_SET
-                si_fsel.select_hyperslab((seg_id,), (1,), op=op)
-                pc_fsel.select_hyperslab((seg_id, 0, 0), (1, pcoord_len, pcoord_ndim), op=op)
+            # Coalesce segment IDs into runs of consecutive IDs, so that each dataset is written in bulk
+            # rather than one segment at a time
+            seg_id_runs = coalesce_seg_id_runs(seg_ids)
 
             # read summary data so that we have valud parent and weight transfer information
-            si_dsid.read(si_msel, si_fsel, seg_index_entries)
+            seg_index_entries = read_seg_id_rows(seg_index_ds, seg_ids, seg_id_runs)
 
-            for iseg, (segment, ientry) in enumerate(zip(segments, seg_index_entries)):
-                ientry['status'] = segment.status
-                ientry['endpoint_type'] = segment.endpoint_type or Segment.SEG_ENDPOINT_UNSET
-                ientry['cputime'] = segment.cputime
-                ientry['walltime'] = segment.walltime
-                ientry['weight'] = segment.weight
+            if segment_table is not None:
+                for field in ('status', 'endpoint_type', 'cputime', 'walltime', 'weight'):
+                    seg_index_entries[field] = segment_table.seg_index[field]
+                pcoord_entries = segment_table.pcoord
+            else:
+                seg_index_entries['status'] = [segment.status for segment in segments]
+                seg_index_entries['endpoint_type'] = [segment.endpoint_type or Segment.SEG_ENDPOINT_UNSET for segment in segments]
+                seg_index_entries['cputime'] = [segment.cputime for segment in segments]
+                seg_index_entries['walltime'] = [segment.walltime for segment in segments]
+                seg_index_entries['weight'] = [segment.weight for segment in segments]
 
-                pcoord_entries[iseg] = segment.pcoord
+                pcoord_entries = np.empty((n_segments, pcoord_len, pcoord_ndim), dtype=pcoord_dtype)
+                for iseg, segment in enumerate(segments):
+                    pcoord_entries[iseg] = segment.pcoord
 
-            # write progress coordinates and index using low level HDF5 functions for efficiency
-            si_dsid.write(si_msel, si_fsel, seg_index_entries)
-            pc_dsid.write(pc_msel, pc_fsel, pcoord_entries)
+            write_seg_id_rows(seg_index_ds, seg_ids, seg_index_entries, seg_id_runs)
+            if pcoord_entries is not None:
+                # (a table loaded without progress coordinates leaves them untouched)
+                write_seg_id_rows(pcoord_ds, seg_ids, pcoord_entries, seg_id_runs)
 
             # Now, to deal with auxiliary data
             # If any segment has any auxiliary data, then the aux dataset must spring into
@@ -1009,10 +1189,13 @@ class WESTDataManager:
             dsets = {}
 
             # First we scan for presence, shape, and data type of auxiliary data sets
+            if segment_table is not None:
+                for dsname, dsdata in segment_table.data.items():
+                    dsets[dsname] = (dsdata.shape[1:], dsdata.dtype)
             for segment in segments:
                 if segment.data:
                     for dsname in segment.data:
-                        if dsname.startswith('iterh5/'):
+                        if dsname.startswith('iterh5/') or (segment_table is not None and dsname in segment_table.data):
                             continue
                         data = np.asarray(segment.data[dsname], order='C')
                         segment.data[dsname] = data
@@ -1027,39 +1210,59 @@ class WESTDataManager:
                     except KeyError:
                         dsopts = normalize_dataset_options({'name': dsname}, path_prefix='auxdata')
 
-                    shape = (n_total_segments,) + shape
                     dset = require_dataset_from_dsopts(
-                        iter_group, dsopts, shape, dtype, autocompress_threshold=self.aux_compression_threshold, n_iter=n_iter
+                        iter_group,
+                        dsopts,
+                        (n_total_segments,) + shape,
+                        dtype,
+                        autocompress_threshold=self.aux_compression_threshold,
+                        n_iter=n_iter,
                     )
                     if dset is None:
                         # storage is suppressed
                         continue
-                    for segment in segments:
-                        try:
-                            auxdataset = segment.data[dsname]
-                        except KeyError:
-                            pass
+
+                    if segment_table is not None and dsname in segment_table.data:
+                        write_seg_id_rows(dset, seg_ids, segment_table.data[dsname], seg_id_runs)
+                    else:
+                        aux_segments = [segment for segment in segments if dsname in segment.data]
+                        if any(segment.data[dsname].shape != shape for segment in aux_segments):
+                            # Ragged data; write each segment's entry into the leading corner of its row
+                            for segment in aux_segments:
+                                auxdataset = segment.data[dsname]
+                                source_rank = len(auxdataset.shape)
+                                source_sel = h5s.create_simple(auxdataset.shape, (h5s.UNLIMITED,) * source_rank)
+                                source_sel.select_all()
+                                dest_sel = dset.id.get_space()
+                                dest_sel.select_hyperslab((segment.seg_id,) + (0,) * source_rank, (1,) + auxdataset.shape)
+                                dset.id.write(source_sel, dest_sel, auxdataset)
                         else:
-                            source_rank = len(auxdataset.shape)
-                            source_sel = h5s.create_simple(auxdataset.shape, (h5s.UNLIMITED,) * source_rank)
-                            source_sel.select_all()
-                            dest_sel = dset.id.get_space()
-                            dest_sel.select_hyperslab((segment.seg_id,) + (0,) * source_rank, (1,) + auxdataset.shape)
-                            dset.id.write(source_sel, dest_sel, auxdataset)
+                            # Gather this data set for all segments carrying it (still in seg_id order) into
+                            # one contiguous array, and write it in bulk
+                            aux_entries = np.empty((len(aux_segments),) + shape, dtype=dtype)
+                            for iseg, segment in enumerate(aux_segments):
+                                aux_entries[iseg] = segment.data[dsname]
+
+                            if len(aux_segments) == n_segments:
+                                write_seg_id_rows(dset, seg_ids, aux_entries, seg_id_runs)
+                            else:
+                                write_seg_id_rows(dset, [segment.seg_id for segment in aux_segments], aux_entries)
+
                     if 'delram' in list(dsopts.keys()):
                         del dsets[dsname]
 
             self.update_iter_h5file(n_iter, segments)
 
-    def get_segments(self, n_iter=None, seg_ids=None, load_pcoords=True):
+    def get_segments(self, n_iter=None, seg_ids=None, load_pcoords=True, as_table=False):
         '''Return the given (or all) segments from a given iteration.
 
-        If the optional parameter ``load_auxdata`` is true, then all auxiliary datasets
-        available are loaded and mapped onto the ``data`` dictionary of each segment. If
-        ``load_auxdata`` is None, then use the default ``self.auto_load_auxdata``, which can
-        be set by the option ``load_auxdata`` in the ``[data]`` section of ``west.cfg``. This
-        essentially requires as much RAM as there is per-iteration auxiliary data, so this
-        behavior is not on by default.'''
+        Auxiliary datasets marked with ``load: true`` in the ``datasets`` section of the ``[data]``
+        section of ``west.cfg`` are loaded and mapped onto the ``data`` dictionary of each segment.
+        This essentially requires as much RAM as there is per-iteration auxiliary data, so this
+        behavior is not on by default.
+
+        If ``as_table`` is true, then a ``SegmentTable`` is returned instead of a list of ``Segment``
+        objects; ``Segment`` objects are then only constructed as rows of the table are accessed.'''
 
         n_iter = n_iter or self.current_iteration
         file_version = self.we_h5file_version
@@ -1073,65 +1276,45 @@ class WESTDataManager:
             else:
                 all_parent_ids = iter_group['wtgraph'][...]
 
+            pcoord_entries = None
             if seg_ids is not None:
                 seg_ids = list(sorted(seg_ids))
                 seg_index_entries = seg_index_ds[seg_ids]
                 if load_pcoords:
                     pcoord_entries = iter_group['pcoord'][seg_ids]
             else:
-                seg_ids = list(range(len(seg_index_ds)))
+                seg_ids = np.arange(len(seg_index_ds), dtype=seg_id_dtype)
                 seg_index_entries = seg_index_ds[...]
                 if load_pcoords:
                     pcoord_entries = iter_group['pcoord'][...]
 
-            segments = []
-
-            for iseg, (seg_id, row) in enumerate(zip(seg_ids, seg_index_entries)):
-                segment = Segment(
-                    seg_id=seg_id,
-                    n_iter=n_iter,
-                    status=int(row['status']),
-                    endpoint_type=int(row['endpoint_type']),
-                    walltime=float(row['walltime']),
-                    cputime=float(row['cputime']),
-                    weight=float(row['weight']),
-                )
-
-                if load_pcoords:
-                    segment.pcoord = pcoord_entries[iseg]
-
-                if file_version < 5:
-                    wtg_n_parents = row['n_parents']
-                    wtg_offset = row['parents_offset']
-                    wtg_parent_ids = all_parent_ids[wtg_offset : wtg_offset + wtg_n_parents]
-                    segment.parent_id = int(wtg_parent_ids[0])
-                else:
-                    wtg_n_parents = row['wtg_n_parents']
-                    wtg_offset = row['wtg_offset']
-                    wtg_parent_ids = all_parent_ids[wtg_offset : wtg_offset + wtg_n_parents]
-                    segment.parent_id = int(row['parent_id'])
-                segment.wtg_parent_ids = set(map(int, wtg_parent_ids))
-                assert len(segment.wtg_parent_ids) == wtg_n_parents
-                segments.append(segment)
-            del all_parent_ids
-            if load_pcoords:
-                del pcoord_entries
+            if file_version < 5:
+                # Convert to the current layout of the segment index
+                old_entries = seg_index_entries
+                seg_index_entries = np.zeros(old_entries.shape, dtype=seg_index_dtype)
+                for field in ('weight', 'cputime', 'walltime', 'endpoint_type', 'status'):
+                    seg_index_entries[field] = old_entries[field]
+                seg_index_entries['wtg_n_parents'] = old_entries['n_parents']
+                seg_index_entries['wtg_offset'] = old_entries['parents_offset']
+                seg_index_entries['parent_id'] = all_parent_ids[old_entries['parents_offset']]
+                del old_entries
 
             # If any other data sets are requested, load them as well
+            data = {}
             for dsinfo in self.dataset_options.values():
                 if dsinfo.get('load', False):
-                    dsname = dsinfo['name']
                     try:
                         ds = iter_group[dsinfo['h5path']]
                     except KeyError:
-                        ds = None
+                        continue
+                    data[dsinfo['name']] = read_seg_id_rows(ds, seg_ids)
 
-                    if ds is not None:
-                        for segment in segments:
-                            seg_id = segment.seg_id
-                            segment.data[dsname] = ds[seg_id]
+            segment_table = SegmentTable(n_iter, seg_ids, seg_index_entries, all_parent_ids, pcoord_entries, data)
 
-        return segments
+        if as_table:
+            return segment_table
+        else:
+            return list(segment_table)
 
     def prepare_segment_restarts(self, segments, basis_states=None, initial_states=None):
         '''Prepare the necessary folder and files given the data stored in parent per-iteration HDF5 file
@@ -1214,25 +1397,40 @@ class WESTDataManager:
             weight_map = dict(zip(unique_ids, index_subset['weight']))
             return [weight_map[seg_id] for seg_id in seg_ids]
 
-    def get_child_ids(self, n_iter, seg_id):
-        '''Return the seg_ids of segments who have the given segment as a parent.'''
+    def get_child_index(self, n_iter):
+        '''Return the children of each segment of iteration ``n_iter`` in compressed sparse row form,
+        as a tuple ``(offsets, child_ids)`` (see :func:`westpa.core.ancestry.child_index`). The
+        index is built from the parent IDs of the following iteration on first use and cached
+        until the lineage of an iteration is (re)written.'''
 
         with self.lock:
+            try:
+                return self._child_indices[n_iter]
+            except KeyError:
+                pass
+
+            n_parents = len(self.get_seg_index(n_iter))
             if n_iter == self.current_iteration:
-                return []
+                parent_ids = []
+            else:
+                iter_group = self.get_iter_group(n_iter + 1)
+                seg_index = iter_group['seg_index']
+                if self.we_h5file_version < 5:
+                    parent_ids = iter_group['parents'][...][seg_index['parents_offset']]
+                else:
+                    parent_ids = seg_index['parent_id']
 
-            iter_group = self.get_iter_group(n_iter + 1)
-            seg_index = iter_group['seg_index']
-            seg_ids = np.arange(len(seg_index), dtype=seg_id_dtype)
+            child_index = self._child_indices[n_iter] = ancestry.child_index(parent_ids, n_parents)
+            return child_index
 
-            if self.we_h5file_version < 5:
-                offsets = seg_index['parents_offset']
-                all_parent_ids = iter_group['parents'][...]
-                parent_ids = np.array([all_parent_ids[offset] for offset in offsets])
-            else:
-                parent_ids = seg_index['parent_id']
+    def get_child_ids(self, n_iter, seg_id):
+        '''Return the seg_ids of segments who have the given segment as a parent.'''
 
-            return seg_ids[parent_ids == seg_id]
+        if n_iter == self.current_iteration:
+            return []
+
+        offsets, child_ids = self.get_child_index(n_iter)
+        return child_ids[offsets[seg_id] : offsets[seg_id + 1]]
 
     def get_children(self, segment):
         '''Return all segments which have the given segment as a parent'''
@@ -1240,34 +1438,7 @@ class WESTDataManager:
         if segment.n_iter == self.current_iteration:
             return []
 
-        # Examine the segment index from the following iteration to see who has this segment
-        # as a parent.  We don't need to worry about the number of parents each segment
-        # has, since each has at least one, and indexing on the offset into the parents array
-        # gives the primary parent ID
-
-        with self.lock:
-            iter_group = self.get_iter_group(segment.n_iter + 1)
-            seg_index = iter_group['seg_index'][...]
-
-            # This is one of the slowest pieces of code I've ever written...
-            # seg_index = iter_group['seg_index'][...]
-            # seg_ids = [seg_id for (seg_id,row) in enumerate(seg_index)
-            #           if all_parent_ids[row['parents_offset']] == segment.seg_id]
-            # return self.get_segments_by_id(segment.n_iter+1, seg_ids)
-            if self.we_h5file_version < 5:
-                parents = iter_group['parents'][seg_index['parent_offsets']]
-            else:
-                parents = seg_index['parent_id']
-            all_seg_ids = np.arange(seg_index.len(), dtype=np.uintp)
-            seg_ids = all_seg_ids[parents == segment.seg_id]
-            # the above will return a scalar if only one is found, so convert
-            # to a list if necessary
-            try:
-                len(seg_ids)
-            except TypeError:
-                seg_ids = [seg_ids]
-
-            return self.get_segments(segment.n_iter + 1, seg_ids)
+        return self.get_segments(segment.n_iter + 1, self.get_child_ids(segment.n_iter, segment.seg_id))
 
     # The following are dictated by the SimManager interface
     def prepare_run(self):
@@ -1406,41 +1577,19 @@ class WESTDataManager:
 
     def get_bin_mapper(self, hashval):
         '''Look up the given hash value in the binning table, unpickling and returning the corresponding
-        bin mapper if available, or raising KeyError if not.'''
-
-        # Convert to a hex digest if we need to
-        try:
-            hashval = hashval.hexdigest()
-        except AttributeError:
-            pass
+        bin mapper if available, or raising KeyError if not. Mappers are cached by hash (see
+        ``h5io.bin_mapper_cache``), so the mapper returned must not be modified.'''
 
         with self.lock:
-            # these will raise KeyError if the group doesn't exist, which also means
+            # this will raise KeyError if the group doesn't exist, which also means
             # that bin data is not available, so no special treatment here
             try:
                 binning_group = self.we_h5file['/bin_topologies']
-                index = binning_group['index']
-                pkl = binning_group['pickles']
             except KeyError:
-                raise KeyError('hash {} not found. Could not retrieve binning group'.format(hashval))
-
-            n_entries = len(index)
-            if n_entries == 0:
-                raise KeyError('hash {} not found. No entries in index'.format(hashval))
-
-            chunksize = self.table_scan_chunksize
-
-            for istart in range(0, n_entries, chunksize):
-                chunk = index[istart : min(istart + chunksize, n_entries)]
-                for i in range(len(chunk)):
-                    if chunk[i]['hash'] == bytes(hashval, 'utf-8'):
-                        pkldat = bytes(pkl[istart + i, 0 : chunk[i]['pickle_len']].data)
-                        mapper = pickle.loads(pkldat)
-                        log.debug('loaded {!r} from {!r}'.format(mapper, binning_group))
-                        log.debug('hash value {!r}'.format(hashval))
-                        return mapper
+                raise KeyError('hash {} not found. Could not retrieve binning group'.format(h5io._hash_key(hashval)))
 
-            raise KeyError('hash {} not found'.format(hashval))
+            mapper, _pkldat = h5io.bin_mapper_cache.get(binning_group, hashval, self.table_scan_chunksize)
+            return mapper
 
     def save_bin_mapper(self, hashval, pickle_data):
         '''Store the given mapper in the table of saved mappers. If the mapper cannot be stored,
@@ -1688,3 +1837,96 @@ def calc_chunksize(shape, dtype, max_chunksize=262144):
         )
     )
     return chunk_shape
+
+
+def coalesce_seg_id_runs(seg_ids):
+    '''Given a sorted sequence of segment IDs, return a pair of arrays ``(starts, counts)``
+    describing the maximal runs of consecutive IDs it contains.'''
+
+    seg_ids = np.asarray(seg_ids, dtype=seg_id_dtype)
+    if len(seg_ids) == 0:
+        return np.empty((0,), dtype=seg_id_dtype), np.empty((0,), dtype=seg_id_dtype)
+
+    breaks = np.flatnonzero(np.diff(seg_ids) != 1) + 1
+    starts = seg_ids[np.concatenate(([0], breaks))]
+    counts = np.diff(np.concatenate(([0], breaks, [len(seg_ids)])))
+    return starts, counts
+
+
+def _select_seg_id_runs(fspace, starts, counts, row_shape):
+    row_offset = (0,) * len(row_shape)
+    for irun, (start, count) in enumerate(zip(starts, counts)):
+        op = h5s.SELECT_OR if irun != 0 else h5s.SELECT_SET
+        fspace.select_hyperslab((int(start),) + row_offset, (int(count),) + row_shape, op=op)
+
+
+def _transfer_seg_id_runs(dsid, transfer, rows, starts, counts, row_shape):
+    # Read or write (depending on ``transfer``) one run of rows at a time
+    row_offset = (0,) * len(row_shape)
+    msel = h5s.create_simple(rows.shape, (h5s.UNLIMITED,) * rows.ndim)
+    fsel = dsid.get_space()
+    offset = 0
+    for start, count in zip(starts, counts):
+        msel.select_hyperslab((offset,) + row_offset, (int(count),) + row_shape)
+        fsel.select_hyperslab((int(start),) + row_offset, (int(count),) + row_shape)
+        transfer(msel, fsel, rows)
+        offset += count
+
+
+def read_seg_id_rows(dataset, seg_ids, seg_id_runs=None):
+    '''Read the rows of ``dataset`` indexed by the sorted sequence ``seg_ids`` in bulk. If the runs of
+    consecutive IDs in ``seg_ids`` have already been computed by ``coalesce_seg_id_runs``, they may be
+    passed as ``seg_id_runs``.'''
+
+    seg_ids = np.asarray(seg_ids, dtype=seg_id_dtype)
+    starts, counts = seg_id_runs if seg_id_runs is not None else coalesce_seg_id_runs(seg_ids)
+    row_shape = dataset.shape[1:]
+    rows = np.empty((len(seg_ids),) + row_shape, dtype=dataset.dtype)
+
+    if len(seg_ids) == 0:
+        return rows
+    elif len(starts) <= max_hyperslab_runs:
+        # A union of a few hyperslabs; read in one call
+        msel = h5s.create_simple(rows.shape, (h5s.UNLIMITED,) * rows.ndim)
+        msel.select_all()
+        fsel = dataset.id.get_space()
+        _select_seg_id_runs(fsel, starts, counts, row_shape)
+        dataset.id.read(msel, fsel, rows)
+    else:
+        # HDF5 handles unions of many hyperslabs very poorly, so either read the whole span of rows
+        # and select in memory, or (if the selection is sparse) read each run separately
+        span_start, span_stop = starts[0], starts[-1] + counts[-1]
+        if span_stop - span_start <= max_span_ratio * len(seg_ids):
+            rows[...] = dataset[span_start:span_stop][seg_ids - span_start]
+        else:
+            _transfer_seg_id_runs(dataset.id, dataset.id.read, rows, starts, counts, row_shape)
+    return rows
+
+
+def write_seg_id_rows(dataset, seg_ids, rows, seg_id_runs=None):
+    '''Write ``rows`` to the rows of ``dataset`` indexed by the sorted sequence ``seg_ids`` in bulk.
+    If the runs of consecutive IDs in ``seg_ids`` have already been computed by ``coalesce_seg_id_runs``,
+    they may be passed as ``seg_id_runs``.'''
+
+    seg_ids = np.asarray(seg_ids, dtype=seg_id_dtype)
+    starts, counts = seg_id_runs if seg_id_runs is not None else coalesce_seg_id_runs(seg_ids)
+    row_shape = dataset.shape[1:]
+
+    if len(seg_ids) == 0:
+        return
+    elif len(starts) <= max_hyperslab_runs:
+        rows = np.ascontiguousarray(rows)
+        msel = h5s.create_simple(rows.shape, (h5s.UNLIMITED,) * rows.ndim)
+        msel.select_all()
+        fsel = dataset.id.get_space()
+        _select_seg_id_runs(fsel, starts, counts, row_shape)
+        dataset.id.write(msel, fsel, rows)
+    else:
+        # See read_seg_id_rows(); rows in the span not being updated are written back unchanged
+        span_start, span_stop = starts[0], starts[-1] + counts[-1]
+        if span_stop - span_start <= max_span_ratio * len(seg_ids):
+            span = dataset[span_start:span_stop]
+            span[seg_ids - span_start] = rows
+            dataset[span_start:span_stop] = span
+        else:
+            _transfer_seg_id_runs(dataset.id, dataset.id.write, np.ascontiguousarray(rows), starts, counts, row_shape)
@@ -4,14 +4,17 @@ import collections
 import errno
 import getpass
 import os
+import pickle
 import posixpath
 import socket
 import sys
+import threading
 import time
 import logging
 
 import h5py
 import numpy as np
+import scipy.sparse as sp
 from numpy import index_exp
 
 from mdtraj import Trajectory, join as join_traj
@@ -348,6 +351,125 @@ def label_axes(h5object, labels, units=None):
         h5object.attrs['axis_units'] = np.array([np.string_(i) for i in units])
 
 
+def save_sparse_transitions(h5group, rows, cols, flux, obs, shape):
+    '''Store a flux matrix and a matrix of observed transition counts sharing the same nonzero
+    entries in ``h5group``, as coordinate (triplet) datasets ``rows``, ``cols``, ``flux``, and
+    ``obs``, with the shape of the matrices stored in the ``nrows`` and ``ncols`` attributes.
+    This is the layout of the per-iteration groups written by ``w_postanalysis_matrix``.'''
+
+    h5group.create_dataset('flux', data=flux, dtype=np.float64)
+    h5group.create_dataset('obs', data=obs, dtype=np.int32)
+    h5group.create_dataset('rows', data=rows, dtype=np.int32)
+    h5group.create_dataset('cols', data=cols, dtype=np.int32)
+    h5group.attrs['nrows'], h5group.attrs['ncols'] = shape
+
+
+def load_bin_transitions(iter_group):
+    '''Return the bin-to-bin flux and transition count matrices saved for the iteration in
+    ``iter_group`` as a tuple of ``scipy.sparse.csr_matrix`` objects. Both the sparse
+    ``bin_transitions`` group and the dense ``bin_fluxes`` and ``bin_ntrans`` datasets written by
+    earlier versions are read. Returns ``(None, None)`` if neither is present.'''
+
+    if 'bin_transitions' in iter_group:
+        h5group = iter_group['bin_transitions']
+        shape = (int(h5group.attrs['nrows']), int(h5group.attrs['ncols']))
+        coords = (h5group['rows'][...], h5group['cols'][...])
+        return sp.csr_matrix((h5group['flux'][...], coords), shape=shape), sp.csr_matrix((h5group['obs'][...], coords), shape=shape)
+    elif 'bin_fluxes' in iter_group:
+        return sp.csr_matrix(iter_group['bin_fluxes'][...]), sp.csr_matrix(iter_group['bin_ntrans'][...])
+    else:
+        return None, None
+
+
+def _hash_key(hashval):
+    '''Return ``hashval`` (a hash object, or a hex digest as a string or bytes) as a string.'''
+    try:
+        hashval = hashval.hexdigest()
+    except AttributeError:
+        pass
+    if isinstance(hashval, bytes):
+        hashval = hashval.decode('utf-8')
+    return str(hashval)
+
+
+def _read_mapper_pickle(topol_group, hashval, chunksize):
+    '''Return the pickled bin mapper identified by the hex digest ``hashval`` in ``topol_group``.'''
+    try:
+        index = topol_group['index']
+        pickles = topol_group['pickles']
+    except KeyError:
+        raise KeyError('hash {} not found. Could not retrieve binning group'.format(hashval))
+
+    n_entries = len(index)
+    if n_entries == 0:
+        raise KeyError('hash {} not found. No entries in index'.format(hashval))
+
+    hashbytes = bytes(hashval, 'utf-8')
+    for istart in range(0, n_entries, chunksize):
+        chunk = index[istart : min(istart + chunksize, n_entries)]
+        matches = np.flatnonzero(chunk['hash'] == hashbytes)
+        if len(matches):
+            i = matches[0]
+            return bytes(pickles[istart + i, 0 : chunk[i]['pickle_len']].data)
+
+    raise KeyError('hash {} not found'.format(hashval))
+
+
+BinMapperCacheInfo = collections.namedtuple('BinMapperCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class BinMapperCache:
+    '''A least-recently-used cache of bin mappers read from the ``bin_topologies`` group of WEST
+    HDF5 files, keyed by the hash of the pickled mapper. As the hash identifies the pickled data,
+    cached mappers are shared by all files and readers in a process (``bin_mapper_cache`` is used by
+    the data manager, the analysis tools, and ``westpa.analysis``), so that each distinct mapper of a
+    run is unpickled only once. Mappers returned from the cache must not be modified.'''
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, topol_group, hashval, chunksize=1024):
+        '''Return ``(mapper, pickled_data)`` for the mapper identified by ``hashval``, reading it from
+        the bin topology group ``topol_group`` if it is not cached. Raises KeyError if it is not found.'''
+        hashval = _hash_key(hashval)
+        with self._lock:
+            entry = self._entries.get(hashval)
+            if entry is not None:
+                self._entries.move_to_end(hashval)
+                self.hits += 1
+                return entry
+
+        pkldat = _read_mapper_pickle(topol_group, hashval, chunksize)
+        mapper = pickle.loads(pkldat)
+        log.debug('loaded {!r} from {!r}'.format(mapper, topol_group))
+        log.debug('hash value {!r}'.format(hashval))
+
+        with self._lock:
+            self.misses += 1
+            self._entries[hashval] = (mapper, pkldat)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return mapper, pkldat
+
+    def info(self):
+        '''Return the numbers of cache hits and misses and the maximum and current size of the cache.'''
+        with self._lock:
+            return BinMapperCacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        '''Remove all cached mappers and reset the hit and miss counts.'''
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+bin_mapper_cache = BinMapperCache()
+
+
 NotGiven = object()
 
 
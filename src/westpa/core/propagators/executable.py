@@ -9,6 +9,9 @@ import tempfile
 import time
 import tarfile
 import pickle
+import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
 import numpy as np
@@ -29,18 +32,49 @@ log = logging.getLogger(__name__)
 SIGNAL_NAMES = {getattr(signal, name): name for name in dir(signal) if name.startswith('SIG') and not name.startswith('SIG_')}
 
 
-def pcoord_loader(fieldname, pcoord_return_filename, destobj, single_point):
+# pcoord return files at least this large (in bytes) are memory-mapped rather than read
+pcoord_mmap_threshold = 1 << 20
+
+NPY_MAGIC = b'\x93NUMPY'
+
+
+def is_npy_file(filename):
+    '''Return True if ``filename`` is a NumPy ``.npy`` file, as determined from its contents.'''
+    with open(filename, 'rb') as f:
+        return f.read(len(NPY_MAGIC)) == NPY_MAGIC
+
+
+def pcoord_loader(fieldname, pcoord_return_filename, destobj, single_point, binary=False, dtype=None):
     """Read progress coordinate data into the ``pcoord`` field on ``destobj``.
     An exception will be raised if the data is malformed.  If ``single_point`` is true,
     then only one (N-dimensional) point will be read, otherwise system.pcoord_len points
     will be read.
+
+    Progress coordinates may be returned as text or as a NumPy ``.npy`` file, which is
+    detected automatically. If ``binary`` is true, the return file instead holds raw
+    binary data of type ``dtype`` (by default, the progress coordinate data type of the
+    system). Binary returns at least ``pcoord_mmap_threshold`` bytes in size are
+    memory-mapped (copy-on-write) instead of read.
     """
 
     system = westpa.rc.get_system_driver()
 
     assert fieldname == 'pcoord'
 
-    pcoord = np.loadtxt(pcoord_return_filename, dtype=system.pcoord_dtype)
+    if binary:
+        dtype = np.dtype(dtype or system.pcoord_dtype)
+        if os.path.getsize(pcoord_return_filename) >= pcoord_mmap_threshold:
+            pcoord = np.memmap(pcoord_return_filename, dtype=dtype, mode='c')
+        else:
+            pcoord = np.fromfile(pcoord_return_filename, dtype=dtype)
+    elif is_npy_file(pcoord_return_filename):
+        mmap_mode = 'c' if os.path.getsize(pcoord_return_filename) >= pcoord_mmap_threshold else None
+        pcoord = np.load(pcoord_return_filename, mmap_mode=mmap_mode, allow_pickle=False)
+    else:
+        pcoord = np.loadtxt(pcoord_return_filename, dtype=system.pcoord_dtype)
+
+    if pcoord.dtype != system.pcoord_dtype:
+        pcoord = pcoord.astype(system.pcoord_dtype)
 
     if single_point:
         expected_shape = (system.pcoord_ndim,)
@@ -168,6 +202,9 @@ data_loaders = {
 class ExecutablePropagator(WESTPropagator):
     ENV_CURRENT_ITER = 'WEST_CURRENT_ITER'
 
+    # Datasets which are returned per segment even in batch mode
+    PER_SEGMENT_DATASETS = ('trajectory', 'restart', 'log')
+
     # Environment variables set during propagation
     ENV_CURRENT_SEG_ID = 'WEST_CURRENT_SEG_ID'
     ENV_CURRENT_SEG_DATA_REF = 'WEST_CURRENT_SEG_DATA_REF'
@@ -190,6 +227,10 @@ class ExecutablePropagator(WESTPropagator):
     ENV_RAND128 = 'WEST_RAND128'
     ENV_RANDFLOAT = 'WEST_RANDFLOAT'
 
+    # Environment variables for batch propagation
+    ENV_BATCH_MANIFEST = 'WEST_BATCH_MANIFEST'
+    ENV_BATCH_RETURN = 'WEST_BATCH_RETURN'
+
     def __init__(self, rc=None):
         super().__init__(rc)
 
@@ -256,6 +297,17 @@ class ExecutablePropagator(WESTPropagator):
             # apply environment modifications specific to this executable
             self.exe_info[child_type]['environ'] = {k: str(v) for k, v in (child_info.get('environ') or {}).items()}
 
+            if child_type == 'propagator':
+                # in batch mode, one child process propagates all segments of a block
+                self.exe_info[child_type]['batch'] = child_info.get('batch', False)
+                check_bool(self.exe_info[child_type]['batch'])
+
+                # number of segments of a block to propagate at the same time (outside of batch mode)
+                max_concurrent_children = int(child_info.get('max_concurrent_children', 1))
+                if max_concurrent_children < 1:
+                    raise ValueError('max_concurrent_children must be at least 1')
+                self.exe_info[child_type]['max_concurrent_children'] = max_concurrent_children
+
         log.debug('exe_info: {!r}'.format(self.exe_info))
 
         # Load configuration items relating to dataset input
@@ -297,12 +349,20 @@ class ExecutablePropagator(WESTPropagator):
                     loader = data_loaders[loader_directive]
                 else:
                     loader = get_object(loader_directive)
+            elif dsname in self.data_info:
+                # keep the default loader of built-in datasets
+                loader = self.data_info[dsname]['loader']
             elif dsname not in ['pcoord', 'seglog', 'restart', 'trajectory']:
                 loader = aux_data_loader
 
             dsinfo['loader'] = loader
             self.data_info.setdefault(dsname, {}).update(dsinfo)
 
+        # Progress coordinates returned as raw binary data must be declared as such
+        pcoord_info = self.data_info['pcoord']
+        if pcoord_info.get('format', 'text') == 'binary' and pcoord_info['loader'] is pcoord_loader:
+            pcoord_info['loader'] = functools.partial(pcoord_loader, binary=True, dtype=pcoord_info.get('dtype'))
+
         log.debug('data_info: {!r}'.format(self.data_info))
 
     @staticmethod
@@ -599,6 +659,61 @@ class ExecutablePropagator(WESTPropagator):
                     else:
                         log.debug('deleted {} file {!r}'.format(dataset, filename))
 
+    def retrieve_batch_return(self, segments, bulk_return_filename, datasets):
+        '''Split the bulk return of a batch propagation among ``segments``. ``bulk_return_filename``
+        is the path to a NumPy ``.npz`` file containing one array per dataset named in ``datasets``,
+        whose first axis runs over ``segments`` (in order). An optional integer array ``returncodes``
+        marks individual segments as failed where nonzero. The bulk return file is deleted once read.'''
+        system = self.rc.get_system_driver()
+        n_segments = len(segments)
+
+        try:
+            with np.load(bulk_return_filename, allow_pickle=False) as bulk_return:
+                returns = {key: bulk_return[key] for key in bulk_return.files}
+        except Exception as e:
+            log.error('could not read batch return {!r}: {!r}'.format(bulk_return_filename, e))
+            for segment in segments:
+                segment.status = Segment.SEG_STATUS_FAILED
+            return
+        finally:
+            try:
+                os.unlink(bulk_return_filename)
+            except Exception as e:
+                log.warning('could not delete batch return file {!r}: {!r}'.format(bulk_return_filename, e))
+
+        for dataset in datasets:
+            try:
+                data = returns[dataset]
+                if dataset == 'pcoord':
+                    expected_shape = (n_segments, system.pcoord_len, system.pcoord_ndim)
+                    data = data.astype(system.pcoord_dtype, copy=False)
+                    if data.shape != expected_shape and data.size == np.prod(expected_shape):
+                        data = data.reshape(expected_shape)
+                    if data.shape != expected_shape:
+                        raise ValueError(
+                            'progress coordinate data has incorrect shape {!r} [expected {!r}]'.format(data.shape, expected_shape)
+                        )
+                elif len(data) != n_segments:
+                    raise ValueError('expected data for {} segments, got {}'.format(n_segments, len(data)))
+            except Exception as e:
+                log.error('could not read {} from batch return {!r}: {!r}'.format(dataset, bulk_return_filename, e))
+                for segment in segments:
+                    segment.status = Segment.SEG_STATUS_FAILED
+                return
+
+            for segment, segment_data in zip(segments, data):
+                if dataset == 'pcoord':
+                    segment.pcoord = segment_data
+                else:
+                    segment.data[dataset] = segment_data
+
+        returncodes = returns.get('returncodes')
+        if returncodes is not None:
+            for segment, rc in zip(segments, returncodes.ravel().tolist()):
+                if rc != 0:
+                    log.error('batch propagation of segment %d failed with code %d' % (segment.seg_id, rc))
+                    segment.status = Segment.SEG_STATUS_FAILED
+
     # Specific functions required by the WEST framework
     def get_pcoord(self, state):
         '''Get the progress coordinate of the given basis or initial state.'''
@@ -672,32 +787,141 @@ class ExecutablePropagator(WESTPropagator):
     def propagate(self, segments):
         child_info = self.exe_info['propagator']
 
+        if child_info.get('batch', False):
+            return self.propagate_batch(segments)
+
+        max_concurrent_children = child_info.get('max_concurrent_children', 1)
+        if max_concurrent_children > 1:
+            segments = list(segments)
+            max_workers = min(max_concurrent_children, len(segments)) or 1
+            # Each thread gets its own copy of child_info, since exec_for_segment() sets the working directory on it
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self.propagate_segment, dict(child_info), segment) for segment in segments]
+                for future in futures:
+                    future.result()
+        else:
+            for segment in segments:
+                self.propagate_segment(child_info, segment)
+        return segments
+
+    def propagate_segment(self, child_info, segment):
+        '''Propagate a single segment by executing the child process described by ``child_info``,
+        and record its status, returned data, and timing information on ``segment``.'''
+        starttime = time.time()
+
+        addtl_env, return_files, del_return_files = self.setup_dataset_return(segment)
+
+        # Spawn propagator and wait for its completion
+        rc, rusage = self.exec_for_segment(child_info, segment, addtl_env)
+
+        if rc == 0:
+            segment.status = Segment.SEG_STATUS_COMPLETE
+        elif rc < 0:
+            log.error('child process for segment %d exited on signal %d (%s)' % (segment.seg_id, -rc, SIGNAL_NAMES[-rc]))
+            segment.status = Segment.SEG_STATUS_FAILED
+            return segment
+        else:
+            log.error('child process for segment %d exited with code %d' % (segment.seg_id, rc))
+            segment.status = Segment.SEG_STATUS_FAILED
+            return segment
+
+        # Extract data and store on segment for recording in the master thread/process/node
+        self.retrieve_dataset_return(segment, return_files, del_return_files, False)
+
+        if segment.status == Segment.SEG_STATUS_FAILED:
+            return segment
+
+        # Record timing info
+        segment.walltime = time.time() - starttime
+        segment.cputime = rusage.ru_utime
+        return segment
+
+    def propagate_batch(self, segments):
+        '''Propagate all of ``segments`` with a single execution of the propagator. The child
+        process finds a JSON manifest of the segments at ``WEST_BATCH_MANIFEST``, giving for each
+        segment the environment it would receive if run on its own, and must store the progress
+        coordinates and other datasets of all segments in one NumPy ``.npz`` file at ``WEST_BATCH_RETURN``
+        (see ``retrieve_batch_return``). Datasets returned as directories (trajectories, restart files,
+        logs) are still returned per segment, through the paths in each segment's environment.'''
+        child_info = self.exe_info['propagator']
+        segments = list(segments)
+        if not segments:
+            return segments
+
+        starttime = time.time()
+
+        # Datasets split from the bulk return file (pcoord and auxiliary datasets); trajectory, restart,
+        # and log data and other directory returns stay per-segment
+        bulk_datasets = [
+            dataset
+            for dataset, info in self.data_info.items()
+            if info.get('enabled', False) and dataset not in self.PER_SEGMENT_DATASETS and not info.get('dir', False)
+        ]
+        segment_datasets = [dataset for dataset in self.data_info if dataset not in bulk_datasets]
+
+        manifest = {'n_iter': int(segments[0].n_iter), 'segments': []}
+        segment_returns = []
         for segment in segments:
-            starttime = time.time()
+            template_args, environ = {}, {}
+            self.update_args_env_iter(template_args, environ, segment.n_iter)
+            self.update_args_env_segment(template_args, environ, segment)
+            self.prepare_file_system(segment, environ)
+            addtl_env, return_files, del_return_files = self.setup_dataset_return(segment, subset_keys=segment_datasets)
+            environ.update(addtl_env)
+            # Each segment gets its own random seeds, as it would when run on its own
+            environ.update(self.random_val_env_vars())
+            segment_returns.append((return_files, del_return_files))
+            manifest['segments'].append(
+                {
+                    'seg_id': int(segment.seg_id),
+                    'parent_id': int(segment.parent_id) if segment.parent_id is not None else -1,
+                    'environ': environ,
+                }
+            )
 
-            addtl_env, return_files, del_return_files = self.setup_dataset_return(segment)
+        (fd, manifest_filename) = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'wt') as manifest_file:
+            json.dump(manifest, manifest_file)
+        (fd, bulk_return_filename) = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
 
-            # Spawn propagator and wait for its completion
-            rc, rusage = self.exec_for_segment(child_info, segment, addtl_env)
+        template_args, environ = {}, {}
+        self.update_args_env_iter(template_args, environ, segments[0].n_iter)
+        environ[self.ENV_BATCH_MANIFEST] = manifest_filename
+        environ[self.ENV_BATCH_RETURN] = bulk_return_filename
 
-            if rc == 0:
-                segment.status = Segment.SEG_STATUS_COMPLETE
-            elif rc < 0:
-                log.error('child process for segment %d exited on signal %d (%s)' % (segment.seg_id, -rc, SIGNAL_NAMES[-rc]))
-                segment.status = Segment.SEG_STATUS_FAILED
-                continue
+        # Spawn propagator and wait for its completion
+        try:
+            rc, rusage = self.exec_child_from_child_info(child_info, template_args, environ)
+        finally:
+            os.unlink(manifest_filename)
+
+        if rc != 0:
+            if rc < 0:
+                log.error(
+                    'child process for batch of %d segments exited on signal %d (%s)' % (len(segments), -rc, SIGNAL_NAMES[-rc])
+                )
             else:
-                log.error('child process for segment %d exited with code %d' % (segment.seg_id, rc))
+                log.error('child process for batch of %d segments exited with code %d' % (len(segments), rc))
+            os.unlink(bulk_return_filename)
+            for segment in segments:
                 segment.status = Segment.SEG_STATUS_FAILED
-                continue
+            return segments
 
-            # Extract data and store on segment for recording in the master thread/process/node
-            self.retrieve_dataset_return(segment, return_files, del_return_files, False)
+        for segment in segments:
+            segment.status = Segment.SEG_STATUS_COMPLETE
 
-            if segment.status == Segment.SEG_STATUS_FAILED:
-                continue
+        # Extract data and store on segments for recording in the master thread/process/node
+        self.retrieve_batch_return(segments, bulk_return_filename, bulk_datasets)
+        for segment, (return_files, del_return_files) in zip(segments, segment_returns):
+            if segment.status != Segment.SEG_STATUS_FAILED:
+                self.retrieve_dataset_return(segment, return_files, del_return_files, False)
 
-            # Record timing info
-            segment.walltime = time.time() - starttime
-            segment.cputime = rusage.ru_utime
+        # Record timing info, divided evenly among the segments of the batch
+        walltime = (time.time() - starttime) / len(segments)
+        cputime = rusage.ru_utime / len(segments)
+        for segment in segments:
+            if segment.status != Segment.SEG_STATUS_FAILED:
+                segment.walltime = walltime
+                segment.cputime = cputime
         return segments
@@ -0,0 +1,113 @@
+import logging
+import time
+
+import numpy as np
+
+from westpa.core.propagators import WESTPropagator
+from westpa.core.segment import Segment
+
+log = logging.getLogger(__name__)
+
+
+class PythonPropagator(WESTPropagator):
+    '''Base class for propagators that run dynamics in the WESTPA process itself, without
+    executing external programs or passing data through the file system.
+
+    Subclasses implement ``propagate_block()``, which advances all segments of a block at
+    once, writing progress coordinates directly into a single array shared by the block.
+    Each segment's ``pcoord`` is a view into that array, so no per-segment copies are made
+    on return. ``get_pcoord()`` and ``gen_istate()`` must also be provided as for any other
+    propagator.'''
+
+    def propagate_block(self, segments, pcoords):
+        '''Propagate ``segments``. ``pcoords`` is an array of shape
+        ``(len(segments), pcoord_len, pcoord_ndim)`` whose first point along the second axis
+        holds the starting progress coordinate of each segment; the remaining points are to
+        be filled in place. Optionally return a dictionary mapping auxiliary dataset names
+        to arrays indexed first by segment.'''
+        raise NotImplementedError
+
+    def propagate(self, segments):
+        system = self.rc.get_system_driver()
+        n_segs = len(segments)
+
+        pcoords = np.empty((n_segs, system.pcoord_len, system.pcoord_ndim), dtype=system.pcoord_dtype)
+        for iseg, segment in enumerate(segments):
+            pcoords[iseg, 0] = segment.pcoord[0]
+
+        starttime = time.time()
+        startcpu = time.process_time()
+        try:
+            auxdata = self.propagate_block(segments, pcoords) or {}
+        except Exception:
+            log.exception('could not propagate block of {} segments'.format(n_segs))
+            for segment in segments:
+                segment.status = Segment.SEG_STATUS_FAILED
+            return segments
+
+        # Timing is only available for the block as a whole
+        walltime = (time.time() - starttime) / n_segs if n_segs else 0.0
+        cputime = (time.process_time() - startcpu) / n_segs if n_segs else 0.0
+
+        for iseg, segment in enumerate(segments):
+            segment.pcoord = pcoords[iseg]
+            for dsname, data in auxdata.items():
+                segment.data[dsname] = data[iseg]
+            segment.status = Segment.SEG_STATUS_COMPLETE
+            segment.walltime = walltime
+            segment.cputime = cputime
+
+        return segments
+
+
+class LangevinPropagator(PythonPropagator):
+    '''Reference ``PythonPropagator`` running overdamped Langevin (Brownian) dynamics on an
+    analytic potential, by default the double well ``V(x) = barrier * (x**2 - 1)**2``
+    applied along each dimension of the progress coordinate. Parameters are read from the
+    optional ``west.langevin`` section of the configuration file:
+
+    - ``timestep``: integration time step
+    - ``kT``: thermal energy
+    - ``friction``: friction coefficient; the diffusion coefficient is ``kT / friction``
+    - ``steps_per_point``: number of integration steps between stored progress coordinate points
+    - ``barrier``: height of the double well barrier
+    - ``initial_pcoord``: progress coordinate of basis and initial states
+
+    Subclasses may override ``force()`` to use a different potential.'''
+
+    def __init__(self, rc=None):
+        super().__init__(rc)
+
+        config = self.rc.config
+        langevin = config.get(['west', 'langevin']) or {}
+        self.timestep = float(langevin.get('timestep', 1e-3))
+        self.kT = float(langevin.get('kT', 1.0))
+        self.friction = float(langevin.get('friction', 1.0))
+        self.steps_per_point = int(langevin.get('steps_per_point', 10))
+        self.barrier = float(langevin.get('barrier', 5.0))
+        self.initial_pcoord = langevin.get('initial_pcoord', -1.0)
+
+    def force(self, x):
+        '''Return the force (negative gradient of the potential) at positions ``x``.'''
+        return -4 * self.barrier * x * (x * x - 1)
+
+    def get_pcoord(self, state):
+        '''Get the progress coordinate of the given basis or initial state.'''
+        system = self.rc.get_system_driver()
+        state.pcoord = np.full((system.pcoord_ndim,), self.initial_pcoord, dtype=system.pcoord_dtype)
+
+    def gen_istate(self, basis_state, initial_state):
+        '''Generate a new initial state from the given basis state.'''
+        initial_state.pcoord = np.array(basis_state.pcoord, copy=True)
+        initial_state.istate_status = initial_state.ISTATE_STATUS_PREPARED
+        return initial_state
+
+    def propagate_block(self, segments, pcoords):
+        mobility_dt = self.timestep / self.friction
+        noise_scale = np.sqrt(2 * self.kT * mobility_dt)
+
+        x = pcoords[:, 0].astype(np.float64)
+        for ipoint in range(1, pcoords.shape[1]):
+            for _istep in range(self.steps_per_point):
+                x += mobility_dt * self.force(x) + np.random.normal(scale=noise_scale, size=x.shape)
+            pcoords[:, ipoint] = x
@@ -117,3 +117,178 @@ Segment.initpoint_type_names.update(
     {getattr(Segment, _attr): _attr for _attr in dir(Segment) if _attr.startswith('SEG_INITPOINT_')}
 )
 Segment.endpoint_type_names.update({getattr(Segment, _attr): _attr for _attr in dir(Segment) if _attr.startswith('SEG_ENDPOINT_')})
+
+
+class SegmentTable:
+    '''A columnar collection of the segments of a single iteration, backed by the arrays read from the
+    ``seg_index``, ``pcoord``, and ``wtgraph`` datasets of an iteration group rather than by one ``Segment``
+    object per row. ``Segment`` objects are only constructed when a row is requested (by indexing or
+    iterating over the table), and are cached, so that requesting the same row again returns the same
+    object. The progress coordinate of such a segment is a view into ``pcoord``.
+
+    ``seg_index`` is a structured array with (at least) the fields ``weight``, ``parent_id``, ``wtg_n_parents``,
+    ``wtg_offset``, ``cputime``, ``walltime``, ``endpoint_type``, and ``status``. The weight transfer graph
+    parents of row ``i`` are ``wtgraph[wtg_offset[i]:wtg_offset[i]+wtg_n_parents[i]]``. ``data`` is a mapping of
+    auxiliary dataset name to an array of per-row data.
+
+    Because materialized segments may be modified (by the WE driver or by propagation), ``sync()`` must be
+    called to copy such modifications back into the columns before the columns are used in their place.
+    '''
+
+    def __init__(self, n_iter, seg_ids, seg_index, wtgraph, pcoord=None, data=None):
+        self.n_iter = int(n_iter)
+        self.seg_ids = np.asarray(seg_ids, dtype=np.int64)
+        self.seg_index = seg_index
+        self.wtgraph = wtgraph
+        self.pcoord = pcoord
+        self.data = dict(data) if data else {}
+
+        self._segments = [None] * len(self.seg_ids)
+
+    def __len__(self):
+        return len(self.seg_ids)
+
+    def __repr__(self):
+        return '<{}({}) n_iter={!r} n_segments={:d}>'.format(self.__class__.__name__, hex(id(self)), self.n_iter, len(self))
+
+    @property
+    def weights(self):
+        return self.seg_index['weight']
+
+    @property
+    def parent_ids(self):
+        return self.seg_index['parent_id']
+
+    @property
+    def statuses(self):
+        return self.seg_index['status']
+
+    @property
+    def endpoint_types(self):
+        return self.seg_index['endpoint_type']
+
+    @property
+    def initial_pcoords(self):
+        'The initial progress coordinate point of each segment.'
+        return self.pcoord[:, 0]
+
+    @property
+    def final_pcoords(self):
+        'The final progress coordinate point of each segment.'
+        return self.pcoord[:, -1]
+
+    def wtg_parent_ids(self, index):
+        '''Return the weight transfer graph parents of the segment in row ``index``.'''
+        offset = self.seg_index['wtg_offset'][index]
+        return self.wtgraph[offset : offset + self.seg_index['wtg_n_parents'][index]]
+
+    def _materialize(self, index):
+        row = self.seg_index[index]
+        segment = Segment(
+            seg_id=self.seg_ids[index],
+            n_iter=self.n_iter,
+            status=row['status'],
+            endpoint_type=row['endpoint_type'],
+            walltime=float(row['walltime']),
+            cputime=float(row['cputime']),
+            weight=row['weight'],
+            parent_id=row['parent_id'],
+            wtg_parent_ids=self.wtg_parent_ids(index).tolist(),
+            pcoord=self.pcoord[index] if self.pcoord is not None else None,
+            data={dsname: dsdata[index] for dsname, dsdata in self.data.items()},
+        )
+        self._segments[index] = segment
+        return segment
+
+    def __getitem__(self, key):
+        '''Return the ``Segment`` in the given row, or, if ``key`` is a slice, index array, or boolean mask,
+        a new table containing the selected rows. A new table shares those segments already materialized
+        with this one.'''
+
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            return self._segments[key] or self._materialize(key)
+
+        indices = np.arange(len(self))[key]
+        subset = SegmentTable(
+            self.n_iter,
+            self.seg_ids[indices],
+            self.seg_index[indices],
+            self.wtgraph,
+            self.pcoord[indices] if self.pcoord is not None else None,
+            {dsname: dsdata[indices] for dsname, dsdata in self.data.items()},
+        )
+        subset._segments = [self._segments[index] for index in indices]
+        return subset
+
+    def __iter__(self):
+        segments = self._segments
+        if segments.count(None) > len(segments) // 2:
+            self._materialize_all()
+        for index in range(len(self)):
+            yield segments[index] or self._materialize(index)
+
+    def _materialize_all(self):
+        # Convert whole columns to Python objects at once, rather than row by row
+        seg_index = self.seg_index
+        columns = zip(
+            range(len(self)),
+            self.seg_ids.tolist(),
+            seg_index['status'].tolist(),
+            seg_index['endpoint_type'].tolist(),
+            seg_index['walltime'].tolist(),
+            seg_index['cputime'].tolist(),
+            seg_index['weight'].tolist(),
+            seg_index['parent_id'].tolist(),
+            seg_index['wtg_offset'].tolist(),
+            seg_index['wtg_n_parents'].tolist(),
+        )
+        wtgraph = self.wtgraph.tolist()
+        pcoord = self.pcoord
+        segments = self._segments
+        for index, seg_id, status, endpoint_type, walltime, cputime, weight, parent_id, wtg_offset, wtg_n_parents in columns:
+            if segments[index] is not None:
+                continue
+            segments[index] = Segment(
+                seg_id=seg_id,
+                n_iter=self.n_iter,
+                status=status,
+                endpoint_type=endpoint_type,
+                walltime=walltime,
+                cputime=cputime,
+                weight=weight,
+                parent_id=parent_id,
+                wtg_parent_ids=wtgraph[wtg_offset : wtg_offset + wtg_n_parents],
+                pcoord=pcoord[index] if pcoord is not None else None,
+                data={dsname: dsdata[index] for dsname, dsdata in self.data.items()},
+            )
+
+    def materialized_segments(self):
+        '''Return the ``Segment`` objects that have been constructed for this table.'''
+        return [segment for segment in self._segments if segment is not None]
+
+    def sync(self):
+        '''Copy the mutable state (status, endpoint type, weight, timing, progress coordinates, and auxiliary
+        data already present in ``data``) of any materialized segments back into the columns of this table.'''
+
+        seg_index = self.seg_index
+        for index, segment in enumerate(self._segments):
+            if segment is None:
+                continue
+
+            row = seg_index[index]
+            row['status'] = segment.status
+            row['endpoint_type'] = segment.endpoint_type or Segment.SEG_ENDPOINT_UNSET
+            row['weight'] = segment.weight
+            row['cputime'] = segment.cputime
+            row['walltime'] = segment.walltime
+
+            if self.pcoord is not None and segment.pcoord is not None:
+                self.pcoord[index] = segment.pcoord
+
+            for dsname, dsdata in self.data.items():
+                try:
+                    dsdata[index] = segment.data[dsname]
+                except KeyError:
+                    pass
@@ -15,6 +15,7 @@ from .data_manager import weight_dtype
 from .segment import Segment
 from .states import InitialState
 from . import extloader
+from . import h5io
 from . import wm_ops
 
 
@@ -441,8 +442,10 @@ class WESimManager:
         self.current_iter_bstates = self.data_manager.get_basis_states(self.n_iter)
 
         # Get the segments for this iteration and separate into complete and incomplete
+        segment_table = None
         if self.segments is None:
-            segments = self.segments = {segment.seg_id: segment for segment in self.data_manager.get_segments()}
+            segment_table = self.data_manager.get_segments(as_table=True)
+            segments = self.segments = {segment.seg_id: segment for segment in segment_table}
             log.debug('loaded {:d} segments'.format(len(segments)))
         else:
             segments = self.segments
@@ -473,15 +476,18 @@ class WESimManager:
         log.debug('This iteration uses {:d} initial states'.format(len(self.current_iter_istates)))
 
         # Assign this iteration's segments' initial points to bins and report on bin population
-        initial_pcoords = self.system.new_pcoord_array(len(segments))
         initial_binning = self.system.bin_mapper.construct_bins()
-        for iseg, segment in enumerate(segments.values()):
-            initial_pcoords[iseg] = segment.pcoord[0]
+        if segment_table is not None:
+            initial_pcoords = segment_table.initial_pcoords
+        else:
+            initial_pcoords = self.system.new_pcoord_array(len(segments))
+            for iseg, segment in enumerate(segments.values()):
+                initial_pcoords[iseg] = segment.pcoord[0]
         initial_assignments = self.system.bin_mapper.assign(initial_pcoords)
         for segment, assignment in zip(iter(segments.values()), initial_assignments):
             initial_binning[assignment].add(segment)
         self.report_bin_statistics(initial_binning, [], save_summary=True)
-        del initial_pcoords, initial_binning
+        del initial_pcoords, initial_binning, segment_table
 
         self.rc.pstatus('Waiting for segments to complete...')
 
@@ -603,16 +609,14 @@ class WESimManager:
                 istate_gen_futures.update(new_istate_futures)
                 futures.update(new_istate_futures)
 
-                with self.data_manager.expiring_flushing_lock():
-                    self.data_manager.update_segments(self.n_iter, incoming)
+                self.data_manager.queue_segment_update(self.n_iter, incoming)
 
             elif future in istate_gen_futures:
                 istate_gen_futures.remove(future)
                 _basis_state, initial_state = future.get_result()
                 log.debug('received newly-prepared initial state {!r}'.format(initial_state))
                 initial_state.istate_status = InitialState.ISTATE_STATUS_PREPARED
-                with self.data_manager.expiring_flushing_lock():
-                    self.data_manager.update_initial_states([initial_state], n_iter=self.n_iter + 1)
+                self.data_manager.queue_initial_state_update([initial_state], n_iter=self.n_iter + 1)
                 self.we_driver.avail_initial_states[initial_state.state_id] = initial_state
             else:
                 log.error('unknown future {!r} received from work manager'.format(future))
@@ -623,20 +627,24 @@ class WESimManager:
         self.data_manager.flush_backing()
 
     def save_bin_data(self):
-        '''Calculate and write flux and transition count matrices to HDF5. Population and rate matrices
-        are likely useless at the single-tau level and are no longer written.'''
+        '''Calculate and write flux and transition count matrices to HDF5, as sparse triplets in the
+        ``bin_transitions`` group of the iteration (see ``h5io.load_bin_transitions()``). Population and
+        rate matrices are likely useless at the single-tau level and are no longer written.'''
         # save_bin_data(self, populations, n_trans, fluxes, rates, n_iter=None)
 
         if self.save_transition_matrices:
             with self.data_manager.expiring_flushing_lock():
                 iter_group = self.data_manager.get_iter_group(self.n_iter)
-                for key in ['bin_ntrans', 'bin_fluxes']:
+                for key in ['bin_ntrans', 'bin_fluxes', 'bin_transitions']:
                     try:
                         del iter_group[key]
                     except KeyError:
                         pass
-                iter_group['bin_ntrans'] = self.we_driver.transition_matrix
-                iter_group['bin_fluxes'] = self.we_driver.flux_matrix
+                initial_bins, final_bins, fluxes, counts = self.we_driver.transition_triplets()
+                nbins = self.we_driver.bin_mapper.nbins
+                h5io.save_sparse_transitions(
+                    iter_group.create_group('bin_transitions'), initial_bins, final_bins, fluxes, counts, (nbins, nbins)
+                )
 
     def check_propagation(self):
         '''Check for failures in propagation or initial state generation, and raise an exception
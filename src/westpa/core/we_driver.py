@@ -4,9 +4,10 @@ import operator
 import random
 
 import numpy as np
+import scipy.sparse as sp
 
 import westpa
-from .segment import Segment
+from .segment import Segment, SegmentTable
 from .states import InitialState
 
 log = logging.getLogger(__name__)
@@ -21,6 +22,128 @@ def _group_walkers_identity(we_driver, ibin, **kwargs):
     return list_bins
 
 
+def _segmented_cumsum(values, ranks):
+    '''Return the cumulative sums of ``values`` within contiguous segments, where ``ranks`` gives
+    the position of each element within its segment. Sums never cross segment boundaries, so
+    the result is accurate even where segments differ greatly in magnitude.'''
+    result = np.array(values, dtype=np.float64)
+    shift = 1
+    while True:
+        (indices,) = np.nonzero(ranks >= shift)
+        if not len(indices):
+            return result
+        shifted = result.copy()
+        shifted[indices] += result[indices - shift]
+        result = shifted
+        shift *= 2
+
+
+class _ResamplingPlan:
+    '''A split/merge plan for walkers, represented by arrays with one entry per walker: the bin the
+    walker is in, its weight, the index of the input walker whose history it continues, and
+    an index identifying the set of input walkers from which its weight derives. Walkers
+    split or merged are only turned into ``Segment`` objects once resampling is complete
+    (see ``WEDriver._resample_bins``).'''
+
+    def __init__(self, bins, weights, n_bins):
+        n_inputs = len(weights)
+        self.n_bins = n_bins
+        self.n_inputs = n_inputs
+        self.bins = np.asarray(bins, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.history = np.arange(n_inputs, dtype=np.intp)
+        self.modified = np.zeros((n_inputs,), dtype=np.bool_)
+
+        # Weight sources; values less than n_inputs refer to a single input walker, and
+        # other values ``i`` to the set of input walkers ``merged_sources[i - n_inputs]``
+        self.sources = np.arange(n_inputs, dtype=np.intp)
+        self.merged_sources = []
+
+        # Input walkers whose histories were considered in a merge
+        self.merged_inputs = np.zeros((n_inputs,), dtype=np.bool_)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def _take(self, indices):
+        self.bins = self.bins[indices]
+        self.weights = self.weights[indices]
+        self.history = self.history[indices]
+        self.modified = self.modified[indices]
+        self.sources = self.sources[indices]
+
+    def counts(self):
+        '''Number of walkers in each bin.'''
+        return np.bincount(self.bins, minlength=self.n_bins)
+
+    def sort(self):
+        '''Sort walkers by bin and then by increasing weight. Returns the index of the first
+        walker in each bin, the number of walkers in each bin, and the position of
+        each walker within its bin.'''
+        self._take(np.lexsort((self.weights, self.bins)))
+        counts = self.counts()
+        starts = np.cumsum(counts) - counts
+        ranks = np.arange(len(self.bins)) - starts[self.bins]
+        return starts, counts, ranks
+
+    def input_sources(self, source):
+        '''Return the set of input walkers identified by ``source``.'''
+        if source < self.n_inputs:
+            return {source}
+        else:
+            return self.merged_sources[source - self.n_inputs]
+
+    def split(self, counts):
+        '''Split each walker into ``counts`` walkers of equal weight.'''
+        split = counts > 1
+        if not split.any():
+            return
+        self.weights = np.where(split, self.weights / counts, self.weights)
+        self.modified |= split
+        self._take(np.repeat(np.arange(len(self.weights)), counts))
+
+    def merge(self, members):
+        '''Merge walkers selected by the boolean array ``members`` into one walker per bin. Walkers
+        must be sorted (see ``sort()``). The history continued by each merged walker is chosen at
+        random from those of the walkers merged into it, with probability proportional to weight.'''
+        (indices,) = np.nonzero(members)
+        if not len(indices):
+            return
+        member_bins = self.bins[indices]
+        member_weights = self.weights[indices]
+        group_starts = np.concatenate(([0], np.flatnonzero(np.diff(member_bins)) + 1))
+        n_groups = len(group_starts)
+
+        # Choose the history to continue for each merged walker, drawing from ``random`` as
+        # WEDriver._merge_walkers does: a random number in [0, total weight) is located among
+        # the cumulative weights of the (sorted) members, so that a member is selected with
+        # probability proportional to its weight
+        chosen = np.empty((n_groups,), dtype=np.intp)
+        self.merged_inputs[self.history[indices]] = True
+        new_sources = np.arange(n_groups) + self.n_inputs + len(self.merged_sources)
+        for igroup, (group_weights, group_sources) in enumerate(
+            zip(np.split(member_weights, group_starts[1:]), np.split(self.sources[indices], group_starts[1:]))
+        ):
+            cumul_weight = np.add.accumulate(group_weights)
+            chosen[igroup] = group_starts[igroup] + np.digitize((random.uniform(0, cumul_weight[-1]),), cumul_weight)[0]
+
+            merged = set()
+            for source in group_sources:
+                merged |= self.input_sources(source)
+            self.merged_sources.append(merged)
+
+        new_bins = member_bins[group_starts]
+        new_weights = np.add.reduceat(member_weights, group_starts)
+        new_history = self.history[indices[chosen]]
+
+        keep = ~members
+        self.bins = np.concatenate((self.bins[keep], new_bins))
+        self.weights = np.concatenate((self.weights[keep], new_weights))
+        self.history = np.concatenate((self.history[keep], new_history))
+        self.modified = np.concatenate((self.modified[keep], np.ones((n_groups,), dtype=np.bool_)))
+        self.sources = np.concatenate((self.sources[keep], new_sources))
+
+
 class ConsistencyError(RuntimeError):
     pass
 
@@ -103,12 +226,20 @@ class WEDriver:
         # binning on final points (pre-WE)
         self.final_binning = None
 
+        # Segments assigned since the bins above were last filled, with their initial and final
+        # bin assignments (one index array per call to assign), and the number of them in target states
+        self._pending_segments = []
+        self._pending_initial_assignments = []
+        self._pending_final_assignments = []
+        self._pending_recycled = set()
+
         # binning on initial points for next iteration
         self.next_iter_binning = None
 
-        # Flux and rate matrices for the current iteration
-        self.flux_matrix = None
-        self.transition_matrix = None
+        # Flux and transition counts for the current iteration, as blocks of (flattened bin pair index,
+        # flux, count) arrays; see transition_triplets()
+        self._transition_blocks = None
+        self._transitions_coalesced = False
 
         # Information on new weights (e.g. from recycling) for the next iteration
         self.new_weights = None
@@ -151,9 +282,55 @@ class WEDriver:
         self.smallest_allowed_weight = config.get(['west', 'we', 'smallest_allowed_weight'], self.smallest_allowed_weight)
         log.info('Smallest allowed_weight: {}'.format(self.smallest_allowed_weight))
 
+    @property
+    def initial_binning(self):
+        '''Binning of this iteration's segments on their initial points'''
+        self._bin_pending_segments()
+        return self._initial_binning
+
+    @initial_binning.setter
+    def initial_binning(self, binning):
+        self._initial_binning = binning
+
+    @property
+    def final_binning(self):
+        '''Binning of this iteration's segments on their final points (before WE)'''
+        self._bin_pending_segments()
+        return self._final_binning
+
+    @final_binning.setter
+    def final_binning(self, binning):
+        self._final_binning = binning
+
+    def _bin_pending_segments(self):
+        '''Add the segments assigned since the last call to the initial and final bins, by grouping
+        the segments by bin index and updating each occupied bin at once.'''
+        if not self._pending_segments:
+            return
+
+        segments = self._pending_segments
+        for binning, assignments in (
+            (self._initial_binning, self._pending_initial_assignments),
+            (self._final_binning, self._pending_final_assignments),
+        ):
+            assignments = np.concatenate(assignments).astype(np.intp, copy=False)
+            by_bin = [segments[iseg] for iseg in np.argsort(assignments, kind='stable').tolist()]
+            counts = np.bincount(assignments, minlength=len(binning))
+            ends = np.cumsum(counts)
+            starts = (ends - counts).tolist()
+            ends = ends.tolist()
+            for ibin in np.flatnonzero(counts).tolist():
+                binning[ibin].update(by_bin[starts[ibin] : ends[ibin]])
+
+        self._pending_segments = []
+        self._pending_initial_assignments = []
+        self._pending_final_assignments = []
+        self._pending_recycled = set()
+
     @property
     def next_iter_segments(self):
-        '''Newly-created segments for the next iteration'''
+        '''Newly-created segments for the next iteration. The progress coordinate of each holds
+        only its initial point (shape ``(1, pcoord_ndim)``) until the segment is propagated.'''
         if self.next_iter_binning is None:
             raise RuntimeError('cannot access next iteration segments before running WE')
 
@@ -198,9 +375,10 @@ class WEDriver:
     @property
     def n_recycled_segs(self):
         '''Number of segments recycled this iteration'''
-        count = 0
-        for _segment in self.recycling_segments:
-            count += 1
+        count = len(self._pending_recycled)
+        if self._final_binning is not None:
+            for ibin in self.target_states:
+                count += len(self._final_binning[ibin])
         return count
 
     @property
@@ -231,15 +409,18 @@ class WEDriver:
     def clear(self):
         '''Explicitly delete all Segment-related state.'''
 
-        del self.initial_binning, self.final_binning, self.next_iter_binning
-        del self.flux_matrix, self.transition_matrix
+        del self._initial_binning, self._final_binning, self.next_iter_binning
+        del self._transition_blocks
         del self.new_weights, self.used_initial_states, self.avail_initial_states
 
         self.initial_binning = None
         self.final_binning = None
+        self._pending_segments = []
+        self._pending_initial_assignments = []
+        self._pending_final_assignments = []
+        self._pending_recycled = set()
         self.next_iter_binning = None
-        self.flux_matrix = None
-        self.transition_matrix = None
+        self._transition_blocks = None
         self.avail_initial_states = None
         self.used_initial_states = None
         self.new_weights = None
@@ -281,8 +462,7 @@ class WEDriver:
         self.final_binning = self.bin_mapper.construct_bins()
         self.next_iter_binning = None
 
-        flux_matrix = self.flux_matrix = np.zeros((nbins, nbins), dtype=np.float64)
-        transition_matrix = self.transition_matrix = np.zeros((nbins, nbins), np.uint)
+        self._transition_blocks = []
 
         # map target state specifications to bins
         target_states = target_states or []
@@ -305,9 +485,8 @@ class WEDriver:
             init_assignments = self.bin_mapper.assign(init_pcoords)
             prev_init_assignments = self.bin_mapper.assign(prev_init_pcoords)
 
-            for entry, i, j in zip(new_weights, prev_init_assignments, init_assignments):
-                flux_matrix[i, j] += entry.weight
-                transition_matrix[i, j] += 1
+            weights = np.fromiter((entry.weight for entry in new_weights), dtype=np.float64, count=len(new_weights))
+            self._add_transitions(prev_init_assignments, init_assignments, weights)
 
             del init_pcoords, prev_init_pcoords, init_assignments, prev_init_assignments
 
@@ -331,31 +510,30 @@ class WEDriver:
         '''Assign segments to initial and final bins, and update the (internal) lists of used and available
         initial states. If ``initializing`` is True, then the "final" bin assignments will
         be identical to the initial bin assignments, a condition required for seeding a new iteration from
-        pre-existing segments.'''
+        pre-existing segments. ``segments`` may be a sequence of ``Segment`` objects or a ``SegmentTable``,
+        in which case progress coordinates and weights are taken directly from the table's columns (which
+        must therefore be current; see ``SegmentTable.sync()``).'''
 
         # collect initial and final coordinates into one place
-        all_pcoords = np.empty((2, len(segments), self.system.pcoord_ndim), dtype=self.system.pcoord_dtype)
-
-        for iseg, segment in enumerate(segments):
-            all_pcoords[0, iseg] = segment.pcoord[0, :]
-            all_pcoords[1, iseg] = segment.pcoord[-1, :]
+        if isinstance(segments, SegmentTable):
+            initial_pcoords = segments.initial_pcoords
+            final_pcoords = segments.final_pcoords
+            weights = segments.weights
+        else:
+            segments = list(segments)
+            initial_pcoords = np.array([segment.pcoord[0] for segment in segments], dtype=self.system.pcoord_dtype)
+            final_pcoords = np.array([segment.pcoord[-1] for segment in segments], dtype=self.system.pcoord_dtype)
+            initial_pcoords.shape = final_pcoords.shape = (len(segments), self.system.pcoord_ndim)
+            weights = np.fromiter((segment.weight for segment in segments), dtype=np.float64, count=len(segments))
 
         # assign based on initial and final progress coordinates
-        initial_assignments = self.bin_mapper.assign(all_pcoords[0, :, :])
+        initial_assignments = self.bin_mapper.assign(initial_pcoords)
         if initializing:
             final_assignments = initial_assignments
         else:
-            final_assignments = self.bin_mapper.assign(all_pcoords[1, :, :])
-
-        initial_binning = self.initial_binning
-        final_binning = self.final_binning
-        flux_matrix = self.flux_matrix
-        transition_matrix = self.transition_matrix
-        for segment, iidx, fidx in zip(segments, initial_assignments, final_assignments):
-            initial_binning[iidx].add(segment)
-            final_binning[fidx].add(segment)
-            flux_matrix[iidx, fidx] += segment.weight
-            transition_matrix[iidx, fidx] += 1
+            final_assignments = self.bin_mapper.assign(final_pcoords)
+
+        self._add_assignments(segments, initial_assignments, final_assignments, weights)
 
         n_recycled_total = self.n_recycled_segs
         n_new_states = n_recycled_total - len(self.avail_initial_states)
@@ -371,6 +549,87 @@ class WEDriver:
         else:
             return 0
 
+    def _add_assignments(self, segments, initial_assignments, final_assignments, weights):
+        '''Record the bin assignments of ``segments`` on their initial and final points, and the
+        transitions between those bins.'''
+
+        # Bins are filled from these assignments only when next accessed, so that assigning
+        # many small blocks of segments (as they complete propagation) costs no per-segment work here
+        offset = len(self._pending_segments)
+        self._pending_segments.extend(segments)
+        self._pending_initial_assignments.append(initial_assignments)
+        self._pending_final_assignments.append(final_assignments)
+        if self.target_states:
+            # Recycled segments not yet counted, either as pending or in the bins already filled, so that
+            # segments assigned more than once are counted once
+            if self._final_binning is not None:
+                target_bins = [self._final_binning[ibin] for ibin in self.target_states]
+            else:
+                target_bins = []
+            for iseg in np.flatnonzero(np.isin(final_assignments, list(self.target_states))).tolist():
+                segment = self._pending_segments[offset + iseg]
+                if not any(segment in target_bin for target_bin in target_bins):
+                    self._pending_recycled.add(segment)
+        self._add_transitions(initial_assignments, final_assignments, weights)
+
+    def _add_transitions(self, initial_assignments, final_assignments, weights):
+        '''Add transitions from bins ``initial_assignments`` to bins ``final_assignments`` carrying
+        ``weights`` to the flux and transition counts for this iteration.'''
+        keys = np.asarray(initial_assignments, dtype=np.int64) * self.bin_mapper.nbins
+        keys += np.asarray(final_assignments, dtype=np.int64)
+        self._transition_blocks.append((keys, np.asarray(weights, dtype=np.float64), np.ones(keys.shape, dtype=np.uint64)))
+        self._transitions_coalesced = False
+
+    def transition_triplets(self):
+        '''Return the flux and transition counts between bins for this iteration in sparse (coordinate)
+        form, as a tuple of arrays ``(initial_bins, final_bins, fluxes, counts)`` with one entry for each
+        pair of bins between which at least one transition occurred, sorted by initial and then final bin.'''
+        blocks = self._transition_blocks
+        if not blocks:
+            blocks.append((np.empty((0,), dtype=np.int64), np.empty((0,), dtype=np.float64), np.empty((0,), dtype=np.uint64)))
+        elif len(blocks) > 1 or not self._transitions_coalesced:
+            keys, inverse = np.unique(np.concatenate([block[0] for block in blocks]), return_inverse=True)
+            fluxes = np.bincount(inverse, np.concatenate([block[1] for block in blocks]), minlength=keys.size)
+            counts = np.bincount(inverse, np.concatenate([block[2] for block in blocks]), minlength=keys.size)
+            blocks[:] = [(keys, fluxes, counts.astype(np.uint64))]
+        self._transitions_coalesced = True
+        keys, fluxes, counts = blocks[0]
+        initial_bins, final_bins = np.divmod(keys, self.bin_mapper.nbins)
+        return initial_bins, final_bins, fluxes, counts
+
+    @property
+    def sparse_flux_matrix(self):
+        '''Flux (total weight) between bins for this iteration, as a ``scipy.sparse.csr_matrix`` of
+        shape ``(nbins, nbins)``, indexed by initial and final bin.'''
+        initial_bins, final_bins, fluxes, _counts = self.transition_triplets()
+        nbins = self.bin_mapper.nbins
+        return sp.csr_matrix((fluxes, (initial_bins, final_bins)), shape=(nbins, nbins))
+
+    @property
+    def sparse_transition_matrix(self):
+        '''Number of transitions between bins for this iteration, as a ``scipy.sparse.csr_matrix`` of
+        shape ``(nbins, nbins)``, indexed by initial and final bin.'''
+        initial_bins, final_bins, _fluxes, counts = self.transition_triplets()
+        nbins = self.bin_mapper.nbins
+        return sp.csr_matrix((counts, (initial_bins, final_bins)), shape=(nbins, nbins))
+
+    @property
+    def flux_matrix(self):
+        '''Flux between bins for this iteration, as a dense array of shape ``(nbins, nbins)``. For large
+        numbers of bins, use ``sparse_flux_matrix`` or ``transition_triplets()`` instead.'''
+        if self._transition_blocks is None:
+            return None
+        return self.sparse_flux_matrix.toarray()
+
+    @property
+    def transition_matrix(self):
+        '''Number of transitions between bins for this iteration, as a dense array of shape
+        ``(nbins, nbins)``. For large numbers of bins, use ``sparse_transition_matrix`` or
+        ``transition_triplets()`` instead.'''
+        if self._transition_blocks is None:
+            return None
+        return self.sparse_transition_matrix.toarray().astype(np.uint)
+
     def _recycle_walkers(self):
         '''Recycle walkers'''
 
@@ -448,10 +707,9 @@ class WEDriver:
                 weight=segment.weight / m,
                 parent_id=segment.parent_id,
                 wtg_parent_ids=set(segment.wtg_parent_ids),
-                pcoord=segment.pcoord.copy(),
+                pcoord=segment.pcoord[:1].copy(),
                 status=Segment.SEG_STATUS_PREPARED,
             )
-            new_segment.pcoord[0, :] = segment.pcoord[0, :]
             new_segments.append(new_segment)
 
         if log.isEnabledFor(logging.DEBUG):
@@ -470,7 +728,7 @@ class WEDriver:
             n_iter=segments[0].n_iter,  # assumed correct (and equal among all segments)
             weight=cumul_weight[len(segments) - 1],
             status=Segment.SEG_STATUS_PREPARED,
-            pcoord=self.system.new_pcoord_array(),
+            pcoord=self.system.new_pcoord_array(1),
         )
 
         # Select the history to use
@@ -653,6 +911,22 @@ class WEDriver:
         # sanity check
         self._check_pre()
 
+        if self.subgroup_function is _group_walkers_identity:
+            self._resample_bins()
+        else:
+            self._resample_subgroups()
+
+        self._check_post()
+
+        self.new_weights = self.new_weights or []
+
+        log.debug('used initial states: {!r}'.format(self.used_initial_states))
+        log.debug('available initial states: {!r}'.format(self.avail_initial_states))
+
+    def _resample_subgroups(self):
+        '''Split and merge walkers bin by bin, within the subgroups of each bin given by
+        ``self.subgroup_function``.'''
+
         # Regardless of current particle count, always split overweight particles and merge underweight particles
         # Then and only then adjust for correct particle count
         total_number_of_subgroups = 0
@@ -710,12 +984,153 @@ class WEDriver:
             total_number_of_particles += len(bin)
         log.debug('Total number of subgroups: {!r}'.format(total_number_of_subgroups))
 
-        self._check_post()
+    def _resample_bins(self):
+        '''Split and merge walkers in all bins at once, using array operations on walker weights
+        (see ``_ResamplingPlan``). This implements the same algorithm as the per-bin loop in
+        ``_run_we()`` for the default (identity) subgrouping of walkers, and new ``Segment`` objects
+        are created only for walkers which are split or merged.'''
 
-        self.new_weights = self.new_weights or []
+        segments = []
+        segment_bins = []
+        for ibin, _bin in enumerate(self.next_iter_binning):
+            segments.extend(_bin)
+            segment_bins.extend([ibin] * len(_bin))
+        if not segments:
+            return
 
-        log.debug('used initial states: {!r}'.format(self.used_initial_states))
-        log.debug('available initial states: {!r}'.format(self.avail_initial_states))
+        n_bins = len(self.next_iter_binning)
+        target_counts = np.asarray(self.bin_target_counts)
+        plan = _ResamplingPlan(
+            segment_bins, np.fromiter((segment.weight for segment in segments), dtype=np.float64, count=len(segments)), n_bins
+        )
+        counts = plan.counts()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ideal_weights = np.bincount(plan.bins, weights=plan.weights, minlength=n_bins) / target_counts
+
+        # Bins with a target count of one have all their walkers merged; other bins are split
+        # and merged by weight, and then adjusted to their target counts
+        merge_all = (counts > 1) & (target_counts == 1)
+        by_weight = (counts > 0) & (target_counts > 1)
+
+        plan.sort()
+        plan.merge(merge_all[plan.bins])
+
+        # Split overweight walkers
+        overweight = by_weight[plan.bins]
+        overweight[overweight] = plan.weights[overweight] > self.weight_split_threshold * ideal_weights[plan.bins[overweight]]
+        split_counts = np.ones((len(plan),), dtype=np.intp)
+        split_counts[overweight] = np.ceil(plan.weights[overweight] / ideal_weights[plan.bins[overweight]])
+        plan.split(split_counts)
+
+        # Merge underweight walkers
+        while True:
+            _starts, _counts, ranks = plan.sort()
+            cumul_weights = _segmented_cumsum(plan.weights, ranks)
+            underweight = by_weight[plan.bins] & (cumul_weights <= ideal_weights[plan.bins] * self.weight_merge_cutoff)
+            n_underweight = np.bincount(plan.bins[underweight], minlength=n_bins)
+            to_merge = underweight & (n_underweight[plan.bins] >= 2)
+            if not to_merge.any():
+                break
+            plan.merge(to_merge)
+
+        if self.do_adjust_counts:
+            # Split the highest-weight walker in two until each bin reaches its target count
+            while True:
+                starts, counts, _ranks = plan.sort()
+                (short_bins,) = np.nonzero(by_weight & (counts < target_counts))
+                if not len(short_bins):
+                    break
+                split_counts = np.ones((len(plan),), dtype=np.intp)
+                split_counts[starts[short_bins] + counts[short_bins] - 1] = 2
+                plan.split(split_counts)
+
+            # Merge the two lowest-weight walkers until each bin reaches its target count
+            while True:
+                starts, counts, ranks = plan.sort()
+                excess = by_weight & (counts > target_counts)
+                if not excess.any():
+                    break
+                plan.merge(excess[plan.bins] & (ranks < 2))
+
+        if self.do_thresholds:
+            overweight = plan.weights > self.largest_allowed_weight
+            split_counts = np.ones((len(plan),), dtype=np.intp)
+            split_counts[overweight] = np.ceil(plan.weights[overweight] / self.largest_allowed_weight)
+            plan.split(split_counts)
+
+            plan.sort()
+            underweight = plan.weights < self.smallest_allowed_weight
+            n_underweight = np.bincount(plan.bins[underweight], minlength=n_bins)
+            plan.merge(underweight & (n_underweight[plan.bins] >= 2))
+
+        self._apply_resampling_plan(plan, segments)
+
+    def _apply_resampling_plan(self, plan, segments):
+        '''Replace the walkers in ``self.next_iter_binning`` (``segments``, the input walkers to
+        ``plan``) with the walkers described by ``plan``, and update the endpoint types of parent
+        segments and the initial states used accordingly.'''
+        new_pcoord_array = self.system.new_pcoord_array
+        for _bin in self.next_iter_binning:
+            _bin.clear()
+
+        n_split = n_merged = 0
+        for ibin, weight, ihistory, modified, source in zip(
+            plan.bins.tolist(), plan.weights.tolist(), plan.history.tolist(), plan.modified.tolist(), plan.sources.tolist()
+        ):
+            history_segment = segments[ihistory]
+            if not modified:
+                self.next_iter_binning[ibin].add(history_segment)
+                continue
+
+            wtg_parent_ids = set()
+            for iinput in plan.input_sources(source):
+                wtg_parent_ids |= set(segments[iinput].wtg_parent_ids)
+            new_segment = Segment(
+                n_iter=history_segment.n_iter,
+                weight=weight,
+                parent_id=history_segment.parent_id,
+                wtg_parent_ids=wtg_parent_ids,
+                pcoord=new_pcoord_array(1),
+                status=Segment.SEG_STATUS_PREPARED,
+            )
+            new_segment.pcoord[0, :] = history_segment.pcoord[0, :]
+            self.next_iter_binning[ibin].add(new_segment)
+            if source < plan.n_inputs:
+                n_split += 1
+            else:
+                n_merged += 1
+        log.debug('created {:d} walkers by splitting and {:d} by merging'.format(n_split, n_merged))
+
+        # The parents of walkers whose history is continued continue; those of walkers which
+        # were merged out of existence are marked as merged, and initial states used only
+        # by walkers merged out of existence are made available again
+        continued = np.zeros((plan.n_inputs,), dtype=np.bool_)
+        continued[plan.history] = True
+        continued_parent_ids = {segments[iinput].parent_id for iinput in np.flatnonzero(continued)}
+        for iinput in np.flatnonzero(plan.merged_inputs & continued):
+            parent_id = segments[iinput].parent_id
+            if parent_id >= 0:
+                self._parent_map[parent_id].endpoint_type = Segment.SEG_ENDPOINT_CONTINUES
+        for iinput in np.flatnonzero(~continued):
+            segment = segments[iinput]
+            if segment.parent_id in continued_parent_ids:
+                continue
+            elif segment.parent_id >= 0:
+                self._parent_map[segment.parent_id].endpoint_type = Segment.SEG_ENDPOINT_MERGED
+            else:
+                continued_parent_ids.add(segment.parent_id)
+                initial_state = self.used_initial_states.pop(segment.initial_state_id)
+                log.debug('freeing initial state {!r} for future use (merged)'.format(initial_state))
+                self.avail_initial_states[initial_state.state_id] = initial_state
+                initial_state.iter_used = None
+
+        if self.do_thresholds:
+            for ibin in np.unique(plan.bins):
+                for iseg in self.next_iter_binning[ibin]:
+                    if iseg.weight > self.largest_allowed_weight or iseg.weight < self.smallest_allowed_weight:
+                        log.warning(
+                            f'Unable to fulfill threshold conditions for {iseg}. The given threshold range is likely too small.'
+                        )
 
     def populate_initial(self, initial_states, weights, system=None):
         '''Create walkers for a new weighted ensemble simulation.
@@ -821,7 +1236,7 @@ class WEDriver:
                     parent_id=segment.parent_id,
                     weight=segment.weight,
                     wtg_parent_ids=set(segment.wtg_parent_ids or []),
-                    pcoord=new_pcoord_array(),
+                    pcoord=new_pcoord_array(1),
                     status=Segment.SEG_STATUS_PREPARED,
                 )
                 new_segment.pcoord[0] = segment.pcoord[0]
@@ -845,7 +1260,8 @@ class WEDriver:
 
         # Create new segments for the next iteration
         # We assume that everything is going to continue without being touched by recycling or WE, and
-        # adjust later
+        # adjust later. New segments carry only their initial point as a progress coordinate, which is
+        # expanded to a full pcoord_len array when they are propagated
         new_pcoord_array = self.system.new_pcoord_array
         n_iter = None
 
@@ -862,7 +1278,7 @@ class WEDriver:
                     parent_id=segment.seg_id,
                     weight=segment.weight,
                     wtg_parent_ids=[segment.seg_id],
-                    pcoord=new_pcoord_array(),
+                    pcoord=new_pcoord_array(1),
                     status=Segment.SEG_STATUS_PREPARED,
                 )
                 new_segment.pcoord[0] = segment.pcoord[-1]
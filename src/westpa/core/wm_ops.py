@@ -33,8 +33,20 @@ def post_iter(n_iter, segments):
     propagator.finalize_iteration(n_iter, segments)
 
 
+def expand_pcoords(segments):
+    '''Expand the compact progress coordinates of prepared segments (holding only their initial
+    point) into full ``pcoord_len`` arrays for propagation.'''
+    system = westpa.rc.get_system_driver()
+    for segment in segments:
+        if segment.pcoord is not None and len(segment.pcoord) < system.pcoord_len:
+            pcoord = system.new_pcoord_array()
+            pcoord[0] = segment.pcoord[0]
+            segment.pcoord = pcoord
+
+
 def propagate(basis_states, initial_states, segments):
     propagator = westpa.rc.get_propagator()
+    expand_pcoords(segments)
     propagator.update_basis_initial_states(basis_states, initial_states)
     outgoing_ids = [segment.seg_id for segment in segments]
     incoming_segments = {segment.seg_id: segment for segment in propagator.propagate(segments)}
@@ -3,7 +3,7 @@ from .core import WESTTool, WESTParallelTool, WESTToolComponent, WESTSubcommand,
 from .data_reader import WESTDataReader, WESTDSSynthesizer, WESTWDSSynthesizer
 from .iter_range import IterRangeSelection
 from .selected_segs import SegSelector
-from .binning import BinMappingComponent, mapper_from_dict
+from .binning import AssignmentCache, BinMappingComponent, mapper_from_dict
 from .progress import ProgressIndicatorComponent
 from .plot import Plotter
 from .wipi import WIPIDataset, KineticsIteration, __get_data_for_iteration__, WIPIScheme
@@ -21,6 +21,7 @@ __all__ = [
     'WESTWDSSynthesizer',
     'IterRangeSelection',
     'SegSelector',
+    'AssignmentCache',
     'BinMappingComponent',
     'mapper_from_dict',
     'ProgressIndicatorComponent',
@@ -1,7 +1,8 @@
+import hashlib
 from itertools import count
 import logging
 import math
-import pickle
+import os
 from pickle import PickleError
 import sys
 
@@ -9,9 +10,11 @@ import numpy as np
 
 import westpa
 import westpa.core.binning
-from westpa.core.binning import RectilinearBinMapper
+from westpa.core.binning import RectilinearBinMapper, index_dtype
+from westpa.core.binning.assign import is_pointwise
 from westpa.core.data_manager import weight_dtype
 from westpa.core.extloader import get_object
+from westpa.core.h5io import WESTPAH5File, bin_mapper_cache
 
 from .core import WESTToolComponent
 
@@ -60,31 +63,10 @@ def mapper_from_function(funcspec):
 
 def mapper_from_hdf5(topol_group, hashval):
     '''Retrieve the mapper identified by ``hashval`` from the given bin topology group
-    ``topol_group``. Returns ``(mapper, pickle, hashval)``'''
-    try:
-        index_ds = topol_group['index']
-        pickle_ds = topol_group['pickles']
-    except KeyError:
-        log.debug('binhash {} not found'.format(hashval), exc_info=True)
-        raise KeyError('binhash {} not found'.format(hashval))
-
-    n_entries = len(index_ds)
-    if n_entries == 0:
-        raise KeyError('hash {} not found'.format(hashval))
-
-    chunksize = 256
-    for istart in range(0, n_entries, chunksize):
-        chunk = index_ds[istart : min(istart + chunksize, n_entries)]
-        for i in range(len(chunk)):
-            if chunk[i]['hash'] == bytes(hashval, 'utf-8'):
-                pkldat = bytes(pickle_ds[istart + i, 0 : chunk[i]['pickle_len']].data)
-                # mapper = pickle.loads(pkldat, encoding='latin1')
-                mapper = pickle.loads(pkldat)
-                log.debug('loaded {!r} from {!r}'.format(mapper, topol_group))
-                log.debug('hash value {!r}'.format(hashval))
-                return mapper, pkldat, hashval
-
-    raise KeyError('hash {} not found'.format(hashval))
+    ``topol_group``. Returns ``(mapper, pickle, hashval)``. Mappers are cached by hash
+    (see ``westpa.core.h5io.bin_mapper_cache``), so the mapper returned must not be modified.'''
+    mapper, pkldat = bin_mapper_cache.get(topol_group, hashval, chunksize=256)
+    return mapper, pkldat, hashval
 
 
 def mapper_from_yaml(yamlfilename):
@@ -232,6 +214,128 @@ def write_bin_labels(mapper, dest, header='# bin labels:\n', fmt='# bin {index:{
         dest.write(fmt.format(index=ibin, label=label, max_iwidth=max_iwidth))
 
 
+def assign_segment_coords(mapper, coords):
+    '''Assign each point of the per-segment coordinates ``coords`` (of shape ``(nsegs, npts, ndim)``,
+    or ``(nsegs, npts)`` for one-dimensional coordinates) to bins with ``mapper``, returning an array of
+    shape ``(nsegs, npts)``. Mappers known to assign each point independently of the others are called
+    once for all points; others (e.g. MABBinMapper, which places bins according to the points it is
+    given) are called once per segment.'''
+    coords = np.asarray(coords)
+    nsegs, npts = coords.shape[:2]
+    assignments = np.empty((nsegs, npts), index_dtype)
+    if not nsegs * npts:
+        return assignments
+    if is_pointwise(mapper):
+        mapper.assign(coords.reshape(nsegs * npts, -1), output=assignments.reshape(nsegs * npts))
+    else:
+        for iseg in range(nsegs):
+            mapper.assign(coords[iseg].reshape(npts, -1), output=assignments[iseg])
+    return assignments
+
+
+class AssignmentCache:
+    '''A persistent cache of bin assignments, stored in a sidecar HDF5 file. The assignments of
+    each iteration are stored under the hash of the bin mapper, and are reused only if the
+    checksum (or other fingerprint) of the coordinates to assign matches that of the coordinates
+    assigned previously,
+    so that analyses repeated with the same binning only assign iterations that are new or
+    have changed. The file is opened on first use.'''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._h5file = None
+
+    @staticmethod
+    def default_filename(we_h5filename):
+        '''Return the name of the assignment cache to use for the WEST HDF5 file ``we_h5filename``.'''
+        return os.path.splitext(we_h5filename)[0] + '_assignments.h5'
+
+    @staticmethod
+    def checksum(coords):
+        '''Return a checksum of the shape, type, and contents of the array ``coords``.'''
+        coords = np.ascontiguousarray(coords)
+        hash = hashlib.sha256('{}{}'.format(coords.dtype.str, coords.shape).encode('utf-8'))
+        hash.update(coords.reshape(-1).view(np.uint8))
+        return hash.hexdigest()
+
+    @staticmethod
+    def combine_checksums(checksums):
+        '''Return a checksum of the coordinates whose consecutive pieces have the checksums ``checksums``.'''
+        return hashlib.sha256(''.join(checksums).encode('utf-8')).hexdigest()
+
+    def open(self):
+        '''Open the cache file, creating it if necessary, and return it. Raises OSError if the file cannot be
+        opened for writing (e.g. if its directory is read-only, or it is locked by another process).'''
+        if self._h5file is None:
+            self._h5file = WESTPAH5File(self.filename, 'a')
+        return self._h5file
+
+    @property
+    def h5file(self):
+        return self.open()
+
+    def close(self):
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _dsname(self, mapper_hash, n_iter):
+        return '{}/iter_{:08d}'.format(mapper_hash, n_iter)
+
+    def get(self, mapper_hash, n_iter, checksum):
+        '''Return the assignments stored for iteration ``n_iter`` under the mapper hash ``mapper_hash``,
+        or None if there are none, or if they were made for coordinates with a different checksum.'''
+        ds = self.h5file.get(self._dsname(mapper_hash, n_iter))
+        if ds is None or ds.attrs['checksum'] != checksum:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ds[...]
+
+    def peek(self, mapper_hash, n_iter):
+        '''Return the assignments stored for iteration ``n_iter`` under the mapper hash ``mapper_hash`` and the
+        checksum of the coordinates they were made for, or ``(None, None)`` if there are none. Unlike :meth:`get`,
+        this counts neither a hit nor a miss, as the caller is to validate the assignments.'''
+        ds = self.h5file.get(self._dsname(mapper_hash, n_iter))
+        if ds is None:
+            return None, None
+        return ds[...], ds.attrs['checksum']
+
+    def put(self, mapper_hash, n_iter, checksum, assignments):
+        '''Store the assignments of iteration ``n_iter``, made by the mapper with hash ``mapper_hash``
+        for coordinates with checksum ``checksum``.'''
+        dsname = self._dsname(mapper_hash, n_iter)
+        if dsname in self.h5file:
+            del self.h5file[dsname]
+        ds = self.h5file.create_dataset(dsname, data=assignments, compression=4, shuffle=True)
+        ds.attrs['checksum'] = checksum
+
+    def assign(self, mapper, n_iter, coords, mapper_hash=None):
+        '''Return the assignments of the per-segment coordinates ``coords`` of iteration ``n_iter`` (see
+        :func:`assign_segment_coords`), reading them from the cache if available and storing them otherwise.
+        ``mapper_hash`` is calculated from ``mapper`` if not given.'''
+        if mapper_hash is None:
+            try:
+                _pkldat, mapper_hash = mapper.pickle_and_hash()
+            except (PickleError, AttributeError, TypeError) as e:
+                log.warning('bin mapper cannot be pickled ({}); not caching bin assignments'.format(e))
+                return assign_segment_coords(mapper, coords)
+        checksum = self.checksum(coords)
+        assignments = self.get(mapper_hash, n_iter, checksum)
+        if assignments is None:
+            assignments = assign_segment_coords(mapper, coords)
+            self.put(mapper_hash, n_iter, checksum, assignments)
+        return assignments
+
+
 class BinMappingComponent(WESTToolComponent):
     '''Component for obtaining a bin mapper from one of several places based on
     command-line arguments. Such locations include an HDF5 file that contains
@@ -3,6 +3,8 @@ import collections
 import numpy as np
 
 import westpa
+from westpa.core.ancestry import child_index
+from westpa.core.h5io import WESTPAH5File
 from westpa.tools.selected_segs import AllSegmentSelection
 from . import _trajtree
 from ._trajtree import _trajtree_base  # @UnresolvedImport
@@ -20,12 +22,33 @@ class TrajTreeSet(_trajtree_base):
     def __len__(self):
         return len(self.trajtable)
 
+    def save(self, filename):
+        '''Store the built tree in the HDF5 file ``filename``, to be read again with :meth:`load`.'''
+        with WESTPAH5File(filename, 'w') as h5file:
+            h5file['trajtable'] = self.trajtable
+            h5file['child_offsets'] = self.child_offsets
+            h5file['child_indices'] = self.child_indices
+            h5file['iter_offsets'] = np.array(sorted(self.iter_offsets.items()), dtype=np.int64).reshape(-1, 2)
+
+    @classmethod
+    def load(cls, filename, data_manager=None):
+        '''Read a tree stored with :meth:`save` from the HDF5 file ``filename``, without building it again.'''
+        tree = cls.__new__(cls)
+        tree.data_manager = data_manager
+        tree.segsel = None
+        with WESTPAH5File(filename, 'r') as h5file:
+            tree.trajtable = h5file['trajtable'][...]
+            tree.child_offsets = h5file['child_offsets'][...]
+            tree.child_indices = h5file['child_indices'][...]
+            tree.iter_offsets = {int(n_iter): int(offset) for (n_iter, offset) in h5file['iter_offsets'][...]}
+        return tree
+
     def get_roots(self):
         return self.trajtable[self.trajtable['parent_offset'] == -1]
         # return [trajnode(root['n_iter'], root['seg_id']) for root in self._get_roots()]
 
     def get_root_indices(self):
-        return np.squeeze(np.argwhere(self.trajtable['parent_offset'] == -1))
+        return np.flatnonzero(self.trajtable['parent_offset'] == -1)
 
     def trace_trajectories(self, visit, get_visitor_state=None, set_visitor_state=None, vargs=None, vkwargs=None):
         if (get_visitor_state or set_visitor_state) and not (get_visitor_state and set_visitor_state):
@@ -36,30 +59,33 @@ class TrajTreeSet(_trajtree_base):
         n_visits = 0
 
         trajtable = self.trajtable
+        child_offsets = self.child_offsets
+        child_indices = self.child_indices
 
-        roots = collections.deque(self.get_root_indices())
+        roots = self.get_root_indices()
         print('Examining {:d} roots'.format(len(roots)))
-        state_stack = collections.deque([{'subtrees': roots, 'vstate': get_visitor_state() if get_visitor_state else None}])
-        while state_stack:
-            state = state_stack.pop()
-            subtrees = state['subtrees']
-            if set_visitor_state:
-                set_visitor_state(state['vstate'])
 
-            while subtrees:
-                index = subtrees.popleft()
-                node = trajtable[index]
+        # Depth-first, pre-order traversal; each node is visited with the visitor state
+        # as it was after visiting its parent
+        vstate = get_visitor_state() if get_visitor_state else None
+        stack = [(index, vstate) for index in reversed(roots)]
+        while stack:
+            index, vstate = stack.pop()
+            if set_visitor_state:
+                set_visitor_state(vstate)
 
-                state_stack.append({'subtrees': subtrees, 'vstate': get_visitor_state() if get_visitor_state else None})
+            node = trajtable[index]
+            children = child_indices[child_offsets[index] : child_offsets[index + 1]]
 
-                subtrees = collections.deque(self.get_child_indices(index))
+            n_visits += 1
+            try:
+                visit(node['n_iter'], node['seg_id'], node['weight'], has_children=(len(children) > 0), *vargs, **vkwargs)
+            except StopIteration:
+                continue  # to next sibling
 
-                n_visits += 1
-                try:
-                    visit(node['n_iter'], node['seg_id'], node['weight'], has_children=(len(subtrees) > 0), *vargs, **vkwargs)
-                except StopIteration:
-                    subtrees = collections.deque()
-                    continue  # to next sibling
+            if len(children):
+                vstate = get_visitor_state() if get_visitor_state else None
+                stack.extend((child, vstate) for child in reversed(children))
 
         return n_visits
 
@@ -93,25 +119,5 @@ class FakeTrajTreeSet(TrajTreeSet):
             dtype=_trajtree._tt_dtype,
         )
 
-        empty_array = np.array([])
-        self.childtable = np.array(
-            [
-                np.array([2, 3, 4]),  # segment 1
-                np.array([5, 6]),  # segment 11
-                np.array([7]),  # segment 2
-                np.array([8]),  # segment 3
-                np.array([9, 10]),  # segment 4
-                np.array([11, 12]),  # segment 12
-                empty_array,  # segment 13
-                np.array([13, 14]),  # segment 5
-                empty_array,  # segment 6
-                empty_array,  # segment 7
-                empty_array,  # segment 8
-                empty_array,  # segment 14
-                empty_array,  # segment 15
-                empty_array,  # segment 9
-                empty_array,  # segment 10
-            ],
-            dtype=np.object_,
-        )
+        self.child_offsets, self.child_indices = child_index(self.trajtable['parent_offset'], len(self.trajtable))
         self.iter_offsets = {1: 0, 2: 2, 3: 7, 4: 13}
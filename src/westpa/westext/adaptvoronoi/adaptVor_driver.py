@@ -124,7 +124,8 @@ class AdaptiveVoronoiDriver:
                 binhash = iter_group.attrs['binhash']
                 bin_mapper = self.data_manager.get_bin_mapper(binhash)
 
-                centers = bin_mapper.centers
+                # The mapper is shared through the bin mapper cache
+                centers = np.copy(bin_mapper.centers)
 
             except Exception:
                 log.warning(
@@ -150,7 +150,8 @@ class StringDriver:
                     binhash = iter_group.attrs['binhash'].encode()
                     bin_mapper = self.data_manager.get_bin_mapper(binhash)
 
-                    centers = bin_mapper.centers
+                    # The mapper is shared through the bin mapper cache
+                    centers = np.copy(bin_mapper.centers)
 
                 except Exception:
                     log.warning('Initializing string centers from data failed; Using definition in system instead.')
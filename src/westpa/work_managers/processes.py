@@ -1,11 +1,14 @@
 import logging
 import multiprocessing
 import os
+import pickle
 import random
 import signal
 import sys
 import threading
 import traceback
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
 
 import westpa.work_managers as work_managers
 from .core import WorkManager, WMFuture
@@ -20,6 +23,70 @@ task_shutdown_sentinel = ('shutdown', None, None, (), {})
 result_shutdown_sentinel = ('shutdown', None, None)
 
 
+class SharedMemoryResult:
+    '''A task result whose large buffers (e.g. the data of NumPy arrays, which pickle protocol 5
+    serializes out-of-band) are placed in a shared memory block, so that only the rest of the
+    pickled result and a description of the block pass through the result queue. The block is
+    created by the worker and released by the master as soon as the result is loaded.'''
+
+    __slots__ = ('pickled', 'shm_name', 'extents')
+
+    def __init__(self, pickled, shm_name, extents):
+        self.pickled = pickled
+        self.shm_name = shm_name
+        self.extents = extents
+
+    @classmethod
+    def from_result(cls, result, threshold=0):
+        '''Serialize ``result``, placing its out-of-band buffers in a new shared memory block.
+        Returns None if the buffers hold fewer than ``threshold`` bytes in total, in which case
+        the result is better sent as is.'''
+        buffers = []
+        pickled = pickle.dumps(result, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [buffer.raw() for buffer in buffers]
+        total_size = sum(raw_buffer.nbytes for raw_buffer in raw_buffers)
+        if not raw_buffers or total_size == 0 or total_size < threshold:
+            return None
+
+        shm = SharedMemory(create=True, size=total_size)
+        try:
+            extents = []
+            offset = 0
+            for raw_buffer in raw_buffers:
+                nbytes = raw_buffer.nbytes
+                shm.buf[offset : offset + nbytes] = raw_buffer
+                extents.append((offset, nbytes))
+                offset += nbytes
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        return cls(pickled, shm.name, extents)
+
+    def load(self):
+        '''Reconstruct the result, copying its buffers out of shared memory and releasing the block.'''
+        shm = SharedMemory(name=self.shm_name)
+        try:
+            buffers = []
+            for offset, nbytes in self.extents:
+                with shm.buf[offset : offset + nbytes] as view:
+                    buffers.append(bytearray(view))
+        finally:
+            shm.close()
+            shm.unlink()
+        return pickle.loads(self.pickled, buffers=buffers)
+
+    def release(self):
+        '''Release the shared memory block without loading the result.'''
+        try:
+            shm = SharedMemory(name=self.shm_name)
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
 class ProcessWorkManager(WorkManager):
     '''A work manager using the ``multiprocessing`` module.
 
@@ -42,9 +109,27 @@ class ProcessWorkManager(WorkManager):
     def from_environ(cls, wmenv=None):
         if wmenv is None:
             wmenv = work_managers.environment.default_env
-        return cls(wmenv.get_val('n_workers', multiprocessing.cpu_count(), int))
+        shm_threshold = wmenv.get_val('shm_threshold')
+        return cls(
+            wmenv.get_val('n_workers', multiprocessing.cpu_count(), int),
+            shm_threshold=int(shm_threshold) if shm_threshold is not None else None,
+        )
 
-    def __init__(self, n_workers=None, shutdown_timeout=1):
+    @classmethod
+    def add_wm_args(cls, parser, wmenv=None):
+        if wmenv is None:
+            wmenv = work_managers.environment.default_env
+
+        wm_group = parser.add_argument_group('options for multiprocessing ("processes") work manager')
+        wm_group.add_argument(
+            wmenv.arg_flag('shm_threshold'),
+            metavar='NBYTES',
+            type=int,
+            help='Return task results holding at least NBYTES of array data from workers through shared '
+            + 'memory rather than through a pipe. (Default: results are always returned through a pipe.)',
+        )
+
+    def __init__(self, n_workers=None, shutdown_timeout=1, shm_threshold=None):
         super().__init__()
 
         try:
@@ -64,6 +149,10 @@ class ProcessWorkManager(WorkManager):
         self.shutdown_received = False
         self.shutdown_timeout = shutdown_timeout or 1
 
+        # Results with at least this many bytes of out-of-band data are returned through
+        # shared memory (see SharedMemoryResult); None disables shared memory transport
+        self.shm_threshold = shm_threshold
+
     def task_loop(self):
         # Close standard input, so we don't get SIGINT from ^C
         try:
@@ -85,6 +174,11 @@ class ProcessWorkManager(WorkManager):
             except BaseException as e:
                 result_tuple = ('exception', task_id, (e, traceback.format_exc()))
             else:
+                if self.shm_threshold is not None:
+                    try:
+                        result = SharedMemoryResult.from_result(result, self.shm_threshold) or result
+                    except Exception as e:
+                        log.warning('could not place result of task {!r} in shared memory: {}'.format(task_id, e))
                 result_tuple = ('result', task_id, result)
             self.result_queue.put(result_tuple)
 
@@ -102,6 +196,12 @@ class ProcessWorkManager(WorkManager):
                 future._set_exception(*payload)
             elif message == 'result':
                 future = self.pending.pop(task_id)
+                if isinstance(payload, SharedMemoryResult):
+                    try:
+                        payload = payload.load()
+                    except Exception as e:
+                        future._set_exception(e, traceback.format_exc())
+                        continue
                 future._set_result(payload)
             else:
                 raise AssertionError('unknown message {!r}'.format((message, task_id, payload)))
@@ -121,6 +221,12 @@ class ProcessWorkManager(WorkManager):
         if not self.running:
             log.debug('starting up work manager {!r}'.format(self))
             self.running = True
+
+            if self.shm_threshold is not None:
+                # Workers must share the master's resource tracker, so that shared memory blocks
+                # created by workers and released by the master are tracked consistently
+                resource_tracker.ensure_running()
+
             self.workers = [
                 multiprocessing.Process(target=self.task_loop, name='worker-{:d}-{:x}'.format(i, id(self)))
                 for i in range(self.n_workers)
@@ -150,9 +256,11 @@ class ProcessWorkManager(WorkManager):
 
         while not self.result_queue.empty():
             try:
-                self.result_queue.get(block=False)
+                payload = self.result_queue.get(block=False)[2]
             except multiprocessing.queues.Empty:
                 break
+            if isinstance(payload, SharedMemoryResult):
+                payload.release()
 
     def shutdown(self):
         if self.running:
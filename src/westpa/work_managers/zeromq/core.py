@@ -11,6 +11,7 @@ import logging
 import json
 import multiprocessing
 import os
+import pickle
 import re
 import signal
 import socket
@@ -42,6 +43,35 @@ signames = {
 
 DEFAULT_LINGER = 1
 
+# Buffers (e.g. NumPy array data) at least this large are sent as separate message
+# frames without copying; smaller buffers are pickled along with the rest of the message.
+ZERO_COPY_THRESHOLD = zmq.COPY_THRESHOLD
+
+
+def pack_frames(obj, threshold=ZERO_COPY_THRESHOLD):
+    '''Serialize ``obj`` into a list of message frames. The first frame is a pickle (protocol 5)
+    of ``obj``, which records the dtype and shape of any NumPy arrays it contains. The data of
+    arrays at least ``threshold`` bytes in size are not included in the pickle, but are returned
+    as additional frames, which refer to (rather than copy) the array data. Such arrays must
+    therefore not be modified until the frames are sent.'''
+    buffers = []
+
+    def buffer_callback(buffer):
+        data = buffer.raw()
+        if data.nbytes < threshold:
+            # Serialize in-band
+            return True
+        buffers.append(data)
+        return False
+
+    return [pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)] + buffers
+
+
+def unpack_frames(frames):
+    '''Reconstruct an object from message frames produced by ``pack_frames``. Arrays sent as
+    separate frames are reconstructed as views on the received frames.'''
+    return pickle.loads(frames[0], buffers=frames[1:])
+
 
 def randport(address='127.0.0.1'):
     '''Select a random unused TCP port number on the given address.'''
@@ -272,7 +302,7 @@ class ZMQCore:
     # The set of messages and replies in use.
     # Cannot be updated without changing existing communications logic. (Changes break
     # the ZMQ WM library.)
-    PROTOCOL_MINOR = 0
+    PROTOCOL_MINOR = 1
 
     # Minor updates and additions to the protocol.
     # Changes do not break the ZMQ WM library, but only add new
@@ -291,6 +321,7 @@ class ZMQCore:
     default_timeout_factor = 5.0
     default_startup_timeout = 120.0
     default_shutdown_timeout = 5.0
+    default_prefetch_depth = 1
 
     _ipc_endpoints_to_delete = []
 
@@ -445,14 +476,14 @@ class ZMQCore:
         ``flags`` includes ``zmq.NOBLOCK``.'''
 
         if timeout is None or flags & zmq.NOBLOCK:
-            message = socket.recv_pyobj(flags)
+            message = unpack_frames(socket.recv_multipart(flags, copy=False))
         else:
             poller = zmq.Poller()
             poller.register(socket, zmq.POLLIN)
             try:
                 poll_results = dict(poller.poll(timeout=timeout))
                 if socket in poll_results:
-                    message = socket.recv_pyobj(flags)
+                    message = unpack_frames(socket.recv_multipart(flags, copy=False))
                 else:
                     raise ZMQWMTimeout('recv timed out')
             finally:
@@ -486,7 +517,10 @@ class ZMQCore:
         decorate the message with appropriate IDs, then delegate upward to actually send
         the message. ``message`` may either be a pre-constructed ``Message`` object or
         a message identifier, in which (latter) case ``payload`` will become the message payload.
-        ``payload`` is ignored if ``message`` is a ``Message`` object.'''
+        ``payload`` is ignored if ``message`` is a ``Message`` object.
+
+        Large arrays in the message (such as progress coordinates in task arguments or
+        results) are sent as separate frames without copying; see ``pack_frames``.'''
 
         message = Message(message, payload)
         if message.master_id is None:
@@ -495,7 +529,9 @@ class ZMQCore:
 
         if self._super_debug:
             self.log.debug('sending {!r}'.format(message))
-        socket.send_pyobj(message, flags)
+        frames = pack_frames(message)
+        # Copying is cheaper than tracking zero-copy frames for small, single-frame messages
+        socket.send_multipart(frames, flags, copy=len(frames) == 1)
 
     def send_reply(self, socket, original_message, reply=Message.ACK, payload=None, flags=0):
         '''Send a reply to ``original_message`` on ``socket``. The reply message
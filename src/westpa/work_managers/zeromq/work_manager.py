@@ -123,6 +123,13 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
             type=float,
             help='Amount of time (in seconds) to wait for workers to shut down.',
         )
+        wm_group.add_argument(
+            wmenv.arg_flag('zmq_prefetch_depth'),
+            metavar='DEPTH',
+            type=int,
+            help='Number of tasks each worker may hold at once, so that it can start on the next task '
+            + 'without waiting on a round trip to the master. (Default: 1.)',
+        )
 
     @classmethod
     def from_environ(cls, wmenv=None):
@@ -157,6 +164,9 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
         worker_heartbeat = wmenv.get_val('zmq_worker_heartbeat', cls.default_worker_heartbeat, float)
         timeout_factor = wmenv.get_val('zmq_timeout_factor', cls.default_timeout_factor, float)
         startup_timeout = wmenv.get_val('zmq_startup_timeout', cls.default_startup_timeout, float)
+        prefetch_depth = wmenv.get_val('zmq_prefetch_depth', cls.default_prefetch_depth, int)
+        if prefetch_depth < 1:
+            raise ValueError('prefetch depth must be at least 1')
 
         if mode == 'master':
             instance = ZMQWorkManager(n_workers)
@@ -207,6 +217,7 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
             worker.worker_beacon_period = worker_heartbeat
             worker.timeout_factor = timeout_factor
             worker.startup_timeout = startup_timeout
+            worker.prefetch_depth = prefetch_depth
 
         # We always write host info (since we are always either master or node)
         # we choose not to in the special case that read_host_info is '' but not None
@@ -217,6 +228,7 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
 
         log.debug('prepared {!r} with:'.format(instance))
         log.debug('n_workers = {}'.format(n_workers))
+        log.debug('prefetch_depth = {}'.format(prefetch_depth))
         for attr in (
             'master_beacon_period',
             'worker_beacon_period',
@@ -273,11 +285,14 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
         # Tasks pending distribution
         self.outgoing_tasks = deque()
 
-        # Tasks being processed by workers (indexed by worker_id)
+        # Tasks being processed or held by workers (indexed by worker_id, then task_id)
         self.assigned_tasks = dict()
 
         # Identity information and last contact from workers
         self.worker_information = dict()  # indexed by worker_id
+
+        # Task counts and idle times most recently reported by workers (indexed by worker_id)
+        self.worker_statistics = dict()
         self.worker_timeouts = PassiveMultiTimer()  # indexed by worker_id
 
         # Number of seconds between checks to see which workers have timed out
@@ -330,28 +345,48 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
             assert msg.message == Message.RESULT
             assert isinstance(msg.payload, Result)
             assert msg.payload.task_id in self.futures
-            assert self.assigned_tasks[msg.src_id].task_id == msg.payload.task_id
+            assert msg.payload.task_id in self.assigned_tasks[msg.src_id]
 
         result = msg.payload
 
         future = self.futures.pop(result.task_id)
-        del self.assigned_tasks[msg.src_id]
+        worker_tasks = self.assigned_tasks[msg.src_id]
+        del worker_tasks[result.task_id]
+        if not worker_tasks:
+            del self.assigned_tasks[msg.src_id]
         if result.exception is not None:
             future._set_exception(result.exception, result.traceback)
         else:
             future._set_result(result.result)
 
     def handle_task_request(self, socket, msg):
-        if not self.outgoing_tasks:
+        worker_id = msg.src_id
+
+        # Workers state how many tasks they can accept (their credits), and report statistics
+        # on their idle time; requests without a payload are for a single task
+        credits = 1
+        if isinstance(msg.payload, dict):
+            credits = msg.payload.get('credits', 1)
+            self.worker_statistics[worker_id] = {
+                key: msg.payload[key] for key in ('n_tasks_completed', 'idle_time') if key in msg.payload
+            }
+
+        if not self.outgoing_tasks or credits < 1:
             # No tasks available
             self.send_nak(socket, msg)
-        else:
-            task = self.outgoing_tasks.popleft()
+            return
 
-            worker_id = msg.src_id
-            self.assigned_tasks[worker_id] = task
+        # Grant no more than an even share of the outstanding tasks, so that prefetching
+        # workers do not starve others when few tasks remain
+        fair_share = max(1, len(self.outgoing_tasks) // max(1, len(self.worker_information)))
+        n_tasks = min(credits, fair_share, len(self.outgoing_tasks))
+        tasks = [self.outgoing_tasks.popleft() for _i in range(n_tasks)]
 
-            self.send_message(socket, Message.TASK, task)
+        worker_tasks = self.assigned_tasks.setdefault(worker_id, dict())
+        for task in tasks:
+            worker_tasks[task.task_id] = task
+
+        self.send_message(socket, Message.TASK, tasks if n_tasks > 1 else tasks[0])
 
     def update_worker_information(self, msg):
         if msg.message == Message.IDENTIFY:
@@ -381,11 +416,7 @@ class ZMQWorkManager(ZMQCore, WorkManager, IsNode):
             self.remove_worker(expired_worker_id)
 
     def remove_worker(self, worker_id):
-        try:
-            expired_task = self.assigned_tasks.pop(worker_id)
-        except KeyError:
-            pass
-        else:
+        for expired_task in self.assigned_tasks.pop(worker_id, {}).values():
             self.log.error('aborting task {!r} running on expired worker {!s}'.format(expired_task, worker_id))
             future = self.futures.pop(expired_task.task_id)
             future._set_exception(ZMQWorkerMissing('worker running this task disappeared'))
@@ -9,6 +9,8 @@ import multiprocessing
 import os
 import signal
 import threading
+import time
+from collections import OrderedDict
 
 from .core import ZMQCore, Message, ZMQWMTimeout, PassiveMultiTimer, Task, Result, TIMEOUT_MASTER_BEACON
 
@@ -38,8 +40,16 @@ class ZMQWorker(ZMQCore):
         self.master_id = None
         self.identified = False
 
-        # The task currently being processed
-        self.pending_task = None
+        # Tasks sent to the executor and not yet completed, in the order they were received;
+        # up to prefetch_depth tasks are held at a time, so that the executor can start on the
+        # next task without waiting on a round trip to the master
+        self.pending_tasks = OrderedDict()
+        self.prefetch_depth = self.default_prefetch_depth
+
+        # Statistics on time spent with no task to execute (between the first task and the last result)
+        self.n_tasks_completed = 0
+        self.idle_time = 0.0
+        self.idle_since = None
 
         # Executor process
 
@@ -62,26 +72,41 @@ class ZMQWorker(ZMQCore):
         self.recv_ack(rr_socket, timeout=self.master_beacon_period * self.timeout_factor * 1000)
         self.identified = True
 
+    def get_task_request(self):
+        '''Return the payload of a task request: the number of tasks this worker can accept
+        (its credits), along with statistics on its idle time.'''
+        return {
+            'credits': self.prefetch_depth - len(self.pending_tasks),
+            'n_tasks_completed': self.n_tasks_completed,
+            'idle_time': self.idle_time,
+        }
+
     def request_task(self, rr_socket, task_socket):
         if self.master_id is None:
             return
-        elif self.pending_task is not None:
+        elif len(self.pending_tasks) >= self.prefetch_depth:
             return
         elif self.timers.expired(TIMEOUT_MASTER_BEACON):
             return
         else:
-            self.send_message(rr_socket, Message.TASK_REQUEST)
+            self.send_message(rr_socket, Message.TASK_REQUEST, payload=self.get_task_request())
             reply = self.recv_message(rr_socket, timeout=self.master_beacon_period * self.timeout_factor * 1000)
             self.update_master_info(reply)
             if reply.message == Message.NAK:
                 # No task available
                 return
             else:
+                # The master sends a single task, or a list of tasks if granting more than one
                 with self.message_validation(reply):
-                    assert isinstance(reply.payload, Task)
-                    task = reply.payload
-                self.pending_task = task
-                self.send_message(task_socket, Message.TASK, task)
+                    tasks = reply.payload if isinstance(reply.payload, list) else [reply.payload]
+                    assert tasks
+                    assert all(isinstance(task, Task) for task in tasks)
+                if self.idle_since is not None:
+                    self.idle_time += time.time() - self.idle_since
+                    self.idle_since = None
+                for task in tasks:
+                    self.pending_tasks[task.task_id] = task
+                    self.send_message(task_socket, Message.TASK, task)
 
     def handle_reconfigure_timeout(self, msg, timers):
         with self.message_validation(msg):
@@ -95,10 +120,13 @@ class ZMQWorker(ZMQCore):
         with self.message_validation(msg):
             assert msg.message == Message.RESULT
             assert isinstance(msg.payload, Result)
-            assert msg.payload.task_id == self.pending_task.task_id
+            assert msg.payload.task_id in self.pending_tasks
 
         msg.src_id = self.node_id
-        self.pending_task = None
+        del self.pending_tasks[msg.payload.task_id]
+        self.n_tasks_completed += 1
+        if not self.pending_tasks:
+            self.idle_since = time.time()
         self.send_message(rr_socket, msg)
         reply = self.recv_ack(rr_socket, timeout=self.master_beacon_period * self.timeout_factor * 1000)
         self.update_master_info(reply)
@@ -213,6 +241,7 @@ class ZMQWorker(ZMQCore):
             # propagate to this point.
             self.log.error('timeout communicating with peer; shutting down')
         finally:
+            self.log.info('completed {:d} tasks; idle for {:.3f} s between tasks'.format(self.n_tasks_completed, self.idle_time))
             self.shutdown_executor()
             self.executor_process.join()
             self.context.destroy(linger=1)
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from westpa.analysis import Run
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), 'refs')
+
+
+class TestColumnCache:
+    def setup_method(self):
+        self.run = Run.open(os.path.join(REFERENCE_PATH, 'west_ref.h5'))
+
+    def teardown_method(self):
+        self.run.close()
+
+    def test_walker_properties(self):
+        iteration = self.run.iteration(2)
+        h5group = iteration.h5group
+        for walker in iteration:
+            assert walker.weight == h5group['seg_index'][walker.index]['weight']
+            assert np.array_equal(walker.pcoords, h5group['pcoord'][walker.index])
+
+        # Each column is read from the file once
+        info = self.run.column_cache.info()
+        assert info.misses == 2
+        assert info.hits == 2 * iteration.num_walkers - 2
+        assert info.currbytes == h5group['pcoord'].size * 4 + iteration.num_walkers * 8
+
+    def test_copies(self):
+        iteration = self.run.iteration(1)
+        weights = iteration.weights
+        weights[:] = 0
+        assert iteration.walker(0).weight > 0
+
+    def test_budget(self):
+        run = Run.open(self.run.h5filename, column_cache_size=1024)
+        iteration = run.iteration(3)
+        for n_iter in range(1, 11):
+            run.iteration(n_iter).walker(0).weight
+            assert run.column_cache.info().currbytes <= 1024
+
+        # Least recently used columns are evicted, and columns exceeding the budget are read from the file
+        assert run.column_cache.info().misses == 10
+        assert np.array_equal(iteration.walker(1).pcoords, iteration.h5group['pcoord'][1])
+        assert run.column_cache.info().misses == 10
+        run.close()
+
+
+class TestTraces:
+    def setup_method(self):
+        self.run = Run.open(os.path.join(REFERENCE_PATH, 'west_ref.h5'))
+
+    def teardown_method(self):
+        self.run.close()
+
+    def test_traces(self):
+        walkers = list(self.run.iteration(10)) + [self.run.iteration(5).walker(0)]
+        traces = self.run.traces(walkers)
+        assert len(traces) == len(walkers)
+        for walker, trace in zip(walkers, traces):
+            single = walker.trace()
+            assert trace.walkers == single.walkers
+            assert trace[-1] == walker
+            assert trace.initial_state.state_id == single.initial_state.state_id
+
+        # Common ancestors are shared
+        assert traces[0][0] is traces[1][0]
+
+    def test_traces_source_max_length(self):
+        class Source:
+            def __contains__(self, pcoord):
+                return pcoord[0] < 7.5
+
+        walkers = list(self.run.iteration(10))
+        for kwargs in [{'source': Source()}, {'max_length': 3}, {'source': Source(), 'max_length': 3}]:
+            for walker, trace in zip(walkers, self.run.traces(walkers, **kwargs)):
+                single = walker.trace(**kwargs)
+                assert trace.walkers == single.walkers
+                assert (trace.initial_state is None) == (single.initial_state is None)
@@ -0,0 +1,135 @@
+import os
+import tempfile
+
+import numpy as np
+
+from westpa.core.ancestry import AncestryIndex
+from westpa.core.data_manager import summary_table_dtype
+from westpa.core.h5io import WESTPAH5File
+
+seg_index_dtype = np.dtype([('weight', np.float64), ('parent_id', np.int64)])
+
+# Parents of the segments of each iteration
+parent_ids = [
+    [-1, -2],
+    [0, 0, 1],
+    [2, 0, 0, 1],
+    [3, -3, 2],
+]
+
+
+def add_iterations(h5file, iter_parent_ids, first_iter=1):
+    for n_iter, iter_parents in enumerate(iter_parent_ids, start=first_iter):
+        iter_group = h5file.require_group('iterations').create_group(h5file.iter_object_name(n_iter))
+        seg_index = np.zeros((len(iter_parents),), dtype=seg_index_dtype)
+        seg_index['parent_id'] = iter_parents
+        iter_group['seg_index'] = seg_index
+
+
+class TestAncestryIndex:
+    def setup_method(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.h5file = WESTPAH5File(os.path.join(self.test_dir, 'west.h5'), 'w')
+        add_iterations(self.h5file, parent_ids)
+
+    def teardown_method(self):
+        self.h5file.close()
+
+    def test_index(self):
+        index = AncestryIndex(self.h5file)
+        assert index.n_iters == 4
+        assert index.iter_offsets.tolist() == [0, 2, 5, 9, 12]
+        assert index.parents(3, [0, 3]).tolist() == [2, 1]
+
+        n_iters, seg_ids = index.locate(index.global_ids(3, [0, 3]))
+        assert n_iters.tolist() == [3, 3]
+        assert seg_ids.tolist() == [0, 3]
+
+    def test_trace(self):
+        index = AncestryIndex(self.h5file)
+        ancestors = index.trace(4, [0, 1, 2])
+        assert ancestors.tolist() == [
+            [0, 1, 3, 0],
+            [-1, -1, -1, 1],
+            [0, 0, 2, 2],
+        ]
+
+    def test_child_index(self):
+        index = AncestryIndex(self.h5file)
+        offsets, child_ids = index.child_index(2)
+        assert offsets.tolist() == [0, 2, 3, 4]
+        assert child_ids.tolist() == [1, 2, 3, 0]
+
+        # Segments of the last iteration have no children
+        offsets, child_ids = index.child_index(4)
+        assert offsets.tolist() == [0, 0, 0, 0]
+        assert len(child_ids) == 0
+
+    def test_descendants(self):
+        index = AncestryIndex(self.h5file)
+        descendants = index.descendants(1, [0])
+        assert [seg_ids.tolist() for seg_ids in descendants] == [[0, 1], [1, 2, 3], [0, 2]]
+        assert index.descendants(2, [2], last_iter=3)[0].tolist() == [0]
+
+    def test_sidecar_update(self):
+        filename = AncestryIndex.default_filename(self.h5file.filename)
+        index = AncestryIndex(self.h5file, filename)
+        assert os.path.exists(filename)
+
+        # Only appended iterations are read
+        add_iterations(self.h5file, [[0, 2]], first_iter=5)
+        index = AncestryIndex(self.h5file, filename)
+        assert index.n_iters == 5
+        assert index.update() == 0
+        assert index.trace(5, [1]).tolist() == [[0, 0, 2, 2, 1]]
+
+        # Iterations whose number of segments changed are read again
+        del self.h5file['iterations/iter_00000005']
+        del self.h5file['iterations/iter_00000004']
+        add_iterations(self.h5file, [[0]], first_iter=4)
+        index = AncestryIndex(self.h5file, filename)
+        assert index.iter_offsets.tolist() == [0, 2, 5, 9, 10]
+        assert index.trace(4, [0]).tolist() == [[1, 2, 0, 0]]
+
+    def test_sidecar_changed_parents(self):
+        filename = AncestryIndex.default_filename(self.h5file.filename)
+        AncestryIndex(self.h5file, filename)
+
+        # Same numbers of segments, as after initializing the simulation again
+        del self.h5file['iterations']
+        add_iterations(self.h5file, [[-1, -1], [1, 1, 0], [0, 0, 2, 2], [0, 1, 3]])
+        index = AncestryIndex(self.h5file, filename)
+        assert index.parents(2, [0, 1, 2]).tolist() == [1, 1, 0]
+        assert index.trace(4, [2]).tolist() == [[0, 2, 3, 2]]
+
+        # Only iterations from the first changed one are replaced
+        del self.h5file['iterations/iter_00000004']
+        add_iterations(self.h5file, [[3, 3, 3]], first_iter=4)
+        assert index.update() == 1
+        assert index.parents(4, [0, 1, 2]).tolist() == [3, 3, 3]
+
+    def test_sidecar_fingerprints(self):
+        summary = np.zeros((len(parent_ids) + 1,), dtype=summary_table_dtype)
+        summary['n_particles'][:-1] = [len(iter_parents) for iter_parents in parent_ids]
+        summary['norm'][:-1] = 1.0
+        # The last iteration is still being propagated
+        summary['walltime'][:-2] = [10.0, 11.0, 12.0]
+        self.h5file['summary'] = summary
+
+        filename = AncestryIndex.default_filename(self.h5file.filename)
+        AncestryIndex(self.h5file, filename)
+
+        # Iterations whose summary is unchanged are not read again, so changes to their parents go unnoticed;
+        # the iteration still being propagated is compared
+        self.h5file['iterations/iter_00000002/seg_index'][0] = (0.0, 1)
+        self.h5file['iterations/iter_00000004/seg_index'][0] = (0.0, 1)
+        index = AncestryIndex(self.h5file, filename)
+        assert index.parents(2, [0]).tolist() == [0]
+        assert index.parents(4, [0]).tolist() == [1]
+
+        # Once its summary changes, an iteration is read again
+        summary['walltime'][1] += 1.0
+        self.h5file['summary'][...] = summary
+        index = AncestryIndex(self.h5file, filename)
+        assert index.parents(2, [0]).tolist() == [1]
+        assert index.update() == 0
@@ -1,3 +1,5 @@
+import pickle
+
 import pytest
 
 import numpy as np
@@ -12,6 +14,7 @@ from westpa.core.binning.assign import (
     RecursiveBinMapper,
 )
 from westpa.core.binning.assign import coord_dtype
+from westpa.core.binning.mab import MABBinMapper
 
 
 class TestRectilinearBinMapper:
@@ -87,6 +90,98 @@ class TestVectorizingFuncBinMapper:
         coords.shape = (coords.shape[0], 1)
         output = mapper.assign(coords)
         assert list(output) == [0, 0, 0, 1]
+        # Too few coordinates to probe
+        assert mapper._probed_vectorized is None
+
+    calls = []
+
+    @classmethod
+    def block_fn(cls, coord, s):
+        cls.calls.append(coord.shape)
+        return np.where(coord[..., 0] + coord[..., 1] < s * 0.5, 0, 1)
+
+    def test_vmapper_block(self):
+        calls = self.calls
+        del calls[:]
+        coords = np.random.random((1000, 2)).astype(coord_dtype)
+        mask = np.ones((1000,), dtype=np.bool_)
+        mask[::3] = False
+        expected = np.full((1000,), 7, dtype=np.uint16)
+        expected[mask] = np.where(coords[mask, 0] + coords[mask, 1] < 0.75, 0, 1)
+
+        mapper = VectorizingFuncBinMapper(self.block_fn, 2, args=(1.5,))
+        hash = mapper.pickle_and_hash()[1]
+        output = np.full((1000,), 7, dtype=np.uint16)
+        mapper.assign(coords, mask, output)
+        assert (output == expected).all()
+        assert mapper._probed_vectorized is True
+        assert mapper.pickle_and_hash()[1] == hash
+
+        # One call for the block, plus a few single coordinate tuples to validate it
+        assert len(calls) <= 1 + mapper.n_probe_samples
+        del calls[:]
+        output = mapper.assign(coords)
+        assert calls == [(1000, 2)]
+        assert (output[mask] == expected[mask]).all()
+
+    def test_vmapper_per_point_small_blocks(self):
+        bounds = np.array([0.0, 0.5, 1.0, 1.5])
+        mapper = VectorizingFuncBinMapper(lambda coord: np.digitize(coord[0], bounds) - 1, 3)
+
+        # A single coordinate tuple cannot tell a per-point function from a block function
+        assert list(mapper.assign(np.array([[0.7]]))) == [1]
+        assert mapper._probed_vectorized is None
+
+        coords = np.array([[0.1], [0.6], [1.2], [0.3], [0.9], [1.4], [0.0], [0.8], [1.1], [0.2]])
+        expected = [0, 1, 2, 0, 1, 2, 0, 1, 2, 0]
+        assert list(mapper.assign(coords)) == expected
+        assert mapper._probed_vectorized is False
+
+    def test_vmapper_inferred_fallback(self):
+        mapper = VectorizingFuncBinMapper(self.fn, 2)
+        mapper._probed_vectorized = True
+        coords = np.array([[0.0], [0.1], [0.5], [0.7]])
+        assert list(mapper.assign(coords)) == [0, 0, 0, 1]
+        assert mapper._probed_vectorized is False
+
+    def test_vmapper_forced(self):
+        mapper = VectorizingFuncBinMapper(self.fn, 2, vectorized=True)
+        with pytest.raises((TypeError, ValueError)):
+            mapper.assign(np.random.random((10, 2)))
+
+        mapper = VectorizingFuncBinMapper(lambda coord: np.zeros(len(coord), dtype=int), 1, vectorized=False)
+        with pytest.raises(TypeError):
+            mapper.assign(np.random.random((10, 2)))
+
+
+class TestMABBinMapper:
+    def test_grid(self):
+        mapper = MABBinMapper([2, 2])
+        coords = np.array([[0.0, 0.0], [1.0, 1.0], [0.2, 0.8], [0.8, 0.2]], dtype=coord_dtype)
+        assert list(mapper.assign(coords)) == [0, 3, 2, 1]
+
+    def test_boundary_and_bottleneck(self):
+        # Linear bins 0-3 span [0, 1]; the minimum and maximum walkers are placed in bins 4 and 5,
+        # and the walker carrying most of the weight (a bottleneck in both directions) in bin 6
+        mapper = MABBinMapper([4])
+        assert mapper.nbins == 8
+
+        final = np.array([0.0, 0.1, 0.2, 0.3, 0.4, 1.0])
+        initial = np.array([0.6, 0.0, 0.1, 0.2, 0.3, 0.4])
+        weights = np.array([0.1, 0.1, 0.1, 0.5, 0.1, 0.1])
+        coords = np.vstack(
+            [np.column_stack([initial, weights, np.zeros(6)]), np.column_stack([final, weights, np.ones(6)])]
+        ).astype(coord_dtype)
+        assert list(mapper.assign(coords)) == [2, 4, 0, 0, 6, 1, 4, 0, 0, 6, 1, 5]
+
+    def test_direction_and_skip(self):
+        # With a positive direction, only the maximum walker in the first dimension is placed in its own
+        # bin (4); skipping the second dimension places all other walkers in a single bin (5)
+        mapper = MABBinMapper([2, 3], direction=[1, 0], skip=[0, 1], bottleneck=False)
+        final = np.array([[0.0, 0.5], [0.5, 0.0], [1.0, 1.0]])
+        weights = np.full((3,), 1.0 / 3)
+        coords = np.column_stack([final, weights, np.ones(3)]).astype(coord_dtype)
+        assert list(mapper.assign(coords)) == [5, 5, 4]
 
 
 class TestVoronoiBinMapper:
@@ -107,6 +202,53 @@ class TestVoronoiBinMapper:
         output = mapper.assign(coords)
         assert list(output) == [0, 1, 0, 1]
 
+    def test_euclidean_matches_dfunc(self):
+        rng = np.random.default_rng(1)
+        centers = rng.random((200, 3)).astype(coord_dtype)
+        coords = rng.random((5000, 3)).astype(coord_dtype)
+        mask = rng.random(5000) < 0.8
+
+        expected = np.full((5000,), 9999, dtype=np.uint16)
+        VoronoiBinMapper(self.distfunc, centers).assign(coords, mask, expected)
+        output = np.full((5000,), 9999, dtype=np.uint16)
+        VoronoiBinMapper(None, centers).assign(coords, mask, output)
+
+        assert (output == expected).all()
+        assert (output[~mask] == 9999).all()
+
+    def test_periodic(self):
+        centers = np.array([[0.5, 0.0], [9.0, 0.0]], dtype=coord_dtype)
+        coords = np.array([[9.9, 0.0], [-0.2, 0.0], [5.0, 0.0], [4.5, 0.0]], dtype=coord_dtype)
+
+        assert list(VoronoiBinMapper(None, centers).assign(coords)) == [1, 0, 1, 0]
+        mapper = VoronoiBinMapper(None, centers, boxsize=[10.0, 0])
+        assert list(mapper.assign(coords)) == [0, 0, 1, 0]
+
+    def test_metric_weights(self):
+        centers = np.array([[0, 0], [1, 2]], dtype=coord_dtype)
+        coords = np.array([[0.9, 0.0]], dtype=coord_dtype)
+
+        assert list(VoronoiBinMapper(None, centers).assign(coords)) == [0]
+        assert list(VoronoiBinMapper(None, centers, metric_weights=[100.0, 1.0]).assign(coords)) == [1]
+
+        with pytest.raises(ValueError):
+            VoronoiBinMapper(self.distfunc, centers, metric_weights=[100.0, 1.0])
+
+    def test_centers_change(self):
+        centers = np.array([[0, 0], [2, 2]], dtype=coord_dtype)
+        coords = np.array([[0.5, 0.5]], dtype=coord_dtype)
+        mapper = VoronoiBinMapper(None, centers)
+        pickled_data, hash = mapper.pickle_and_hash()
+
+        assert list(mapper.assign(coords)) == [0]
+        assert mapper.pickle_and_hash()[1] == hash
+
+        mapper.centers[1] = [0.6, 0.6]
+        assert list(mapper.assign(coords)) == [1]
+
+        unpickled = pickle.loads(pickled_data)
+        assert list(unpickled.assign(coords)) == [0]
+
 
 class TestNestingBinMapper:
     # pass
@@ -280,6 +422,78 @@ class TestNestingBinMapper:
         output = rmapper.assign(coords)
         assert list(output) == [1, 1, 2, 2, 0, 3, 4]
 
+    def testManyRecursionTargets(self):
+        '''Ten outer bins, each replaced by ten inner bins.'''
+        rmapper = RecursiveBinMapper(RectilinearBinMapper([np.arange(11.0)]))
+        for iouter in range(10):
+            rmapper.add_mapper(RectilinearBinMapper([np.linspace(iouter, iouter + 1, 11)]), [iouter + 0.5])
+        assert rmapper.nbins == 100
+
+        coords = np.random.default_rng(1).uniform(0, 10, size=(10000, 1)).astype(coord_dtype)
+        # Avoid coordinates within rounding error of a boundary
+        coords[np.abs(coords * 10 - np.round(coords * 10)) < 1e-3] += 0.05
+        expected = np.floor(coords[:, 0] * 10).astype(np.uint16)
+        assert (rmapper.assign(coords) == expected).all()
+
+        mask = np.zeros((10000,), dtype=np.bool_)
+        mask[::7] = True
+        output = np.full((10000,), 9999, dtype=np.uint16)
+        rmapper.assign(coords, mask, output)
+        assert (output[mask] == expected[mask]).all()
+        assert (output[~mask] == 9999).all()
+
+    def testNestedMABMapper(self):
+        '''Embedded mappers computing statistics over the ensemble see all coordinates, with a mask.'''
+        rmapper = RecursiveBinMapper(RectilinearBinMapper([[0.0, 0.5, 1.0], [0.0, 1.0]]))
+        rmapper.add_mapper(MABBinMapper([2, 2], pca=True), [0.25, 0.5])
+        assert not rmapper.pointwise
+
+        coords = np.random.default_rng(2).random((400, 2)).astype(coord_dtype)
+
+        # Previous algorithm: every embedded mapper is called on all coordinates
+        expected = np.empty((400,), dtype=np.uint16)
+        rmapper.base_mapper.assign(coords, output=expected)
+        recursed = expected == 0
+        expected[~recursed] = rmapper._output_map[expected[~recursed]]
+        rmapper._recursion_targets[0].assign(coords, recursed, expected)
+
+        assert (rmapper.assign(coords) == expected).all()
+
+    def testNestedFuncMapperPointwise(self):
+        '''Embedded FuncBinMappers see all coordinates, unless declared pointwise.'''
+        seen = []
+
+        def median_fn(coords, mask, output):
+            seen.append(len(coords))
+            output[mask] = coords[mask, 0] >= np.median(coords[mask, 0])
+
+        coords = np.random.default_rng(3).random((100, 1)).astype(coord_dtype)
+
+        rmapper = RecursiveBinMapper(RectilinearBinMapper([[0.0, 0.5, 1.0]]))
+        rmapper.add_mapper(FuncBinMapper(median_fn, 2), [0.25])
+        assert not rmapper.pointwise
+        rmapper.assign(coords)
+        assert seen == [100]
+
+        del seen[:]
+        rmapper = RecursiveBinMapper(RectilinearBinMapper([[0.0, 0.5, 1.0]]))
+        rmapper.add_mapper(FuncBinMapper(median_fn, 2, pointwise=True), [0.25])
+        assert rmapper.pointwise
+        rmapper.assign(coords)
+        assert seen == [(coords[:, 0] < 0.5).sum()]
+
+    def testOutOfRangeBaseBin(self):
+        '''Base bins with no entry in the recursion map are left as assigned.'''
+
+        def assign_fn(coords, mask, output):
+            output[mask] = np.select([coords[mask, 0] < 1, coords[mask, 0] < 2], [0, 1], 5)
+
+        rmapper = RecursiveBinMapper(FuncBinMapper(assign_fn, 2))
+        rmapper.add_mapper(RectilinearBinMapper([[0.0, 0.5, 1.0]]), [0.5])
+        rmapper.add_mapper(RectilinearBinMapper([[1.0, 2.0]]), [1.5])
+        output = rmapper.assign(np.array([[0.25], [0.75], [1.5], [2.5]], dtype=coord_dtype))
+        assert list(output) == [0, 1, 2, 5]
+
     # TODO: Fix this test
     @pytest.mark.xfail(reason="known error in assign")
     def test2dRectilinearRecursion(self):
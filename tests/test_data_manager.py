@@ -2,7 +2,17 @@ import unittest
 import argparse
 import os
 import tempfile
+import time
+from unittest.mock import patch
+
+import numpy as np
+
 import westpa
+from westpa.core import h5io
+from westpa.core.binning import RectilinearBinMapper
+from westpa.core.data_manager import coalesce_seg_id_runs
+from westpa.core.segment import Segment, SegmentTable
+from westpa.tools.binning import mapper_from_hdf5
 
 
 class TestDataManager(unittest.TestCase):
@@ -51,3 +61,267 @@ class TestDataManager(unittest.TestCase):
         assert os.path.basename(self.data_manager.we_h5filename) == 'west.h5'
         assert self.data_manager.aux_compression_threshold == 16384
         assert len(self.data_manager.dataset_options) == 2
+
+
+class TestUpdateSegments(unittest.TestCase):
+    n_segments = 10
+
+    def setUp(self):
+        parser = argparse.ArgumentParser()
+        westpa.rc.add_args(parser)
+
+        here = os.path.dirname(__file__)
+        os.environ['WEST_SIM_ROOT'] = os.path.join(here, 'fixtures', 'odld')
+
+        config_file_name = os.path.join(here, 'fixtures', 'odld', 'west.cfg')
+        args = parser.parse_args(['-r={}'.format(config_file_name)])
+        westpa.rc.process_args(args)
+
+        self.test_dir = tempfile.mkdtemp()
+        self.data_manager = westpa.rc.new_data_manager()
+        self.data_manager.we_h5filename = os.path.join(self.test_dir, "west.h5")
+        self.data_manager.prepare_backing()
+        self.data_manager.create_ibstate_group([])
+        self.data_manager.save_target_states([])
+
+        system = self.data_manager.system
+        segments = []
+        for seg_id in range(self.n_segments):
+            segment = Segment(
+                n_iter=1,
+                seg_id=seg_id,
+                parent_id=-1,
+                weight=1.0 / self.n_segments,
+                wtg_parent_ids={-1},
+                status=Segment.SEG_STATUS_PREPARED,
+            )
+            segment.pcoord = system.new_pcoord_array(pcoord_len=1)
+            segments.append(segment)
+        self.data_manager.prepare_iteration(1, segments)
+        self.data_manager.close_backing()
+        self.data_manager.open_backing()
+
+    def tearDown(self):
+        self.data_manager.close_backing()
+        del os.environ['WEST_SIM_ROOT']
+        westpa.rc = westpa.core._rc.WESTRC()
+
+    def test_prepare_iteration_compact_pcoords(self):
+        segments = self.data_manager.get_segments(1)
+        for segment in segments:
+            segment.pcoord = np.full((1, self.data_manager.system.pcoord_ndim), 1.5)
+        self.data_manager.prepare_iteration(1, segments)
+
+        pcoord = self.data_manager.get_iter_group(1)['pcoord'][...]
+        assert (pcoord[:, 0] == 1.5).all()
+        assert (pcoord[:, 1:] == 0).all()
+
+    def test_coalesce_seg_id_runs(self):
+        starts, counts = coalesce_seg_id_runs([0, 1, 2, 5, 7, 8])
+        assert list(starts) == [0, 5, 7]
+        assert list(counts) == [3, 1, 2]
+
+        starts, counts = coalesce_seg_id_runs([])
+        assert len(starts) == len(counts) == 0
+
+    def test_update_scattered_segments(self):
+        self.check_update_scattered_segments()
+
+    def test_update_scattered_segments_span(self):
+        with patch('westpa.core.data_manager.max_hyperslab_runs', 0):
+            self.check_update_scattered_segments()
+
+    def test_update_scattered_segments_runs(self):
+        with patch('westpa.core.data_manager.max_hyperslab_runs', 0), patch('westpa.core.data_manager.max_span_ratio', 0):
+            self.check_update_scattered_segments()
+
+    def test_update_segments_ragged_aux(self):
+        system = self.data_manager.system
+        segments = []
+        for seg_id, aux_len in zip([0, 1, 2], [3, 1, 5]):
+            segment = Segment(n_iter=1, seg_id=seg_id, weight=0.1, status=Segment.SEG_STATUS_COMPLETE)
+            segment.pcoord = system.new_pcoord_array()
+            segment.data['aux'] = np.arange(1, aux_len + 1)
+            segments.append(segment)
+
+        self.data_manager.update_segments(1, segments)
+
+        aux = self.data_manager.get_iter_group(1)['auxdata/aux'][...]
+        assert aux.shape == (self.n_segments, 5)
+        # Each entry is written into the leading corner of its row
+        assert aux[0].tolist() == [1, 2, 3, 0, 0]
+        assert aux[1].tolist() == [1, 0, 0, 0, 0]
+        assert aux[2].tolist() == [1, 2, 3, 4, 5]
+
+    def check_update_scattered_segments(self):
+        system = self.data_manager.system
+        seg_ids = [8, 0, 1, 2, 5, 9]
+        segments = []
+        for seg_id in seg_ids:
+            segment = Segment(
+                n_iter=1,
+                seg_id=seg_id,
+                weight=0.5 + seg_id,
+                status=Segment.SEG_STATUS_COMPLETE,
+                endpoint_type=Segment.SEG_ENDPOINT_CONTINUES,
+                cputime=seg_id,
+                walltime=2 * seg_id,
+            )
+            segment.pcoord = system.new_pcoord_array()
+            segment.pcoord[:] = seg_id
+            # only some segments carry this data set
+            if seg_id % 2 == 0:
+                segment.data['aux'] = np.arange(3) + seg_id
+            segments.append(segment)
+
+        self.data_manager.update_segments(1, segments)
+
+        iter_group = self.data_manager.get_iter_group(1)
+        seg_index = iter_group['seg_index'][...]
+        pcoord = iter_group['pcoord'][...]
+        aux = iter_group['auxdata/aux'][...]
+        for seg_id in range(self.n_segments):
+            if seg_id in seg_ids:
+                assert seg_index[seg_id]['weight'] == 0.5 + seg_id
+                assert seg_index[seg_id]['status'] == Segment.SEG_STATUS_COMPLETE
+                assert seg_index[seg_id]['walltime'] == 2 * seg_id
+                # pcoord is stored with a scale/offset filter
+                assert np.allclose(pcoord[seg_id], seg_id, atol=1e-3)
+            else:
+                assert seg_index[seg_id]['status'] == Segment.SEG_STATUS_PREPARED
+            # parent information is preserved
+            assert seg_index[seg_id]['parent_id'] == -1
+            if seg_id in seg_ids and seg_id % 2 == 0:
+                assert (aux[seg_id] == np.arange(3) + seg_id).all()
+            else:
+                assert (aux[seg_id] == 0).all()
+
+    def test_get_segments_as_table(self):
+        table = self.data_manager.get_segments(1, as_table=True)
+        assert isinstance(table, SegmentTable)
+        assert len(table) == self.n_segments
+        assert (table.parent_ids == -1).all()
+        assert table.pcoord.shape == (self.n_segments, self.data_manager.system.pcoord_len, 1)
+
+        # rows are materialized on demand, and only once
+        assert table.materialized_segments() == []
+        segment = table[3]
+        assert table[3] is segment
+        assert table.materialized_segments() == [segment]
+        assert segment.seg_id == 3
+        assert segment.wtg_parent_ids == {-1}
+
+        for segment, list_segment in zip(table, self.data_manager.get_segments(1)):
+            assert segment.seg_id == list_segment.seg_id
+            assert segment.weight == list_segment.weight
+            assert segment.parent_id == list_segment.parent_id
+            assert segment.wtg_parent_ids == list_segment.wtg_parent_ids
+            assert segment.status == list_segment.status
+            assert (segment.pcoord == list_segment.pcoord).all()
+
+    def test_update_segment_table(self):
+        table = self.data_manager.get_segments(1, as_table=True)
+        table.pcoord[:] = 2.0
+        table.seg_index['status'] = Segment.SEG_STATUS_COMPLETE
+
+        # modifications to materialized segments take precedence
+        segment = table[5]
+        segment.weight = 0.5
+        segment.pcoord = np.full_like(segment.pcoord, 3.0)
+        segment.data['aux'] = np.arange(3)
+
+        self.data_manager.update_segments(1, table[1:])
+
+        iter_group = self.data_manager.get_iter_group(1)
+        seg_index = iter_group['seg_index'][...]
+        pcoord = iter_group['pcoord'][...]
+        assert seg_index[0]['status'] == Segment.SEG_STATUS_PREPARED
+        assert (seg_index[1:]['status'] == Segment.SEG_STATUS_COMPLETE).all()
+        assert seg_index[5]['weight'] == 0.5
+        assert np.allclose(pcoord[0], 0.0, atol=1e-3)
+        assert np.allclose(pcoord[1:5], 2.0, atol=1e-3)
+        assert np.allclose(pcoord[5], 3.0, atol=1e-3)
+        assert (iter_group['auxdata/aux'][5] == np.arange(3)).all()
+
+    def test_queue_segment_update_async(self):
+        self.data_manager.async_writes = True
+        self.data_manager.async_write_max_pending = 100
+        self.data_manager.async_write_max_delay = 60
+
+        table = self.data_manager.get_segments(1, as_table=True)
+        for segment in table:
+            segment.status = Segment.SEG_STATUS_COMPLETE
+        self.data_manager.queue_segment_update(1, list(table)[:5])
+        self.data_manager.queue_segment_update(1, list(table)[5:])
+
+        writer = self.data_manager.background_writer
+        assert writer.thread.is_alive()
+        assert writer.n_pending == self.n_segments
+
+        # flushing waits for pending updates to be written
+        self.data_manager.flush_backing()
+        assert writer.n_pending == 0
+        seg_index = self.data_manager.get_iter_group(1)['seg_index'][...]
+        assert (seg_index['status'] == Segment.SEG_STATUS_COMPLETE).all()
+
+        # the writer thread writes once enough updates are pending
+        self.data_manager.async_write_max_pending = 1
+        self.data_manager.close_backing()
+        self.data_manager.open_backing()
+        table = self.data_manager.get_segments(1, as_table=True)
+        table[0].weight = 0.5
+        self.data_manager.queue_segment_update(1, [table[0]])
+        writer = self.data_manager.background_writer
+        deadline = time.time() + 10
+        while writer.n_pending and time.time() < deadline:
+            time.sleep(0.01)
+        with self.data_manager.lock:
+            assert self.data_manager.get_iter_group(1)['seg_index'][0]['weight'] == 0.5
+
+    def test_bin_mapper_cache(self):
+        mapper = RectilinearBinMapper([[0.0, 1.0, 2.0]])
+        pickle_data, hashval = mapper.pickle_and_hash()
+        self.data_manager.save_bin_mapper(hashval, pickle_data)
+
+        h5io.bin_mapper_cache.clear()
+        loaded = self.data_manager.get_bin_mapper(hashval)
+        assert loaded.boundaries[0].tolist() == [0.0, 1.0, 2.0]
+        assert h5io.bin_mapper_cache.info()[:2] == (0, 1)
+
+        # the mapper is unpickled only once, whatever the form of the hash
+        assert self.data_manager.get_bin_mapper(bytes(hashval, 'utf-8')) is loaded
+        topol_group = self.data_manager.we_h5file['bin_topologies']
+        assert mapper_from_hdf5(topol_group, hashval)[0] is loaded
+        assert h5io.bin_mapper_cache.info()[:2] == (2, 1)
+
+        with self.assertRaises(KeyError):
+            self.data_manager.get_bin_mapper('0' * 64)
+
+    def test_get_children(self):
+        system = self.data_manager.system
+        segments = []
+        for seg_id, parent_id in enumerate([1, 1, 3, -1]):
+            segment = Segment(
+                n_iter=2,
+                seg_id=seg_id,
+                parent_id=parent_id,
+                weight=0.25,
+                wtg_parent_ids={parent_id},
+                status=Segment.SEG_STATUS_PREPARED,
+            )
+            segment.pcoord = system.new_pcoord_array(pcoord_len=1)
+            segments.append(segment)
+        self.data_manager.prepare_iteration(2, segments)
+        self.data_manager.current_iteration = 2
+
+        assert list(self.data_manager.get_child_ids(1, 1)) == [0, 1]
+        assert list(self.data_manager.get_child_ids(1, 3)) == [2]
+        assert list(self.data_manager.get_child_ids(1, 0)) == []
+        assert self.data_manager.get_child_ids(2, 0) == []
+
+        offsets, child_ids = self.data_manager.get_child_index(1)
+        assert list(offsets) == [0, 0, 2, 2, 3] + [3] * (self.n_segments - 4)
+        assert list(child_ids) == [0, 1, 2]
+
+        parent = self.data_manager.get_segments(1)[1]
+        assert [child.seg_id for child in self.data_manager.get_children(parent)] == [0, 1]
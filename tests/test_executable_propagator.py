@@ -0,0 +1,147 @@
+import argparse
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+import numpy as np
+
+import westpa
+from westpa.core.propagators.executable import ExecutablePropagator
+from westpa.core.segment import Segment
+
+
+BATCH_RUNNER = '''#!{python}
+import json, os
+import numpy as np
+
+with open(os.environ['WEST_BATCH_MANIFEST']) as f:
+    manifest = json.load(f)
+
+seg_ids = np.array([entry['seg_id'] for entry in manifest['segments']], dtype=float)
+for entry in manifest['segments']:
+    assert entry['environ']['WEST_CURRENT_SEG_ID'] == str(entry['seg_id'])
+    assert os.path.isdir(entry['environ']['WEST_CURRENT_SEG_DATA_REF'])
+    if 'WEST_LOG_RETURN' in entry['environ']:
+        with open(entry['environ']['WEST_LOG_RETURN'], 'wt') as f:
+            f.write('segment {{}}\\n'.format(entry['seg_id']))
+
+pcoord = np.repeat(seg_ids[:, None, None], 21, axis=1)
+returncodes = (seg_ids == {failed_seg_id}).astype(int)
+np.savez(os.environ['WEST_BATCH_RETURN'], pcoord=pcoord, returncodes=returncodes)
+'''
+
+SEGMENT_RUNNER = '''#!{python}
+import os, time
+
+time.sleep({sleep})
+with open(os.environ['WEST_PCOORD_RETURN'], 'wt') as f:
+    f.write('\\n'.join([os.environ['WEST_CURRENT_SEG_ID']] * 21))
+'''
+
+BINARY_RUNNER = '''#!{python}
+import os
+import numpy as np
+
+np.full((21, 1), float(os.environ['WEST_CURRENT_SEG_ID'])).tofile(os.environ['WEST_PCOORD_RETURN'])
+'''
+
+
+class TestExecutablePropagator(TestCase):
+    def setUp(self):
+        parser = argparse.ArgumentParser()
+        westpa.rc.add_args(parser)
+
+        here = os.path.dirname(__file__)
+        os.environ['WEST_SIM_ROOT'] = os.path.join(here, 'fixtures', 'odld')
+
+        config_file_name = os.path.join(here, 'fixtures', 'odld', 'west.cfg')
+        args = parser.parse_args(['-r={}'.format(config_file_name)])
+        westpa.rc.process_args(args)
+
+        self.test_dir = tempfile.mkdtemp()
+        self.runner = os.path.join(self.test_dir, 'runseg_batch.py')
+
+        config = westpa.rc.config
+        config['west', 'data', 'data_refs', 'segment'] = os.path.join(
+            self.test_dir, 'traj_segs', '{segment.n_iter:06d}', '{segment.seg_id:06d}'
+        )
+        config['west', 'executable'] = {'environ': {}, 'propagator': {'executable': self.runner, 'batch': True}}
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        del westpa.rc.config['west', 'executable']
+        westpa.rc.config['west', 'data', 'data_refs'].pop('iteration', None)
+
+    def write_runner(self, template, **kwargs):
+        with open(self.runner, 'wt') as f:
+            f.write(template.format(python=sys.executable, **kwargs))
+        os.chmod(self.runner, os.stat(self.runner).st_mode | stat.S_IXUSR)
+
+    def segments(self, n_segments):
+        return [
+            Segment(n_iter=2, seg_id=seg_id, parent_id=seg_id, weight=1.0 / n_segments, status=Segment.SEG_STATUS_PREPARED)
+            for seg_id in range(n_segments)
+        ]
+
+    def test_propagate_batch(self):
+        self.write_runner(BATCH_RUNNER, failed_seg_id=-1)
+        propagator = ExecutablePropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(4))
+
+        for segment in segments:
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert segment.pcoord.shape == (21, 1)
+            assert np.all(segment.pcoord == segment.seg_id)
+            assert segment.walltime > 0
+
+    def test_propagate_batch_failed_segment(self):
+        self.write_runner(BATCH_RUNNER, failed_seg_id=2)
+        propagator = ExecutablePropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(4))
+
+        statuses = [segment.status for segment in segments]
+        assert statuses == [Segment.SEG_STATUS_COMPLETE] * 2 + [Segment.SEG_STATUS_FAILED] + [Segment.SEG_STATUS_COMPLETE]
+
+    def test_propagate_batch_store_h5(self):
+        # Logs (as well as trajectories and restart files) are returned per segment, not in the bulk return
+        westpa.rc.config['west', 'data', 'data_refs', 'iteration'] = os.path.join(self.test_dir, 'iter_{n_iter:06d}.h5')
+        self.write_runner(BATCH_RUNNER, failed_seg_id=-1)
+        propagator = ExecutablePropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(3))
+
+        for segment in segments:
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert np.all(segment.pcoord == segment.seg_id)
+            assert segment.data['iterh5/log'].endswith(b'\x01')
+
+    def test_propagate_concurrent(self):
+        self.write_runner(SEGMENT_RUNNER, sleep=1.0)
+        westpa.rc.config['west', 'executable', 'propagator'] = {'executable': self.runner, 'max_concurrent_children': 4}
+        propagator = ExecutablePropagator(westpa.rc)
+
+        starttime = time.time()
+        segments = propagator.propagate(self.segments(4))
+        elapsed = time.time() - starttime
+
+        # Run one after another, the four segments would take at least four seconds
+        assert elapsed < 3.0
+        for segment in segments:
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert np.all(segment.pcoord == segment.seg_id)
+            assert segment.walltime >= 1.0
+
+    def test_propagate_binary_pcoord(self):
+        self.write_runner(BINARY_RUNNER)
+        westpa.rc.config['west', 'executable', 'propagator'] = {'executable': self.runner}
+        westpa.rc.config['west', 'executable', 'datasets'] = [{'name': 'pcoord', 'format': 'binary', 'dtype': 'float64'}]
+        propagator = ExecutablePropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(2))
+
+        for segment in segments:
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert segment.pcoord.shape == (21, 1)
+            assert np.all(segment.pcoord == segment.seg_id)
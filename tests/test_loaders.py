@@ -1,9 +1,14 @@
 from .test_tools.conftest import *  # noqa
-from westpa.core.propagators.executable import npy_data_loader, pickle_data_loader
+import westpa
+from westpa.core.propagators import executable
+from westpa.core.propagators.executable import npy_data_loader, pickle_data_loader, pcoord_loader
 from westpa.core.segment import Segment
+from westpa.core.systems import WESTSystem
 
 import numpy as np
 import pickle
+import pytest
+from unittest.mock import patch
 
 
 class Test_Loaders:
@@ -36,3 +41,62 @@ class Test_Loaders:
         test_array = test_segment.data['test'][:]
 
         assert np.array_equal(test_array, ref_array)
+
+
+@pytest.fixture
+def pcoord_system():
+    system = WESTSystem()
+    system.pcoord_len = 11
+    system.pcoord_ndim = 2
+    system.pcoord_dtype = np.float32
+    with patch.object(westpa.rc, 'get_system_driver', return_value=system):
+        yield system
+
+
+class Test_PcoordLoader:
+    '''Class to test that pcoord_loader reads text, .npy, and raw binary progress coordinate returns.'''
+
+    ref_pcoord = np.arange(22, dtype=np.float64).reshape(11, 2) / 4
+
+    def test_text(self, pcoord_system, tmp_path):
+        filename = str(tmp_path / 'pcoord_return')
+        np.savetxt(filename, self.ref_pcoord)
+        segment = Segment()
+        pcoord_loader('pcoord', filename, segment, False)
+        assert segment.pcoord.dtype == np.float32
+        assert np.array_equal(segment.pcoord, self.ref_pcoord)
+
+    def test_npy(self, pcoord_system, tmp_path):
+        # The return file is detected as .npy from its contents, not its name
+        filename = str(tmp_path / 'pcoord_return')
+        with open(filename, 'wb') as f:
+            np.save(f, self.ref_pcoord)
+        segment = Segment()
+        pcoord_loader('pcoord', filename, segment, False)
+        assert segment.pcoord.dtype == np.float32
+        assert np.array_equal(segment.pcoord, self.ref_pcoord)
+
+    def test_npy_single_point(self, pcoord_system, tmp_path):
+        filename = str(tmp_path / 'pcoord_return')
+        with open(filename, 'wb') as f:
+            np.save(f, self.ref_pcoord[0])
+        segment = Segment()
+        pcoord_loader('pcoord', filename, segment, True)
+        assert np.array_equal(segment.pcoord, self.ref_pcoord[0])
+
+    @pytest.mark.parametrize('mmap_threshold', [1 << 20, 0])
+    def test_binary(self, pcoord_system, tmp_path, mmap_threshold):
+        filename = str(tmp_path / 'pcoord_return')
+        self.ref_pcoord.tofile(filename)
+        segment = Segment()
+        with patch.object(executable, 'pcoord_mmap_threshold', mmap_threshold):
+            pcoord_loader('pcoord', filename, segment, False, binary=True, dtype=np.float64)
+        assert segment.pcoord.shape == (11, 2)
+        assert np.array_equal(segment.pcoord, self.ref_pcoord)
+
+    def test_bad_shape(self, pcoord_system, tmp_path):
+        filename = str(tmp_path / 'pcoord_return')
+        with open(filename, 'wb') as f:
+            np.save(f, self.ref_pcoord.T)
+        with pytest.raises(ValueError):
+            pcoord_loader('pcoord', filename, Segment(), False)
@@ -0,0 +1,71 @@
+import argparse
+import os
+from unittest import TestCase
+
+import numpy as np
+
+import westpa
+from westpa.core.propagators.python import LangevinPropagator, PythonPropagator
+from westpa.core.segment import Segment
+from westpa.core.states import BasisState, InitialState
+
+
+class FailingPropagator(PythonPropagator):
+    def propagate_block(self, segments, pcoords):
+        raise RuntimeError('dynamics blew up')
+
+
+class TestPythonPropagator(TestCase):
+    def setUp(self):
+        parser = argparse.ArgumentParser()
+        westpa.rc.add_args(parser)
+
+        here = os.path.dirname(__file__)
+        os.environ['WEST_SIM_ROOT'] = os.path.join(here, 'fixtures', 'odld')
+
+        config_file_name = os.path.join(here, 'fixtures', 'odld', 'west.cfg')
+        args = parser.parse_args(['-r={}'.format(config_file_name)])
+        westpa.rc.process_args(args)
+
+    def segments(self, n_segments):
+        system = westpa.rc.get_system_driver()
+        segments = []
+        for seg_id in range(n_segments):
+            pcoord = system.new_pcoord_array()
+            pcoord[0] = -1.0
+            segments.append(
+                Segment(n_iter=1, seg_id=seg_id, weight=1.0 / n_segments, pcoord=pcoord, status=Segment.SEG_STATUS_PREPARED)
+            )
+        return segments
+
+    def test_langevin_propagate(self):
+        propagator = LangevinPropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(8))
+
+        for segment in segments:
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert segment.pcoord.shape == (21, 1)
+            assert segment.pcoord[0, 0] == -1.0
+            assert np.all(np.isfinite(segment.pcoord))
+
+        # Segments do not all follow the same trajectory
+        assert len({segment.pcoord[-1, 0] for segment in segments}) > 1
+
+        # All progress coordinates are views into one array for the block
+        assert all(segment.pcoord.base is segments[0].pcoord.base for segment in segments)
+
+    def test_langevin_states(self):
+        propagator = LangevinPropagator(westpa.rc)
+        basis_state = BasisState(label='well', probability=1.0)
+        propagator.get_pcoord(basis_state)
+        assert np.all(basis_state.pcoord == -1.0)
+
+        initial_state = InitialState(state_id=0, basis_state_id=0, iter_created=0, istate_type=InitialState.ISTATE_TYPE_GENERATED)
+        propagator.gen_istate(basis_state, initial_state)
+        assert initial_state.istate_status == InitialState.ISTATE_STATUS_PREPARED
+        assert np.all(initial_state.pcoord == basis_state.pcoord)
+
+    def test_failed_block(self):
+        propagator = FailingPropagator(westpa.rc)
+        segments = propagator.propagate(self.segments(4))
+        assert all(segment.status == Segment.SEG_STATUS_FAILED for segment in segments)
@@ -8,6 +8,7 @@ import pytest
 import numpy as np
 
 import westpa
+from westpa.core import wm_ops
 from westpa.core.binning.assign import RectilinearBinMapper
 from westpa.core.segment import Segment
 from westpa.core.states import BasisState
@@ -149,6 +150,17 @@ class TestSimManager(TestCase):
         westpa.core.states.pare_basis_initial_states = MagicMock(return_value=([], []))
         self.sim_manager.propagate
 
+    def test_propagate_compact_pcoords(self):
+        system = westpa.rc.get_system_driver()
+        segments = [
+            Segment(n_iter=1, seg_id=seg_id, weight=0.5, pcoord=np.full((1, 1), 8.0), status=Segment.SEG_STATUS_PREPARED)
+            for seg_id in range(2)
+        ]
+        for segment in wm_ops.propagate([], [], segments):
+            assert segment.status == Segment.SEG_STATUS_COMPLETE
+            assert segment.pcoord.shape == (system.pcoord_len, system.pcoord_ndim)
+            assert segment.pcoord[0, 0] == 8.0
+
     def test_save_bin_data(self):
         self.sim_manager.save_bin_data()
 
@@ -1,13 +1,21 @@
+import os
 import shutil
 
+import h5py
+import numpy as np
 from h5diff import H5Diff
 
 from westpa.cli.tools import w_assign
+from westpa.core.h5io import SingleSegmentDSSpec
+from westpa.core.binning import MABBinMapper, RecursiveBinMapper, RectilinearBinMapper
+from westpa.core.binning.assign import BinMapper, coord_dtype
+from westpa.tools import AssignmentCache
+from westpa.tools.binning import assign_segment_coords
 from common import MockArgs
 
 
 class Test_W_Assign:
-    def test_run_w_assign(self, ref_50iter):
+    def run_w_assign(self, assignment_cache=None):
         args = MockArgs(
             verbosity='debug',
             rcfile=self.cfg_filepath,
@@ -19,6 +27,7 @@ class Test_W_Assign:
             subsample=None,
             config_from_file=True,
             scheme='TEST',
+            assignment_cache=assignment_cache,
         )
 
         # This basically some logic that's wrapped up in WESTTool.main() for convenience.
@@ -37,9 +46,101 @@ class Test_W_Assign:
                 tool.go()
             else:
                 tool.work_manager.run()
+        return tool
+
+    def test_run_w_assign(self, ref_50iter):
+        tool = self.run_w_assign()
+        assert tool.assignment_cache is None
+        assert not os.path.exists(AssignmentCache.default_filename(self.h5_filepath))
 
         diff = H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5')
         diff.check()
 
         # clean up
         shutil.rmtree('ANALYSIS')
+
+    def test_run_w_assign_cached(self, ref_50iter):
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.hits == 0
+        assert tool.assignment_cache.misses == 50
+        assert os.path.exists(AssignmentCache.default_filename(self.h5_filepath))
+
+        # Assignments of all iterations are read from the cache when run again
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.hits == 50
+        assert tool.assignment_cache.misses == 0
+
+        diff = H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5')
+        diff.check()
+
+        shutil.rmtree('ANALYSIS')
+
+    def test_run_w_assign_cached_without_reading(self, ref_50iter, monkeypatch):
+        self.run_w_assign(assignment_cache='')
+
+        # Hits are validated against the summary of each iteration, without reading its coordinates
+        get_iter_data = SingleSegmentDSSpec.get_iter_data
+
+        def get_iter_data_no_pcoord(self, n_iter, seg_slice=np.index_exp[:]):
+            assert self.dsname != 'pcoord'
+            return get_iter_data(self, n_iter, seg_slice)
+
+        monkeypatch.setattr(SingleSegmentDSSpec, 'get_iter_data', get_iter_data_no_pcoord)
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.hits == 50
+
+        H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5').check()
+        shutil.rmtree('ANALYSIS')
+
+    def test_run_w_assign_cached_checksum(self, ref_50iter, monkeypatch):
+        # Coordinates which cannot be fingerprinted are checksummed as the workers read them
+        monkeypatch.setattr(w_assign.WAssign, 'cache_fingerprint', lambda self, n_iter: None)
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.misses == 50
+
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.hits == 50
+        assert tool.assignment_cache.misses == 0
+        H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5').check()
+
+        # Iterations whose coordinates changed are assigned again
+        with h5py.File(self.h5_filepath, 'r+') as h5file:
+            h5file['iterations/iter_00000010/pcoord'][0, -1] += 1.0
+        tool = self.run_w_assign(assignment_cache='')
+        assert tool.assignment_cache.hits == 49
+        assert tool.assignment_cache.misses == 1
+
+        shutil.rmtree('ANALYSIS')
+
+    def test_run_w_assign_cache_unavailable(self, ref_50iter, monkeypatch):
+        # A cache file which cannot be created is not used
+        tool = self.run_w_assign(assignment_cache=os.path.join('missing', 'assignments.h5'))
+        assert tool.assignment_cache is None
+        H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5').check()
+        shutil.rmtree('ANALYSIS')
+
+        # Neither is a cache for mappers which cannot be pickled
+        def pickle_and_hash(self):
+            raise AttributeError("Can't pickle local object")
+
+        monkeypatch.setattr(BinMapper, 'pickle_and_hash', pickle_and_hash)
+        tool = self.run_w_assign(assignment_cache='assignments.h5')
+        assert tool.assignment_cache is None
+        assert not os.path.exists('assignments.h5')
+        H5Diff('./assign_ref.h5', './ANALYSIS/TEST/assign.h5').check()
+        shutil.rmtree('ANALYSIS')
+
+
+def test_assign_segment_coords_mab():
+    # MAB bins depend on the coordinates assigned together, so each segment is assigned on its own, as before
+    coords = np.random.default_rng(4).random((20, 5, 2)).astype(coord_dtype)
+    for mapper in (MABBinMapper([2, 2]), RecursiveBinMapper(RectilinearBinMapper([[0.0, 0.5, 1.0], [0.0, 1.0]]))):
+        if isinstance(mapper, RecursiveBinMapper):
+            mapper.add_mapper(MABBinMapper([2, 2]), [0.25, 0.5])
+        expected = np.array([mapper.assign(segment_coords) for segment_coords in coords])
+        assert (assign_segment_coords(mapper, coords) == expected).all()
+
+    # Rectilinear bins do not, so all points are assigned at once
+    mapper = RectilinearBinMapper([[0.0, 0.5, 1.0], [0.0, 0.5, 1.0]])
+    expected = mapper.assign(coords.reshape(100, 2)).reshape(20, 5)
+    assert (assign_segment_coords(mapper, coords) == expected).all()
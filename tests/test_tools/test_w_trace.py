@@ -6,8 +6,12 @@ import tempfile
 import argparse
 import os
 
+import numpy as np
+
+import westpa
 from common import CommonToolTest
-from westpa.cli.tools.w_trace import WTraceTool, entry_point
+from westpa.cli.tools.w_trace import Trace, WTraceTool, entry_point
+from westpa.core.ancestry import AncestryIndex
 from h5diff import H5Diff
 from filecmp import cmp
 from unittest import mock
@@ -45,6 +49,21 @@ class Test_NEW_W_Trace:
                 os.path.join(test_dir, output_txt), os.path.join(ref_dir, output_txt), shallow=False
             ), f'Output file {output_txt} is not the same as reference file.'
 
+    def test_trace_from_ancestry(self, ref_50iter):
+        westpa.rc.config['west', 'data', 'west_data_file'] = self.h5_filepath
+        data_manager = westpa.rc.get_data_manager()
+        data_manager.open_backing(mode='r')
+        try:
+            endpoints = [(20, 0), (20, 1), (20, 2), (12, 3), (1, 0)]
+            traces = Trace.from_ancestry(endpoints, AncestryIndex(data_manager.we_h5file), data_manager)
+            for (n_iter, seg_id), trace in zip(endpoints, traces):
+                expected = Trace.from_data_manager(n_iter, seg_id, data_manager)
+                assert (trace.summary == expected.summary).all()
+                assert trace.endpoint_type == expected.endpoint_type
+                assert trace.initial_state.state_id == expected.initial_state.state_id
+        finally:
+            data_manager.close_backing()
+
 
 @pytest.mark.skip(reason='doesn\'t actually work')
 class Test_W_Trace_Args(unittest.TestCase, CommonToolTest):
@@ -0,0 +1,97 @@
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from westpa.core.h5io import WESTPAH5File
+from westpa.tools.selected_segs import AllSegmentSelection, SegmentSelection
+from westpa.trajtree import TrajTreeSet
+from westpa.trajtree.trajtree import FakeTrajTreeSet
+
+seg_index_dtype = np.dtype([('weight', np.float64), ('parent_id', np.int64)])
+
+# Parents of the segments of each iteration
+parent_ids = [
+    [-1, -2],
+    [0, 0, 1],
+    [2, 0, 0, 1],
+]
+
+
+class FakeDataManager:
+    def __init__(self, h5file):
+        self.h5file = h5file
+        self.current_iteration = len(parent_ids) + 1
+
+    def get_iter_group(self, n_iter):
+        return self.h5file.get_iter_group(n_iter)
+
+    def get_all_parent_ids(self, n_iter):
+        return self.get_iter_group(n_iter)['seg_index']['parent_id']
+
+
+class TestTrajTreeSet:
+    def setup_method(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.h5file = WESTPAH5File(os.path.join(self.test_dir, 'west.h5'), 'w')
+        for n_iter, iter_parents in enumerate(parent_ids, start=1):
+            seg_index = np.zeros((len(iter_parents),), dtype=seg_index_dtype)
+            seg_index['weight'] = 1.0 / len(iter_parents)
+            seg_index['parent_id'] = iter_parents
+            self.h5file.create_group('iterations/' + self.h5file.iter_object_name(n_iter))['seg_index'] = seg_index
+        self.data_manager = FakeDataManager(self.h5file)
+
+    def teardown_method(self):
+        self.h5file.close()
+
+    def test_build_table(self):
+        tree = TrajTreeSet(AllSegmentSelection(data_manager=self.data_manager), self.data_manager)
+        assert len(tree) == 9
+        assert tree.iter_offsets == {1: 0, 2: 2, 3: 5}
+        assert tree.trajtable['parent_offset'].tolist() == [-1, -1, 0, 0, 1, 4, 2, 2, 3]
+        assert tree.get_child_indices(0).tolist() == [2, 3]
+        assert tree.get_child_indices(2).tolist() == [6, 7]
+        assert tree.get_child_indices(4).tolist() == [5]
+        assert tree.count_roots() == 2
+        assert tree.count_leaves() == 4
+
+    def test_build_table_selection(self):
+        segsel = SegmentSelection([(2, 0), (2, 2), (3, 0), (3, 1)])
+        tree = TrajTreeSet(segsel, self.data_manager)
+        assert tree.trajtable['seg_id'].tolist() == [0, 2, 0, 1]
+        assert tree.trajtable['parent_offset'].tolist() == [-1, -1, 1, 0]
+
+        # Parents of selected segments must be selected
+        with pytest.raises(KeyError):
+            TrajTreeSet(SegmentSelection([(2, 0), (3, 0)]), self.data_manager)
+
+    def test_save_load(self):
+        tree = TrajTreeSet(AllSegmentSelection(data_manager=self.data_manager), self.data_manager)
+        filename = os.path.join(self.test_dir, 'trajtree.h5')
+        tree.save(filename)
+        loaded = TrajTreeSet.load(filename)
+        assert np.array_equal(loaded.trajtable, tree.trajtable)
+        assert loaded.iter_offsets == tree.iter_offsets
+        assert loaded.get_child_indices(2).tolist() == [6, 7]
+
+
+def test_trace_trajectories():
+    tree = FakeTrajTreeSet()
+    visits = []
+    path = []
+
+    def visit(n_iter, seg_id, weight, has_children):
+        visits.append((seg_id, tuple(path), has_children))
+        path.append(seg_id)
+        if seg_id == 12:
+            raise StopIteration
+
+    def set_visitor_state(state):
+        path[:] = state
+
+    n_visits = tree.trace_trajectories(visit, get_visitor_state=lambda: list(path), set_visitor_state=set_visitor_state)
+    assert n_visits == 13
+    assert [seg_id for (seg_id, _path, _has_children) in visits] == [1, 2, 5, 9, 10, 3, 6, 4, 7, 8, 11, 12, 13]
+    assert visits[4] == (10, (1, 2, 5), False)
+    assert visits[11] == (12, (11,), True)
@@ -1,13 +1,17 @@
 import pytest
+import random
 from unittest import TestCase
 
+import h5py
 import numpy as np
 
 from westpa.core.binning import RectilinearBinMapper
-from westpa.core.segment import Segment
+from westpa.core.data_manager import seg_index_dtype
+from westpa.core.h5io import load_bin_transitions, save_sparse_transitions
+from westpa.core.segment import Segment, SegmentTable
 from westpa.core.states import TargetState, InitialState
 from westpa.core.systems import WESTSystem
-from westpa.core.we_driver import WEDriver
+from westpa.core.we_driver import WEDriver, _group_walkers_identity
 
 EPS = np.finfo(np.float64).eps
 
@@ -46,6 +50,93 @@ class TestWEDriver(TestCase):
         assert len(self.we_driver.final_binning[1]) == 1
         assert (self.we_driver.flux_matrix == np.array([[0.0, 0.5], [0.5, 0.0]])).all()
 
+    def test_assign_segment_table(self):
+        segments = [self.segment(0.0, 1.5, weight=0.25), self.segment(1.5, 0.5, weight=0.5), self.segment(0.5, 0.5, weight=0.25)]
+        seg_index = np.zeros((len(segments),), dtype=seg_index_dtype)
+        seg_index['weight'] = [segment.weight for segment in segments]
+        seg_index['wtg_n_parents'] = 1
+        seg_index['wtg_offset'] = np.arange(len(segments))
+        table = SegmentTable(
+            1,
+            [segment.seg_id for segment in segments],
+            seg_index,
+            np.zeros((len(segments),), dtype=np.int64),
+            np.array([segment.pcoord for segment in segments]),
+        )
+
+        self.we_driver.new_iteration()
+        self.we_driver.assign(table)
+        assert [len(_bin) for _bin in self.we_driver.initial_binning] == [2, 1]
+        assert [len(_bin) for _bin in self.we_driver.final_binning] == [2, 1]
+        assert table[0] in self.we_driver.final_binning[1]
+        assert (self.we_driver.flux_matrix == np.array([[0.25, 0.25], [0.5, 0.0]])).all()
+        assert (self.we_driver.transition_matrix == np.array([[1, 1], [1, 0]])).all()
+
+    def test_assign_blocks(self):
+        segments = [self.segment(0.0, 1.5, weight=0.25), self.segment(1.5, 0.5, weight=0.5), self.segment(0.5, 0.5, weight=0.25)]
+        tstate = TargetState('recycle', [1.5], 0)
+        self.we_driver.new_iteration(initial_states=[InitialState(0, 0, 0, pcoord=[0.0])], target_states=[tstate])
+
+        # Recycling is counted before bins are filled
+        assert self.we_driver.assign(segments[:1]) == 0
+        assert self.we_driver.assign(segments[1:]) == 0
+        assert self.we_driver.n_recycled_segs == 1
+
+        assert self.we_driver.initial_binning[0] == {segments[0], segments[2]}
+        assert self.we_driver.initial_binning[1] == {segments[1]}
+        assert self.we_driver.final_binning[0] == {segments[1], segments[2]}
+        assert self.we_driver.final_binning[1] == {segments[0]}
+        assert self.we_driver.n_recycled_segs == 1
+        assert (self.we_driver.flux_matrix == np.array([[0.25, 0.25], [0.5, 0.0]])).all()
+
+        # Further blocks are added to the existing bins
+        segment = self.segment(1.5, 1.5, weight=0.0)
+        self.we_driver.assign([segment])
+        assert self.we_driver.final_binning[1] == {segments[0], segment}
+        assert self.we_driver.n_recycled_segs == 2
+
+    def test_assign_twice(self):
+        segments = [self.segment(0.0, 1.5, weight=0.5), self.segment(0.5, 0.5, weight=0.5)]
+        tstate = TargetState('recycle', [1.5], 0)
+        self.we_driver.new_iteration(initial_states=[InitialState(0, 0, 0, pcoord=[0.0])], target_states=[tstate])
+
+        # Recycled segments are counted once however often they are assigned, before and after filling bins
+        self.we_driver.assign(segments)
+        self.we_driver.assign(segments[:1])
+        assert self.we_driver.n_recycled_segs == 1
+        assert self.we_driver.final_binning[1] == {segments[0]}
+        self.we_driver.assign(segments[:1])
+        assert self.we_driver.n_recycled_segs == 1
+        assert self.we_driver.n_istates_needed == 0
+
+    def test_transition_triplets(self):
+        segments = [self.segment(0.0, 1.5, weight=0.25), self.segment(1.5, 0.5, weight=0.5), self.segment(0.5, 1.5, weight=0.125)]
+        self.we_driver.new_iteration()
+        self.we_driver.assign(segments[:1])
+        self.we_driver.assign(segments[1:])
+
+        initial_bins, final_bins, fluxes, counts = self.we_driver.transition_triplets()
+        assert initial_bins.tolist() == [0, 1]
+        assert final_bins.tolist() == [1, 0]
+        assert fluxes.tolist() == [0.375, 0.5]
+        assert counts.tolist() == [2, 1]
+        assert (self.we_driver.sparse_flux_matrix.toarray() == self.we_driver.flux_matrix).all()
+        assert (self.we_driver.sparse_transition_matrix.toarray() == self.we_driver.transition_matrix).all()
+
+        # Sparse and (earlier) dense storage are read back alike
+        with h5py.File('transitions.h5', 'w', driver='core', backing_store=False) as h5file:
+            sparse_group = h5file.create_group('sparse')
+            save_sparse_transitions(sparse_group.create_group('bin_transitions'), initial_bins, final_bins, fluxes, counts, (2, 2))
+            dense_group = h5file.create_group('dense')
+            dense_group['bin_fluxes'] = self.we_driver.flux_matrix
+            dense_group['bin_ntrans'] = self.we_driver.transition_matrix
+
+            for group in (sparse_group, dense_group):
+                flux_matrix, transition_matrix = load_bin_transitions(group)
+                assert (flux_matrix.toarray() == [[0.0, 0.375], [0.5, 0.0]]).all()
+                assert (transition_matrix.toarray() == [[0, 2], [1, 0]]).all()
+            assert load_bin_transitions(h5file) == (None, None)
+
     def test_passthrough(self):
         segments = [self.segment(0.0, 1.5, weight=0.125) for _i in range(4)] + [
             self.segment(1.5, 0.5, weight=0.125) for _i in range(4)
@@ -100,6 +191,10 @@ class TestWEDriver(TestCase):
                 assert segment.parent_id == segments[ibin].seg_id
                 assert segment.status == Segment.SEG_STATUS_PREPARED
 
+                # Only the initial point is carried until propagation
+                assert segment.pcoord.shape == (1, self.system.pcoord_ndim)
+                assert (segment.pcoord[0] == segments[ibin].pcoord[-1]).all()
+
     # this test will fail up to alpha of the time
     @pytest.mark.flaky(reruns=3, only_rerun="AssertionError")
     def test_merge_by_weight(self):
@@ -238,6 +333,114 @@ class TestWEDriver(TestCase):
 
         assert len(self.we_driver.next_iter_binning[0]) == 50
 
+    def resample(self, segments, per_bin):
+        for segment in segments:
+            segment.endpoint_type = Segment.SEG_ENDPOINT_UNSET
+        if per_bin:
+            # Any subgroup function other than the default uses the per-bin implementation
+            self.we_driver.subgroup_function = lambda we_driver, ibin, **kwargs: _group_walkers_identity(we_driver, ibin, **kwargs)
+        else:
+            self.we_driver.subgroup_function = _group_walkers_identity
+        self.we_driver.new_iteration()
+        self.we_driver.assign(segments)
+        self.we_driver.construct_next()
+
+    # this test will fail up to about 1% of the time
+    @pytest.mark.flaky(reruns=3, only_rerun="AssertionError")
+    def test_resampling_equivalence(self):
+        '''Array-based resampling is statistically equivalent to resampling segment by segment'''
+        self.system.bin_mapper = RectilinearBinMapper([[0.0, 1.0, 2.0, 3.0]])
+        self.system.bin_target_counts = np.array([4, 1, 6])
+        bin_weights = [[0.01, 0.02, 0.035, 0.235], [0.1, 0.3, 0.1], [0.005, 0.005, 0.05, 0.14]]
+        segments = [self.segment(0.5, ibin + 0.5, weight=weight) for ibin, weights in enumerate(bin_weights) for weight in weights]
+
+        nrounds = 1000
+        n_children = {}
+        for per_bin in (True, False):
+            n_children[per_bin] = np.zeros((nrounds, len(segments)))
+            for iround in range(nrounds):
+                self.resample(segments, per_bin)
+                for segment in self.we_driver.next_iter_segments:
+                    n_children[per_bin][iround, segment.parent_id] += 1
+
+                # Weights are the same, whichever histories are chosen
+                final_weights = [sorted(segment.weight for segment in _bin) for _bin in self.we_driver.next_iter_binning]
+                assert [len(weights) for weights in final_weights] == [4, 1, 6]
+                if iround == 0 and per_bin:
+                    expected_weights = final_weights
+                else:
+                    for weights, expected in zip(final_weights, expected_weights):
+                        assert np.allclose(weights, expected)
+
+                # (The per-bin implementation can mark a parent as merged when some of its split
+                # children are merged and others continue)
+                for segment in segments if not per_bin else []:
+                    if n_children[per_bin][iround, segment.seg_id]:
+                        assert segment.endpoint_type == Segment.SEG_ENDPOINT_CONTINUES
+                    else:
+                        assert segment.endpoint_type == Segment.SEG_ENDPOINT_MERGED
+
+        # Histories are continued at the same rates
+        mean_diff = n_children[True].mean(axis=0) - n_children[False].mean(axis=0)
+        stderr = np.sqrt((n_children[True].var(axis=0) + n_children[False].var(axis=0)) / nrounds)
+        assert (np.abs(mean_diff) <= 4 * stderr + EPS).all(), 'this is expected about 1% of the time; retry test.'
+
+        # The merged walker in the second bin continues the history of each segment in proportion to its weight
+        assert abs(n_children[False][:, 5].mean() - 0.6) < 4 * np.sqrt(0.24 / nrounds)
+
+    def test_resampling_seeded(self):
+        '''Merge histories are drawn from ``random``, as in the per-bin implementation'''
+        self.system.bin_target_counts = np.array([1, 1])
+        segments = [self.segment(0.5, 0.5, weight=weight) for weight in (0.05, 0.1, 0.15)] + [
+            self.segment(1.5, 1.5, weight=weight) for weight in (0.2, 0.22, 0.28)
+        ]
+
+        parents = []
+        for iround in range(10):
+            random.seed(1234)
+            np.random.seed(iround)
+            self.resample(segments, per_bin=False)
+            parents.append([sorted(segment.parent_id for segment in _bin) for _bin in self.we_driver.next_iter_binning])
+        assert all(round_parents == parents[0] for round_parents in parents)
+
+    def test_resampling_wtg_parents(self):
+        self.system.bin_target_counts = np.array([1, 4])
+        segments = [self.segment(0.0, 0.5, weight=0.25) for _i in range(3)] + [self.segment(1.5, 1.5, weight=0.25)]
+        self.we_driver.new_iteration()
+        self.we_driver.assign(segments)
+        self.we_driver.construct_next()
+
+        (merged,) = self.we_driver.next_iter_binning[0]
+        assert merged.weight == 0.75
+        assert merged.wtg_parent_ids == {0, 1, 2}
+        assert merged.parent_id in {0, 1, 2}
+        assert (merged.pcoord[0] == 0.5).all()
+
+        split = self.we_driver.next_iter_binning[1]
+        assert len(split) == 4
+        for segment in split:
+            assert segment.weight == 0.0625
+            assert segment.parent_id == 3
+            assert segment.wtg_parent_ids == {3}
+            assert (segment.pcoord[0] == 1.5).all()
+
+    def test_merge_frees_initial_states(self):
+        self.system.bin_target_counts = np.array([1, 1])
+        istates = [InitialState(state_id, 0, 0, pcoord=[0.5]) for state_id in range(3)]
+        self.we_driver.new_iteration(initial_states=istates)
+        self.we_driver._prep_we()
+        for istate in istates:
+            segment = Segment(n_iter=1, weight=1.0 / 3, parent_id=-(istate.state_id + 1), wtg_parent_ids={-(istate.state_id + 1)})
+            segment.pcoord = self.system.new_pcoord_array()
+            segment.pcoord[0] = istate.pcoord
+            self.we_driver.next_iter_binning[0].add(segment)
+            self.we_driver.used_initial_states[istate.state_id] = self.we_driver.avail_initial_states.pop(istate.state_id)
+        self.we_driver._run_we()
+
+        (merged,) = self.we_driver.next_iter_binning[0]
+        assert list(self.we_driver.used_initial_states) == [merged.initial_state_id]
+        assert len(self.we_driver.avail_initial_states) == 2
+
     def check_populate_initial(self, prob, target_counts):
         istate = InitialState(0, 0, 0, pcoord=[0.0])
         self.system.bin_target_counts = np.array([target_counts, target_counts])
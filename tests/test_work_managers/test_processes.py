@@ -3,11 +3,21 @@ import signal
 import unittest
 import pytest
 
-from westpa.work_managers.processes import ProcessWorkManager
+import numpy as np
+
+from westpa.work_managers.processes import ProcessWorkManager, SharedMemoryResult
 from .tsupport import CommonParallelTests, CommonWorkManagerTests
 from .tsupport import will_busyhang, will_busyhang_uninterruptible, get_process_index
 
 
+def make_arrays(n):
+    return {'label': 'arrays', 'pcoord': np.arange(n, dtype=np.float32).reshape(-1, 2), 'small': np.ones(3)}
+
+
+def shm_blocks():
+    return set(name for name in os.listdir('/dev/shm') if name.startswith('psm_'))
+
+
 class TestProcessWorkManager(unittest.TestCase, CommonParallelTests, CommonWorkManagerTests):
     def setUp(self):
         self.work_manager = ProcessWorkManager()
@@ -17,6 +27,36 @@ class TestProcessWorkManager(unittest.TestCase, CommonParallelTests, CommonWorkM
         self.work_manager.shutdown()
 
 
+class TestProcessWorkManagerSharedMemory(TestProcessWorkManager):
+    def setUp(self):
+        self.work_manager = ProcessWorkManager(shm_threshold=1024)
+        self.work_manager.startup()
+
+    @pytest.mark.timeout(5)
+    def test_shared_memory_result(self):
+        future = self.work_manager.submit(make_arrays, args=(100000,))
+        result = future.get_result()
+        assert result['label'] == 'arrays'
+        assert np.array_equal(result['pcoord'], make_arrays(100000)['pcoord'])
+        assert np.array_equal(result['small'], np.ones(3))
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), 'requires /dev/shm')
+    @pytest.mark.timeout(5)
+    def test_shared_memory_released(self):
+        blocks = shm_blocks()
+        futures = [self.work_manager.submit(make_arrays, args=(100000,)) for _i in range(8)]
+        self.work_manager.wait_all(futures)
+        for future in futures:
+            future.get_result()
+        assert shm_blocks() == blocks
+
+    def test_small_result_not_shared(self):
+        assert SharedMemoryResult.from_result(make_arrays(10), threshold=1024) is None
+        shared = SharedMemoryResult.from_result(make_arrays(1000), threshold=1024)
+        assert isinstance(shared, SharedMemoryResult)
+        assert np.array_equal(shared.load()['pcoord'], make_arrays(1000)['pcoord'])
+
+
 class TestProcessWorkManagerAux:
     @pytest.mark.timeout(2)
     def test_shutdown(self):
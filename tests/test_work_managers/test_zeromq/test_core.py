@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+import zmq
+
+from westpa.work_managers.zeromq.core import Message, Result, ZMQCore, pack_frames, unpack_frames
+
+
+class TestFrameSerialization(unittest.TestCase):
+    def test_small_arrays_inline(self):
+        payload = {'pcoord': np.arange(21, dtype=np.float32), 'label': 'segment'}
+        frames = pack_frames(payload)
+        assert len(frames) == 1
+
+        unpacked = unpack_frames(frames)
+        assert unpacked['label'] == 'segment'
+        assert np.all(unpacked['pcoord'] == payload['pcoord'])
+
+    def test_large_arrays_out_of_band(self):
+        big = np.random.random((1000, 50))
+        fortran = np.asfortranarray(np.random.random((100, 100)))
+        payload = [big, fortran, np.arange(3)]
+        frames = pack_frames(payload, threshold=1024)
+        assert len(frames) == 3
+        assert frames[1].nbytes == big.nbytes
+
+        unpacked = unpack_frames(frames)
+        assert np.all(unpacked[0] == big)
+        assert np.all(unpacked[1] == fortran)
+        assert unpacked[1].flags.f_contiguous
+        assert np.all(unpacked[2] == np.arange(3))
+
+
+class TestMessageTransport(unittest.TestCase):
+    def setUp(self):
+        self.context = zmq.Context()
+        self.send_socket = self.context.socket(zmq.PAIR)
+        self.recv_socket = self.context.socket(zmq.PAIR)
+        endpoint = 'inproc://test_message_transport'
+        self.send_socket.bind(endpoint)
+        self.recv_socket.connect(endpoint)
+        self.core = ZMQCore()
+
+    def tearDown(self):
+        self.send_socket.close(linger=0)
+        self.recv_socket.close(linger=0)
+        self.context.term()
+
+    def test_array_result(self):
+        pcoords = np.random.random((1000, 21, 3)).astype(np.float32)
+        result = Result(task_id=1, result=pcoords)
+        self.core.send_message(self.send_socket, Message.RESULT, payload=result)
+
+        message = self.core.recv_message(self.recv_socket, timeout=1000)
+        assert message.message == Message.RESULT
+        assert message.src_id == self.core.node_id
+        received = message.payload.result
+        assert received.dtype == pcoords.dtype
+        assert received.shape == pcoords.shape
+        assert np.all(received == pcoords)
+
+        # Received arrays are writable views on the received message frame
+        assert received.flags.writeable
+        assert not received.flags.owndata
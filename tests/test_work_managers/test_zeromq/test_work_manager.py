@@ -171,8 +171,25 @@ class TestZMQWorkManagerBasic(ZMQTestBase, unittest.TestCase):
             self.test_core.send_message(s, Message.RESULT, result)
         assert future.result == r
 
+    def test_task_send_credits(self):
+        rs = [random_int() for _i in range(3)]
+        futures = [self.test_wm.submit(identity, (r,)) for r in rs]
+        with self.rr_socket() as s:
+            self.test_core.send_message(s, Message.TASK_REQUEST, {'credits': 2, 'n_tasks_completed': 5, 'idle_time': 0.25})
+            msg = self.test_core.recv_message(s)
+            assert msg.message == Message.TASK
+            assert isinstance(msg.payload, list)
+            assert [task.args for task in msg.payload] == [(rs[0],), (rs[1],)]
+            for task in msg.payload:
+                self.test_core.send_message(s, Message.RESULT, task.execute())
+                self.test_core.recv_ack(s)
+        assert [future.result for future in futures[:2]] == rs[:2]
+        assert self.test_wm.worker_statistics[self.test_core.node_id] == {'n_tasks_completed': 5, 'idle_time': 0.25}
+
 
 class BaseInternal:
+    prefetch_depth = 1
+
     def setUp(self):
         super().setUp()
 
@@ -180,6 +197,7 @@ class BaseInternal:
         for worker in self.test_wm.local_workers:
             worker.validation_fail_action = 'raise'
             worker.shutdown_timeout = 0.5
+            worker.prefetch_depth = self.prefetch_depth
 
         # Set operation parameters
         self.test_wm.validation_fail_action = 'raise'
@@ -295,6 +313,16 @@ class TestZMQWorkManagerInternalMultiple(BaseInternal, ZMQTestBase, CommonWorkMa
     n_workers = 4
 
 
+class TestZMQWorkManagerInternalPrefetch(BaseInternal, ZMQTestBase, CommonWorkManagerTests, unittest.TestCase):
+    n_workers = 2
+    prefetch_depth = 4
+
+    def test_many_tasks(self):
+        rs = [random_int() for _i in range(50)]
+        futures = self.test_wm.submit_many([(identity, (r,), {}) for r in rs])
+        assert [future.get_result() for future in futures] == rs
+
+
 class BaseExternal:
     def setUp(self):
         super().setUp()
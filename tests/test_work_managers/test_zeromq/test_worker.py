@@ -126,3 +126,22 @@ class TestZMQWorkerBasic(ZMQTestBase, unittest.TestCase):
         time.sleep(1.0)
         self.test_core.send_message(self.ann_socket, Message.SHUTDOWN)
         self.test_worker.join()
+
+    def test_worker_prefetches_tasks(self):
+        self.test_worker.prefetch_depth = 2
+        rs = [random_int() for _i in range(2)]
+        self.test_core.send_message(self.ann_socket, Message.TASKS_AVAILABLE)
+        msg = self.test_core.recv_message(self.rr_socket)
+        assert msg.message == Message.TASK_REQUEST
+        assert msg.payload['credits'] == 2
+        self.test_core.send_message(self.rr_socket, Message.TASK, payload=[Task(identity, (r,), {}) for r in rs])
+
+        results = [self.recv_result().result]
+        # The worker asks to replace the completed task before returning the second result
+        msg = self.test_core.recv_message(self.rr_socket)
+        assert msg.message == Message.TASK_REQUEST
+        assert msg.payload['credits'] == 1
+        assert msg.payload['n_tasks_completed'] == 1
+        self.test_core.send_nak(self.rr_socket, msg)
+        results.append(self.recv_result().result)
+        assert results == rs